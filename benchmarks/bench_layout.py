@@ -0,0 +1,136 @@
+"""
+One-hot vs categorical feature layout: size, training cost, latency.
+
+Usage
+-----
+python -m benchmarks.bench_layout [--features data/features_2024.parquet]
+                                  [--rows 200000] [--trees 200]
+                                  [--sizes 1 100 10000] [--json layout.json]
+
+The one-hot feature file is converted with ``onehot_to_categorical`` (the
+same frame ``engineer(..., layout="categorical")`` produces), both layouts
+are written to parquet, and for each one the script reports:
+
+* parquet size on disk and in-memory frame size
+* training wall time and peak RSS, each fit in a fresh process
+* validation AUC / log-loss on the same stratified split
+* latency of encoding raw PA dicts + ``inplace`` scoring per batch size
+"""
+import argparse, json, os, tempfile, time, joblib, numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sklearn.metrics import log_loss, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from processing.feature_engineering import category_vocab, onehot_to_categorical, peak_rss_mb
+from utils.request_helper import FeatureEncoder
+from utils.scoring import make_backend
+
+RAW_FIELDS = ["batter", "pitcher", "balls", "strikes", "launch_speed", "launch_angle",
+              "wind_out_to_cf", "stand", "p_throws", "pitch_type", "home_team",
+              "away_team", "inning", "month"]
+
+
+def _train(path: str, trees: int, model_out: str) -> dict:
+    """Runs in a child process so ``peak_rss_mb`` covers this fit only."""
+    from models.train_xgb import build_model
+    t0 = time.perf_counter()
+    df = pd.read_parquet(path)
+    y = df.pop("is_hr")
+    vocab = category_vocab(df)
+    X_train, X_val, y_train, y_val = train_test_split(
+        df, y, test_size=0.2, random_state=42, stratify=y
+    )
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    model = build_model(y_train, categorical=bool(vocab), n_estimators=trees)
+    model.fit(X_train, y_train)
+    train_s = time.perf_counter() - t0
+    if vocab:
+        model.get_booster().set_attr(category_vocab=json.dumps(vocab))
+    p = model.predict_proba(X_val)[:, 1]
+    joblib.dump(model, model_out)
+    return {"load_s": load_s, "train_s": train_s, "peak_rss_mb": peak_rss_mb(),
+            "val_auc": roc_auc_score(y_val, p), "val_logloss": log_loss(y_val, p)}
+
+
+def time_encode_score(encoder, backend, records: list, size: int, budget_s: float) -> float:
+    """Median seconds to encode ``size`` raw dicts and score them."""
+    batch = records[:size]
+    backend.predict(encoder.encode(batch))               # warm-up
+    times, spent = [], 0.0
+    while spent < budget_s or len(times) < 3:
+        t0 = time.perf_counter()
+        backend.predict(encoder.encode(batch))
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        spent += dt
+        if len(times) >= 1000:
+            break
+    return float(np.median(times))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--features", default="data/features_2024.parquet")
+    ap.add_argument("--rows", type=int, default=200_000, help="0 = all rows")
+    ap.add_argument("--trees", type=int, default=200)
+    ap.add_argument("--sizes", nargs="+", type=int, default=[1, 100, 10_000])
+    ap.add_argument("--budget", type=float, default=1.0, help="seconds per (layout, size)")
+    ap.add_argument("--json", help="optional path for machine-readable results")
+    args = ap.parse_args()
+
+    onehot = pd.read_parquet(args.features)
+    onehot = onehot.drop(columns=[c for c in ("game_pk", "game_date") if c in onehot])
+    if args.rows and args.rows < len(onehot):
+        onehot = onehot.sample(args.rows, random_state=0).reset_index(drop=True)
+    frames = {"onehot": onehot, "categorical": onehot_to_categorical(onehot)}
+
+    raw = frames["categorical"][RAW_FIELDS].sample(max(args.sizes), replace=True, random_state=1)
+    records = [{k: v for k, v in r.items() if pd.notna(v)}     # missing fields are omitted
+               for r in raw.astype(object).to_dict("records")]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, \
+         ProcessPoolExecutor(1, mp_context=get_context("spawn"), max_tasks_per_child=1) as pool:
+        for layout, df in frames.items():
+            path = os.path.join(tmp, f"{layout}.parquet")
+            df.to_parquet(path, index=False)
+            model_path = os.path.join(tmp, f"{layout}.pkl")
+            fit = pool.submit(_train, path, args.trees, model_path).result()
+
+            model = joblib.load(model_path)
+            encoder = FeatureEncoder.from_model(model)
+            backend = make_backend("inplace", model)
+            row = {
+                "layout": layout,
+                "rows": len(df),
+                "columns": df.shape[1] - 1,
+                "parquet_mb": os.path.getsize(path) / 2**20,
+                "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+                **fit,
+                "latency_ms": {},
+            }
+            for size in args.sizes:
+                row["latency_ms"][size] = time_encode_score(
+                    encoder, backend, records, size, args.budget) * 1e3
+            results.append(row)
+
+    print(f"\n{'layout':<12} {'cols':>5} {'parquet MB':>11} {'frame MB':>9} "
+          f"{'train s':>8} {'peak RSS':>9} {'AUC':>7} {'logloss':>8}  "
+          + "  ".join(f"{'ms@' + str(s):>9}" for s in args.sizes))
+    for r in results:
+        print(f"{r['layout']:<12} {r['columns']:>5} {r['parquet_mb']:>11.2f} {r['frame_mb']:>9.1f} "
+              f"{r['train_s']:>8.1f} {r['peak_rss_mb']:>9.0f} {r['val_auc']:>7.4f} "
+              f"{r['val_logloss']:>8.4f}  "
+              + "  ".join(f"{r['latency_ms'][s]:>9.3f}" for s in args.sizes))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"✅ wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
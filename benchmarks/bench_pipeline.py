@@ -0,0 +1,166 @@
+"""
+End-to-end pipeline timings on synthetic data at several scales.
+
+Usage
+-----
+python -m benchmarks.bench_pipeline [--scales 10000 100000 1000000]
+                                    [--trees 200] [--bootstrap 200] [--shap-rows 2000]
+                                    [--payload-rows 2000] [--layout onehot] [--json PATH]
+
+For every scale (pitches of ``benchmarks.synth`` data) the stages run in
+order on the previous stage's output, each timed on its own:
+
+* ``synth``              generate raw pitches + per-game weather
+* ``features``           ``add_wind`` + ``engineer`` (the in-memory feature_engineering path)
+* ``train``              ``build_model`` fit on the stratified 80% split (``--trees``)
+* ``evaluate``           encode + score the 20% split, ``eval_engine.evaluate`` with slices
+* ``shap``               ``ExplanationEngine.shap_values`` on ``--shap-rows`` rows, cache off
+* ``build_payload``      the old per-PA path: ``build_payload`` + one-row ``predict_proba``
+* ``score_one_<b>``      ``encode_one`` + ``predict`` per PA, each scoring backend
+* ``score_batch_<b>``    ``encode`` + ``predict`` over every batted ball at this scale
+
+Results (wall seconds, rows per second, microseconds per PA where it
+applies, peak RSS) go to ``benchmarks/results/pipeline-<commit>.json``;
+compare two runs with ``python -m benchmarks.results``.
+"""
+import argparse, os, tempfile, time, joblib, pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from benchmarks.results import write_results
+from benchmarks.synth import pa_records, synth_statcast, synth_weather
+from models.eval_engine import evaluate, field_codes
+from models.train_xgb import build_model
+from processing.feature_engineering import (LAYOUTS, PARK_ORIENT_CSV, add_wind, category_vocab,
+                                            engineer, peak_rss_mb)
+from utils.request_helper import FeatureEncoder, build_payload
+from utils.scoring import make_backend
+from utils.shap_engine import ExplanationEngine
+
+SLICES = ["home_team", "month", "pitch_type", "stand", "p_throws"]
+
+
+class Timer:
+    """Collects ``{stage: {"wall_s", "rows", "rows_per_s", ...}}`` for one scale."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, name: str, rows: int, fn, *args, **kw):
+        t0 = time.perf_counter()
+        out = fn(*args, **kw)
+        wall = time.perf_counter() - t0
+        self.stages[name] = {"wall_s": wall, "rows": rows, "rows_per_s": rows / wall if wall else 0.0}
+        if name.startswith(("build_payload", "score_one")):
+            self.stages[name]["per_pa_us"] = wall / rows * 1e6
+        print(f"  {name:<22}{rows:>10,} rows {wall:>9.3f}s {rows / wall if wall else 0:>13,.0f} rows/s")
+        return out
+
+
+def _fit(X_train, y_train, vocab, trees):
+    model = build_model(y_train, categorical=bool(vocab), n_estimators=trees)
+    model.fit(X_train, y_train)
+    return model
+
+
+def _score_one(encoder, backend, records):
+    for raw in records:
+        backend.predict(encoder.encode_one(raw))
+
+
+def _score_batch(encoder, backend, records):
+    return backend.predict(encoder.encode(records))
+
+
+def _payload_path(model_path, model, records):
+    """What the API did per PA before the encoder: payload dict -> 1-row frame -> sklearn."""
+    for raw in records:
+        model.predict_proba(pd.DataFrame([build_payload(model_path, **raw)]))
+
+
+def bench_scale(n: int, args, tmp: str) -> dict:
+    print(f"\n{n:,} pitches")
+    t = Timer()
+    raw = t.run("synth", n, lambda: synth_statcast(n, args.seed))
+    weather = synth_weather(raw["game_pk"], args.seed)
+    orient = pd.read_csv(PARK_ORIENT_CSV)
+
+    feats = t.run("features", n, lambda: engineer(add_wind(raw, weather, orient), layout=args.layout))
+    y = feats.pop("is_hr")
+    vocab = category_vocab(feats)
+    X_train, X_val, y_train, y_val = train_test_split(
+        feats, y, test_size=0.2, random_state=42, stratify=y
+    )
+    model = t.run("train", len(X_train), _fit, X_train, y_train, vocab, args.trees)
+    if vocab:
+        import json
+        model.get_booster().set_attr(category_vocab=json.dumps(vocab))
+    model_path = os.path.join(tmp, f"model_{n}.pkl")
+    joblib.dump(model, model_path)
+
+    encoder = FeatureEncoder.from_model(model)
+    backend = make_backend("inplace", model)
+
+    def _evaluate():
+        p = backend.predict(encoder.encode_frame(X_val))
+        slices = {f: field_codes(X_val, f) for f in SLICES}
+        report = evaluate(p, y_val.to_numpy(), slices, replicates=args.bootstrap,
+                          workers=args.workers, min_rows=50)
+        return p, report
+    p_val, report = t.run("evaluate", len(X_val), _evaluate)
+
+    import shap
+    X_shap = encoder.encode_frame(X_val.iloc[:args.shap_rows])
+    engine = ExplanationEngine(shap.TreeExplainer(model), encoder.feature_names, cache_size=0)
+    t.run("shap", len(X_shap), engine.shap_values, X_shap)
+
+    n_bip = int(raw["launch_speed"].notna().sum())
+    records = pa_records(raw, n_bip, args.seed)
+    few = records[:args.payload_rows]
+    _payload_path(model_path, model, few[:1])          # unpickles once (lru_cache), like a warm API
+    t.run("build_payload", len(few), _payload_path, model_path, model, few)
+    for name in args.backends:
+        try:
+            b = make_backend(name, model)
+        except NotImplementedError as e:            # compiled + categorical splits
+            print(f"  [warn] {name}: {e}")
+            continue
+        b.predict(encoder.encode(few[:8]))           # warm-up
+        t.run(f"score_one_{name}", len(few), _score_one, encoder, b, few)
+        t.run(f"score_batch_{name}", len(records), _score_batch, encoder, b, records)
+
+    return {
+        "pitches": n,
+        "pas": int(raw["events"].notna().sum()),
+        "features": feats.shape[1],
+        "val_auc": float(roc_auc_score(y_val, p_val)),
+        "val_logloss": report["overall"]["logloss"]["value"],
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": t.stages,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                    help="pitches of synthetic data per run")
+    ap.add_argument("--layout", default="onehot", choices=LAYOUTS)
+    ap.add_argument("--trees", type=int, default=200)
+    ap.add_argument("--bootstrap", type=int, default=200, help="bootstrap replicates in evaluate")
+    ap.add_argument("--workers", type=int, default=1, help="evaluate processes")
+    ap.add_argument("--shap-rows", type=int, default=2_000)
+    ap.add_argument("--payload-rows", type=int, default=2_000, help="PAs for the per-PA paths")
+    ap.add_argument("--backends", nargs="+", default=["inplace", "compiled"])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="result file (default benchmarks/results/pipeline-<commit>.json)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline.") as tmp:
+        results = {str(n): bench_scale(n, args, tmp) for n in args.scales}
+    out = write_results("pipeline", results, {k: v for k, v in vars(args).items() if k != "json"},
+                        args.json)
+    print(f"✅ wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
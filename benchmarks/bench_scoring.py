@@ -0,0 +1,105 @@
+"""
+Parity check + latency/throughput benchmark for the scoring backends.
+
+Usage
+-----
+python -m benchmarks.bench_scoring [--features data/features_2024.parquet]
+                                   [--model models/hr_model.pkl]
+                                   [--backends sklearn inplace compiled]
+                                   [--sizes 1 10 100 1000 10000 100000]
+
+Every backend is first compared against ``XGBClassifier.predict_proba`` on
+the pandas frame (the old serving path); the run exits non-zero if any
+backend differs by more than ``--tol``.  The same parity is asserted by
+``tests/test_scoring_parity.py``; measured latencies are listed in
+``utils/scoring.py``.
+"""
+import argparse, json, sys, time, joblib, numpy as np, pandas as pd
+from processing.feature_engineering import apply_vocab
+from utils.request_helper import FeatureEncoder
+from utils.scoring import BACKENDS, make_backend
+
+
+def load_matrix(features_path: str, model, n_rows: int) -> pd.DataFrame:
+    """Feature frame in the model's column order, resampled to ``n_rows``."""
+    booster = model.get_booster()
+    df = pd.read_parquet(features_path, columns=booster.feature_names)
+    vocab = booster.attr("category_vocab")
+    if vocab:                                # categorical layout: training categories
+        df = apply_vocab(df, json.loads(vocab))
+    return df.sample(n_rows, replace=len(df) < n_rows, random_state=0).reset_index(drop=True)
+
+
+def time_backend(backend, X: np.ndarray, size: int, budget_s: float) -> dict:
+    """Median wall time of repeated ``predict`` calls on ``size`` rows."""
+    batch = np.ascontiguousarray(X[:size])
+    backend.predict(batch)                               # warm-up
+    times, spent = [], 0.0
+    while spent < budget_s or len(times) < 3:
+        t0 = time.perf_counter()
+        backend.predict(batch)
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        spent += dt
+        if len(times) >= 1000:
+            break
+    med = float(np.median(times))
+    return {
+        "backend": backend.name,
+        "batch_size": size,
+        "median_ms": med * 1e3,
+        "per_row_us": med / size * 1e6,
+        "rows_per_s": size / med,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--features", default="data/features_2024.parquet")
+    ap.add_argument("--model", default="models/hr_model.pkl")
+    ap.add_argument("--backends", nargs="+", default=sorted(BACKENDS))
+    ap.add_argument("--sizes", nargs="+", type=int, default=[1, 10, 100, 1_000, 10_000, 100_000])
+    ap.add_argument("--budget", type=float, default=1.0, help="seconds per (backend, size)")
+    ap.add_argument("--tol", type=float, default=1e-5)
+    ap.add_argument("--json", help="optional path for machine-readable results")
+    args = ap.parse_args()
+
+    model = joblib.load(args.model)
+    df = load_matrix(args.features, model, max(args.sizes))
+    X = FeatureEncoder.from_model(model).encode_frame(df)   # either feature layout
+
+    # ---------- parity against predict_proba ----------
+    parity_rows = df.iloc[:10_000]
+    ref = model.predict_proba(parity_rows)[:, 1]
+    backends, failed = [], False
+    for name in args.backends:
+        try:
+            b = make_backend(name, model)
+        except NotImplementedError as e:              # compiled + categorical model
+            print(f"parity {name:<9} skipped: {e}")
+            continue
+        err = float(np.abs(b.predict(X[:len(parity_rows)]) - ref).max())
+        ok = err <= args.tol
+        failed |= not ok
+        print(f"parity {name:<9} max|Δp| = {err:.2e}  {'ok' if ok else 'FAIL'}")
+        backends.append(b)
+
+    # ---------- latency / throughput ----------
+    results = []
+    print(f"\n{'backend':<9} {'batch':>7} {'median ms':>10} {'µs/row':>9} {'rows/s':>12}")
+    for size in args.sizes:
+        for b in backends:
+            r = time_backend(b, X, size, args.budget)
+            results.append(r)
+            print(f"{r['backend']:<9} {size:>7} {r['median_ms']:>10.3f} "
+                  f"{r['per_row_us']:>9.2f} {r['rows_per_s']:>12,.0f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"✅ wrote {args.json}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+API cold start: import time and time to first prediction per startup mode.
+
+Usage
+-----
+python -m benchmarks.bench_startup [--config serve/config.json]
+                                   [--model models/hr_model.pkl] [--artifact DIR]
+                                   [--modes pickle-eager pickle-lazy compiled compiled-bg]
+                                   [--repeats 3] [--json startup.json]
+
+Every run is a fresh process, so nothing is warm except the OS page cache:
+
+* ``python -X importtime -c "import serve.inference_api"``: total import
+  (which includes building the model bundle) and the cumulative cost of
+  the heavy packages (shap, xgboost, sklearn, pandas, ...); measured with
+  a lazy explainer for ``compiled-bg``, whose warmup thread runs after import
+* a uvicorn worker polled over HTTP: seconds from spawn until ``/healthz``
+  answers, until the first ``/predict`` returns and until the first
+  ``/explain`` returns, plus the worker's own ``model_load_timings``
+
+Modes (each one overrides the base config):
+
+* ``pickle-eager``   joblib pickle, shap + explainer built at startup (the old path)
+* ``pickle-lazy``    joblib pickle, explainer built on the first ``/explain``
+* ``compiled``       version-stamped artifact, mmapped compiled trees, lazy explainer
+* ``compiled-bg``    as ``compiled``, explainer warmed on a background thread
+
+Without ``--artifact`` the model is exported to a temp directory first.
+"""
+import argparse, json, os, re, socket, subprocess, sys, tempfile, time
+import urllib.error, urllib.request
+import numpy as np
+
+from serve.model_store import read_config
+from utils.artifacts import read_meta
+
+HEAVY = ("shap", "sklearn", "scipy", "xgboost", "pandas", "pyarrow", "fastapi", "joblib")
+PA = {"launch_speed": 104.0, "launch_angle": 27.0, "balls": 1, "strikes": 1,
+      "stand": "R", "p_throws": "R", "pitch_type": "FF", "inning": 5, "month": 6}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def mode_config(base: dict, mode: str, artifact: str, pickle_backend: str) -> dict:
+    cfg = {**base, "reload_poll_secs": 3600}
+    if mode.startswith("pickle"):
+        cfg.pop("artifact_dir", None)
+        cfg["scoring_backend"] = pickle_backend
+    else:
+        cfg.update(artifact_dir=artifact, scoring_backend="compiled",
+                   model_version=read_meta(artifact)["model_version"])
+    warmup = {"pickle-eager": "eager", "compiled-bg": "background"}.get(mode, "lazy")
+    cfg["explainer"] = {**cfg.get("explainer", {}), "warmup": warmup}
+    return cfg
+
+
+# ---------------------------------------------------------------------
+# Import cost
+# ---------------------------------------------------------------------
+def import_times(env: dict) -> dict:
+    """Seconds for the whole import and, per heavy package, where it was first imported."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import serve.inference_api"],
+                         env=env, capture_output=True, text=True, check=True).stderr
+    total, heavy = 0, {}
+    for line in out.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m is None:
+            continue
+        cumulative, depth, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if depth == 1:
+            total += cumulative
+        if name in HEAVY and name not in heavy:
+            heavy[name] = cumulative / 1e6
+    return {"import_s": total / 1e6, "packages_s": heavy}
+
+
+# ---------------------------------------------------------------------
+# Spawn -> /healthz -> first /predict -> first /explain
+# ---------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _call(url: str, body: dict = None, timeout: float = 60.0) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data, {"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def cold_start(env: dict, timeout: float) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "serve.inference_api:app",
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"worker exited with {proc.returncode}")
+            if time.perf_counter() - t0 > timeout:
+                raise TimeoutError(f"no /healthz after {timeout:.0f}s")
+            try:
+                _call(f"{url}/healthz", timeout=1.0)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        listen = time.perf_counter() - t0
+
+        _call(f"{url}/predict", PA)
+        first_predict = time.perf_counter() - t0
+        ready = _call(f"{url}/readyz")
+
+        t1 = time.perf_counter()
+        _call(f"{url}/explain?top_n=5", PA, timeout=timeout)
+        first_explain = time.perf_counter() - t0
+        stats = _call(f"{url}/stats")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "listen_s": listen,
+        "first_predict_s": first_predict,
+        "first_explain_s": first_explain,
+        "explain_call_s": first_explain - (t1 - t0),
+        "explainer_at_first_predict": ready["explainer"],
+        "model_load_timings": stats["model_load_timings"],
+        "rss_mb": stats["worker"].get("rss_mb"),
+    }
+
+
+def _median(runs: list, key: str) -> float:
+    return float(np.median([r[key] for r in runs]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", default="serve/config.json", help="base config; modes override it")
+    ap.add_argument("--model", default="models/hr_model.pkl")
+    ap.add_argument("--artifact", help="exported artifact dir (default: export --model to a temp dir)")
+    ap.add_argument("--modes", nargs="+", default=["pickle-eager", "pickle-lazy", "compiled", "compiled-bg"])
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--json", help="optional path for machine-readable results")
+    args = ap.parse_args()
+
+    base = read_config(args.config)
+    base["model_path"] = args.model
+    pickle_backend = base.get("scoring_backend", "inplace")
+    if pickle_backend == "compiled":
+        pickle_backend = "inplace"              # pickle modes compile nothing at startup
+    tmp = tempfile.TemporaryDirectory(prefix="bench_startup.")
+    artifact = args.artifact
+    if artifact is None and any(not m.startswith("pickle") for m in args.modes):
+        import joblib
+        from utils.artifacts import export_artifact
+        artifact = str(export_artifact(joblib.load(args.model), "bench-startup",
+                                       root=tmp.name, source=args.model))
+
+    results = {}
+    print(f"{'mode':<14}{'import':>9}{'listen':>9}{'1st predict':>13}{'1st explain':>13}"
+          f"{'explain call':>14}{'RSS MB':>9}")
+    for mode in args.modes:
+        quiet = "compiled" if mode == "compiled-bg" else mode   # import without the warmup thread
+        env = {}
+        for name in {mode, quiet}:
+            cfg_path = os.path.join(tmp.name, f"{name}.json")
+            with open(cfg_path, "w") as fh:
+                json.dump(mode_config(base, name, artifact, pickle_backend), fh, indent=2)
+            env[name] = {**os.environ, "HR_CONFIG": cfg_path, "PYTHONWARNINGS": "ignore"}
+
+        imports = [import_times(env[quiet]) for _ in range(args.repeats)]
+        runs = [cold_start(env[mode], args.timeout) for _ in range(args.repeats)]
+        res = {
+            "import_s": _median(imports, "import_s"),
+            "packages_s": {k: float(np.median([i["packages_s"].get(k, 0.0) for i in imports]))
+                           for k in HEAVY if any(k in i["packages_s"] for i in imports)},
+            **{k: _median(runs, k) for k in ("listen_s", "first_predict_s",
+                                             "first_explain_s", "explain_call_s", "rss_mb")},
+            "runs": runs,
+        }
+        results[mode] = res
+        print(f"{mode:<14}{res['import_s']:>8.2f}s{res['listen_s']:>8.2f}s"
+              f"{res['first_predict_s']:>12.2f}s{res['first_explain_s']:>12.2f}s"
+              f"{res['explain_call_s']:>13.2f}s{res['rss_mb']:>9.0f}")
+    for mode, res in results.items():
+        heavy = ", ".join(f"{k} {v:.2f}s" for k, v in res["packages_s"].items())
+        print(f"  {mode}: {heavy}")
+    tmp.cleanup()
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"✅ wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Async load generator for the scoring API.
+
+Usage
+-----
+python -m benchmarks.loadgen --url http://127.0.0.1:10000
+                             [--endpoints predict predict_batch explain_batch]
+                             [--concurrency 32] [--duration 10] [--warmup 2]
+                             [--batch-size 100] [--explain-batch-size 20] [--rate RPS]
+python -m benchmarks.loadgen --spawn [--config serve/config.json] ...
+
+Every endpoint gets one untimed request (which builds a lazy explainer),
+then is driven on its own for ``--warmup`` + ``--duration`` seconds by
+``--concurrency`` coroutines on one keep-alive aiohttp session.
+Request bodies are serialised up front from ``benchmarks.synth`` PAs
+(``--pool`` distinct PAs, so the result cache sees realistic reuse, not
+one repeated PA), so client-side JSON work is not in the timings.
+
+Closed loop (default): each coroutine sends its next request as soon as
+the last one returns; throughput is what the server sustains at that
+concurrency.  Open loop (``--rate``): requests are scheduled at a fixed
+rate and latency counts from the scheduled send time, so a server that
+falls behind shows its queueing delay instead of silently slowing the
+client down.
+
+Reported per endpoint: requests, errors by status, requests/s, PAs/s and
+client latency p50/p90/p99/p99.9/max in ms, plus the worker's own view
+(``/stats`` latency) after the run.  ``--spawn`` starts a local uvicorn
+worker on a free port (client and server then share this machine's
+CPUs; for clean numbers run the API elsewhere or pin them apart).
+"""
+import argparse, asyncio, json, os, socket, subprocess, sys, time, aiohttp, numpy as np
+
+from benchmarks.results import write_results
+from benchmarks.synth import pa_records, synth_statcast
+
+ENDPOINTS = ("predict", "predict_batch", "explain_batch")
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def request_bodies(endpoint: str, records: list, batch_size: int, explain_batch_size: int) -> list:
+    """Pre-encoded JSON bodies for ``endpoint``, cycling through ``records``."""
+    if endpoint == "predict":
+        return [json.dumps(r).encode() for r in records]
+    size = batch_size if endpoint == "predict_batch" else explain_batch_size
+    return [json.dumps({"data": records[i:i + size]}).encode()
+            for i in range(0, len(records) - size + 1, size)]
+
+
+def summarize(latencies: list, statuses: dict, wall: float, pas_per_request: int) -> dict:
+    lat = np.asarray(latencies) * 1e3
+    ok = statuses.get(200, 0)
+    out = {
+        "requests": len(latencies),
+        "errors": {str(k): v for k, v in statuses.items() if k != 200},
+        "requests_per_s": ok / wall,
+        "pas_per_s": ok * pas_per_request / wall,
+    }
+    if len(lat):
+        out.update({f"p{str(p).replace('.', '_')}_ms": float(np.percentile(lat, p)) for p in PERCENTILES})
+        out.update(mean_ms=float(lat.mean()), max_ms=float(lat.max()))
+    return out
+
+
+async def drive(session: aiohttp.ClientSession, url: str, bodies: list, concurrency: int,
+                duration: float, warmup: float, rate: float = None) -> tuple:
+    """Run one endpoint; returns ``(latencies_s, {status: count}, measured wall seconds)``."""
+    latencies, statuses = [], {}
+    headers = {"Content-Type": "application/json"}
+    start = time.perf_counter()
+    measure_from, stop = start + warmup, start + warmup + duration
+    counter = iter(range(1 << 62))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(body: bytes, t0: float):
+        try:
+            async with session.post(url, data=body, headers=headers) as resp:
+                await resp.read()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status = 0                              # connection error / timeout
+        if t0 >= measure_from:
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def closed_loop():
+        while (t0 := time.perf_counter()) < stop:
+            await send(bodies[next(counter) % len(bodies)], t0)
+
+    async def open_loop():
+        tasks, interval = [], 1.0 / rate
+        for i in counter:
+            due = start + i * interval
+            if due >= stop:
+                break
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+            async def one(body=bodies[i % len(bodies)], due=due):
+                async with slots:                   # cap on connections, not on the schedule
+                    await send(body, due)
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+
+    if rate:
+        await open_loop()
+    else:
+        await asyncio.gather(*(closed_loop() for _ in range(concurrency)))
+    return latencies, statuses, max(time.perf_counter(), stop) - measure_from
+
+
+# ---------------------------------------------------------------------
+# Optional local worker
+# ---------------------------------------------------------------------
+def spawn_api(config: str) -> tuple:
+    """Start ``uvicorn serve.inference_api:app`` on a free port; ``(process, base_url)``."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "serve.inference_api:app",
+         "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "HR_CONFIG": config}, stdout=subprocess.DEVNULL,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, proc, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"❗ API worker exited with {proc.returncode}")
+        try:
+            async with session.get(f"{url}/readyz") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit(f"❗ {url}/readyz not ready after {timeout:.0f}s")
+
+
+async def run(args) -> dict:
+    raw = synth_statcast(max(args.pool * 6, 10_000), args.seed)
+    records = pa_records(raw, args.pool, args.seed)
+    proc, url = spawn_api(args.config) if args.spawn else (None, args.url.rstrip("/"))
+    results = {}
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await wait_ready(session, url, proc, args.timeout)
+            for endpoint in args.endpoints:
+                bodies = request_bodies(endpoint, records, args.batch_size, args.explain_batch_size)
+                per_request = {"predict": 1, "predict_batch": args.batch_size}.get(
+                    endpoint, args.explain_batch_size)
+                # one untimed call first: a lazy explainer is built here, not in the warmup
+                async with session.post(f"{url}/{endpoint}", data=bodies[0],
+                                        headers={"Content-Type": "application/json"}) as resp:
+                    await resp.read()
+                lat, statuses, wall = await drive(session, f"{url}/{endpoint}", bodies,
+                                                  args.concurrency, args.duration, args.warmup, args.rate)
+                res = summarize(lat, statuses, wall, per_request)
+                async with session.get(f"{url}/stats") as resp:
+                    stats = await resp.json()
+                res["server"] = stats.get("latency", {}).get(f"/{endpoint}")
+                results[endpoint] = res
+                if not res["requests"]:
+                    print(f"[warn] {endpoint}: no request started in the measured window; "
+                          "raise --duration or lower --concurrency")
+                err = sum(res["errors"].values())
+                print(f"{endpoint:<15}{res['requests']:>8,} req {res['requests_per_s']:>9,.0f} req/s "
+                      f"{res['pas_per_s']:>10,.0f} PA/s   p50 {res.get('p50_ms', 0):>7.1f}  "
+                      f"p99 {res.get('p99_ms', 0):>7.1f}  max {res.get('max_ms', 0):>7.1f} ms"
+                      + (f"   ❗ {err} errors {res['errors']}" if err else ""))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--spawn", action="store_true", help="start a local API worker for the run")
+    ap.add_argument("--config", default=os.getenv("HR_CONFIG", "serve/config.json"),
+                    help="config for --spawn")
+    ap.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    ap.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    ap.add_argument("--duration", type=float, default=10.0, help="measured seconds per endpoint")
+    ap.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds first")
+    ap.add_argument("--rate", type=float, help="open loop: target requests/s (default: closed loop)")
+    ap.add_argument("--batch-size", type=int, default=100, help="PAs per /predict_batch request")
+    ap.add_argument("--explain-batch-size", type=int, default=20, help="PAs per /explain_batch request")
+    ap.add_argument("--pool", type=int, default=20_000, help="distinct synthetic PAs")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="result file (default benchmarks/results/loadgen-<commit>.json)")
+    args = ap.parse_args()
+
+    results = asyncio.run(run(args))
+    params = {k: v for k, v in vars(args).items() if k not in ("json", "url", "timeout")}
+    out = write_results("loadgen", results, params, args.json)
+    print(f"✅ wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
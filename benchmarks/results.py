@@ -0,0 +1,134 @@
+"""
+Benchmark result files and regression comparison.
+
+Usage
+-----
+python -m benchmarks.results OLD.json NEW.json [--threshold 0.10]
+
+``write_results`` stores one benchmark run as JSON together with the
+commit it ran on (``git rev-parse``, plus whether the tree was dirty),
+package versions and machine info, by default as
+``benchmarks/results/<bench>-<commit>.json``, so runs of different commits
+sit side by side.
+
+``compare`` walks two such files and lines up every numeric leaf.  Keys
+ending in ``_s`` / ``_ms`` / ``_us`` are timings (lower is better); keys
+ending in ``per_s`` / ``rps`` are throughputs (higher is better); other
+numbers are shown only with ``--all``.  The CLI exits 1 when any timing
+or throughput got worse by more than ``--threshold``.
+"""
+import argparse, json, os, pathlib, platform, subprocess, sys, time
+from typing import Dict, Optional
+
+RESULTS_DIR = "benchmarks/results"
+PACKAGES = ("numpy", "pandas", "pyarrow", "xgboost", "shap", "fastapi", "aiohttp")
+LOWER = ("_s", "_ms", "_us")
+HIGHER = ("per_s", "rps")
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def run_meta() -> dict:
+    """Commit, interpreter, package versions and machine of this run."""
+    from importlib import metadata
+    versions = {}
+    for pkg in PACKAGES:
+        try:
+            versions[pkg] = metadata.version(pkg)
+        except metadata.PackageNotFoundError:
+            versions[pkg] = None
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "packages": versions,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv,
+    }
+
+
+def write_results(bench: str, results: dict, params: dict, path: Optional[str] = None) -> pathlib.Path:
+    """Write ``{"bench", "meta", "params", "results"}``; returns the path."""
+    meta = run_meta()
+    out = pathlib.Path(path or f"{RESULTS_DIR}/{bench}-{meta['commit'] or 'nogit'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump({"bench": bench, "meta": meta, "params": params, "results": results},
+                  fh, indent=2, default=float)
+    return out
+
+
+# ---------------------------------------------------------------------
+# Regression check between two runs
+# ---------------------------------------------------------------------
+def _leaves(node, prefix: str = "") -> Dict[str, float]:
+    if isinstance(node, dict):
+        out = {}
+        for k, v in node.items():
+            out.update(_leaves(v, f"{prefix}.{k}" if prefix else str(k)))
+        return out
+    if isinstance(node, (int, float)) and not isinstance(node, bool):
+        return {prefix: float(node)}
+    return {}                                   # lists (raw samples, per-run detail) are skipped
+
+
+def direction(key: str) -> int:
+    """+1 if bigger is better, -1 if smaller is better, 0 if neither."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith(HIGHER):
+        return 1
+    if leaf.endswith(LOWER):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float = 0.10) -> list:
+    """``(key, old, new, change, regressed)`` for every metric present in both runs."""
+    a, b = _leaves(old["results"]), _leaves(new["results"])
+    rows = []
+    for key in a.keys() & b.keys():
+        sign = direction(key)
+        change = (b[key] - a[key]) / a[key] if a[key] else 0.0
+        rows.append((key, a[key], b[key], change, sign != 0 and -sign * change > threshold))
+    return sorted(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    ap.add_argument("--all", action="store_true", help="also list counts and other undirected numbers")
+    args = ap.parse_args()
+
+    with open(args.old) as fh:
+        old = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    if old.get("bench") != new.get("bench"):
+        raise SystemExit(f"❗ {args.old} is a {old.get('bench')} run, {args.new} a {new.get('bench')} run")
+    if old.get("params") != new.get("params"):
+        print("[warn] the runs used different parameters; only like-for-like numbers are meaningful")
+
+    rows = compare(old, new, args.threshold)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}  ({old['bench']}, threshold {args.threshold:.0%})")
+    for key, a, b, change, regressed in rows:
+        if direction(key) == 0 and not args.all:
+            continue
+        flag = "  ❗" if regressed else ""
+        print(f"  {key:<60}{a:>12.4g}{b:>12.4g}{change:>+9.1%}{flag}")
+    bad = sum(r[4] for r in rows)
+    print(f"{bad} regression(s)" if bad else "no regressions")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
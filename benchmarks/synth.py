@@ -0,0 +1,187 @@
+"""
+Synthetic Statcast-shaped data for benchmarks, at any size.
+
+Usage
+-----
+python -m benchmarks.synth --pitches 1000000 --out data/synth/statcast.parquet
+                           [--weather data/synth/weather.parquet] [--seed 0]
+
+``synth_statcast`` returns pitch-level rows with the raw columns
+``processing/feature_engineering.py`` reads (``BASIC_KEEP`` minus the wind
+column, plus ``game_pk`` / ``at_bat_number`` / ``pitch_number`` for
+``processing.rolling``): games of ~76 PAs between the parks in
+``utils/park_factors.csv``, ~3.9 pitches per PA with a running count,
+batted-ball speed/angle and an ``events`` value on each PA's last pitch.
+Marginals (handedness, pitch mix, inning, speed/angle spread) come from
+``pa_samples.csv``; the HR chance rises with exit velocity, peaks near a
+28 degree launch angle and scales with the park's ``hr_index`` (about
+2.5% of PAs), so a model trained on it has something to learn.  ``synth_weather`` gives the matching
+``data/weather_2024.parquet``-shaped table for ``add_wind``.
+
+Everything is vectorised NumPy and seeded: the same ``(n, seed)`` always
+gives the same frame.
+"""
+import argparse, pathlib, numpy as np, pandas as pd
+
+SAMPLES_CSV = "pa_samples.csv"
+PARKS_CSV = "utils/park_factors.csv"
+# every pitch type the production model knows; ones absent from the
+# samples still show up now and then, like in a real season
+PITCH_TYPES = ["FF", "SI", "SL", "FC", "ST", "CU", "CH", "FS", "KC", "SV",
+               "CS", "EP", "FA", "FO", "KN", "SC", "PO"]
+PITCH_FLOOR = 0.003
+PAS_PER_GAME = 76
+SEASON = ("2024-03-28", "2024-09-29")
+N_BATTERS, N_PITCHERS = 750, 650
+
+
+def sample_marginals(path: str = SAMPLES_CSV) -> dict:
+    """Frequencies and spreads of the raw PA fields in ``pa_samples.csv``."""
+    s = pd.read_csv(path)
+    pitch = s["pitch_type"].value_counts(normalize=True).reindex(PITCH_TYPES, fill_value=0.0)
+    pitch = (pitch + PITCH_FLOOR) / (pitch + PITCH_FLOOR).sum()
+    return {
+        "stand_R": float((s["stand"] == "R").mean()),
+        "p_throws_R": float((s["p_throws"] == "R").mean()),
+        "pitch_type": pitch.to_numpy(),
+        "speed": (float(s["launch_speed"].mean()), float(s["launch_speed"].std())),
+        "angle": (float(s["launch_angle"].mean()), float(s["launch_angle"].std())),
+        "extra_innings": float((s["inning"] > 9).mean()),
+    }
+
+
+def _within(starts: np.ndarray, n: int) -> np.ndarray:
+    """Position of every element inside its group (groups begin at ``starts``)."""
+    idx = np.arange(n)
+    return idx - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+
+def synth_statcast(n_pitches: int, seed: int = 0, samples: str = SAMPLES_CSV,
+                   parks: str = PARKS_CSV) -> pd.DataFrame:
+    """``n_pitches`` rows of raw pitch-level data (see module docstring)."""
+    rng = np.random.default_rng(seed)
+    m = sample_marginals(samples)
+    park = pd.read_csv(parks, encoding="utf-8-sig")
+    teams, hr_index = park["home_team"].to_numpy(), park["hr_index"].to_numpy() / 100
+
+    # ---- plate appearances -------------------------------------------
+    n_pa = int(np.ceil(n_pitches / 3.9)) + 1
+    n_pitch = rng.integers(1, 8, n_pa)                       # mean ~4 pitches per PA
+    n_pa = int(np.searchsorted(np.cumsum(n_pitch), n_pitches) + 1)
+    n_pitch = n_pitch[:n_pa]
+    n_pitch[-1] -= n_pitch.sum() - n_pitches                 # exactly n_pitches rows
+
+    slot = np.arange(n_pa) % PAS_PER_GAME
+    game = np.arange(n_pa) // PAS_PER_GAME
+    n_games = int(game[-1]) + 1
+    home = rng.integers(0, len(teams), n_games)
+    away = (home + rng.integers(1, len(teams), n_games)) % len(teams)
+    days = (pd.Timestamp(SEASON[1]) - pd.Timestamp(SEASON[0])).days + 1
+    day = np.sort(rng.integers(0, days, n_games))           # game_pk order = date order
+    date = (pd.Timestamp(SEASON[0]) + pd.to_timedelta(day, "D")).strftime("%Y-%m-%d").to_numpy()
+
+    inning = 1 + slot * 9 // PAS_PER_GAME
+    extra = rng.random(n_games) < m["extra_innings"]
+    inning = np.where(extra[game] & (slot >= PAS_PER_GAME - 8), 10 + (slot % 8) // 2, inning)
+    bottom = (slot * 18 // PAS_PER_GAME) % 2                 # half inning: home team bats
+    batters = 400_000 + rng.permutation(N_BATTERS * 4)[:N_BATTERS]
+    pitchers = 500_000 + rng.permutation(N_PITCHERS * 4)[:N_PITCHERS]
+    lineup = rng.integers(0, N_BATTERS, (n_games, 2, 9))
+    staff = rng.integers(0, N_PITCHERS, (n_games, 2))
+    batter_i = lineup[game, bottom, slot % 9]
+    pitcher_i = staff[game, 1 - bottom]
+    stand = np.where(rng.random(N_BATTERS) < m["stand_R"], "R", "L")[batter_i]
+    throws = np.where(rng.random(N_PITCHERS) < m["p_throws_R"], "R", "L")[pitcher_i]
+
+    # last pitch of each PA: ball in play / strikeout / walk
+    outcome = rng.random(n_pa)
+    in_play = outcome < 0.68
+    speed = np.clip(rng.normal(*m["speed"], n_pa), 20.0, 121.0).round(1)
+    angle = np.clip(rng.normal(*m["angle"], n_pa), -90.0, 90.0).round(0)
+    logit = -1.8 + 0.45 * (speed - 100.0) - 0.008 * (angle - 28.0) ** 2
+    p_hr = hr_index[home[game]] / (1.0 + np.exp(-logit))
+    hr = in_play & (rng.random(n_pa) < p_hr)
+    hit = rng.choice(np.array(["field_out", "single", "double", "triple", "grounded_into_double_play"]),
+                     n_pa, p=[0.66, 0.22, 0.08, 0.01, 0.03])
+    events = np.where(hr, "home_run", np.where(in_play, hit,
+                      np.where(outcome < 0.91, "strikeout", "walk")))
+
+    # ---- pitches --------------------------------------------------------
+    starts = np.r_[0, np.cumsum(n_pitch)[:-1]]
+    pa_of = np.repeat(np.arange(n_pa), n_pitch)
+    pitch_number = _within(starts, n_pitches) + 1
+    last = pitch_number == n_pitch[pa_of]
+    is_ball = rng.random(n_pitches) < 0.45
+    before = np.cumsum(is_ball) - is_ball                    # balls thrown before this pitch
+    balls = np.minimum(before - before[starts][pa_of], 3)
+    strikes = np.minimum(pitch_number - 1 - balls, 2)
+
+    df = pd.DataFrame({
+        "game_pk": (800_000 + game)[pa_of],
+        "game_date": date[game][pa_of],
+        "at_bat_number": (slot + 1)[pa_of],
+        "pitch_number": pitch_number,
+        "batter": batters[batter_i][pa_of],
+        "pitcher": pitchers[pitcher_i][pa_of],
+        "stand": stand[pa_of],
+        "p_throws": throws[pa_of],
+        "pitch_type": rng.choice(np.array(PITCH_TYPES), n_pitches, p=m["pitch_type"]),
+        "balls": balls.astype("int64"),
+        "strikes": strikes.astype("int64"),
+        "inning": inning[pa_of],
+        "launch_speed": np.where(last & in_play[pa_of], speed[pa_of], np.nan),
+        "launch_angle": np.where(last & in_play[pa_of], angle[pa_of], np.nan),
+        "home_team": teams[home][game][pa_of],
+        "away_team": teams[away][game][pa_of],
+        "events": pd.Series(np.where(last, events[pa_of], None), dtype=object),
+    })
+    # Savant lists each game's pitches newest first
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def synth_weather(game_pks, seed: int = 0) -> pd.DataFrame:
+    """One row per game, ``data/weather_2024.parquet`` columns."""
+    rng = np.random.default_rng(seed + 1)
+    game_pks = np.unique(np.asarray(game_pks))
+    n = len(game_pks)
+    return pd.DataFrame({
+        "temp_F": rng.normal(74.0, 10.0, n).round(1),
+        "wind_speed_mph": rng.gamma(2.2, 3.5, n).round(1),
+        "wind_dir_deg": rng.integers(0, 360, n).astype(float),
+        "game_pk": game_pks.astype("int64"),
+    })
+
+
+def pa_records(df: pd.DataFrame, n: int, seed: int = 0, players: bool = False) -> list:
+    """``n`` raw PA dicts (the API's ``RawPA`` fields) drawn from batted balls in ``df``."""
+    rng = np.random.default_rng(seed)
+    bip = df[df["launch_speed"].notna()]
+    rows = bip.iloc[rng.integers(0, len(bip), n)]
+    cols = ["launch_speed", "launch_angle", "balls", "strikes", "stand", "p_throws",
+            "pitch_type", "inning"] + (["batter", "pitcher"] if players else [])
+    out = rows[cols].assign(month=pd.to_datetime(rows["game_date"]).dt.month)
+    return out.to_dict("records")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pitches", type=int, default=1_000_000)
+    ap.add_argument("--out", default="data/synth/statcast.parquet")
+    ap.add_argument("--weather", help="also write the per-game weather table here")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    df = synth_statcast(args.pitches, args.seed)
+    out = pathlib.Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(out, index=False)
+    n_hr = int((df["events"] == "home_run").sum())
+    print(f"✅ wrote {out} ({len(df):,} pitches, {df['events'].notna().sum():,} PAs, "
+          f"{n_hr:,} HR, {df['game_pk'].nunique():,} games)")
+    if args.weather:
+        synth_weather(df["game_pk"], args.seed).to_parquet(args.weather, index=False)
+        print(f"✅ wrote {args.weather}")
+
+
+if __name__ == "__main__":
+    main()
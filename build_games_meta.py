@@ -4,28 +4,53 @@ Builds data/games_2024_meta.csv  (one row per game with game_pk, game_date, lat,
 
 Prerequisites
 -------------
-data/2024.parquet          – your raw Statcast file for the season
+data/2024.parquet          – your raw Statcast file (or partitioned dataset) for the season
 utils/park_latlon.csv      – table with home_team,lat,lon  (one row per MLB park)
+
+Only the three key columns are read, and an existing CSV is upserted:
+games already present keep their row unless their date/park changed,
+new games are appended.
 """
 
-import pandas as pd, pathlib
+import argparse, os, pandas as pd, pathlib
 
 STATCAST_PATH = "data/2024.parquet"
 PARK_LATLON   = "utils/park_latlon.csv"
 OUT_CSV       = "data/games_2024_meta.csv"
 
+KEY_COLS = ["game_pk", "game_date", "home_team"]
+
 def main():
-    sc = pd.read_parquet(STATCAST_PATH)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--statcast", default=STATCAST_PATH)
+    ap.add_argument("--out", default=OUT_CSV)
+    args = ap.parse_args()
+
+    sc = pd.read_parquet(args.statcast, columns=KEY_COLS)
     games = (
         sc.groupby("game_pk")
           .first()
-          .reset_index()[["game_pk", "game_date", "home_team"]]
+          .reset_index()[KEY_COLS]
     )
+    games["game_date"] = pd.to_datetime(games["game_date"]).dt.strftime("%Y-%m-%d")
     parks = pd.read_csv(PARK_LATLON)          # home_team, lat, lon
     games = games.merge(parks, on="home_team", how="left")
-    pathlib.Path("data").mkdir(exist_ok=True)
-    games.to_csv(OUT_CSV, index=False)
-    print(f"✅ wrote {OUT_CSV}  ({len(games)} games)")
+
+    n_new, n_changed = len(games), 0
+    if os.path.exists(args.out):
+        old = pd.read_csv(args.out)
+        merged = games.merge(old[KEY_COLS], on="game_pk", how="left", suffixes=("", "_old"))
+        is_new = merged["game_date_old"].isna()
+        n_new = int(is_new.sum())
+        n_changed = int((~is_new & ((merged["game_date"] != merged["game_date_old"]) |
+                                    (merged["home_team"] != merged["home_team_old"]))).sum())
+        # keep games no longer in this input (e.g. earlier seasons / partitions)
+        games = pd.concat([old[~old["game_pk"].isin(games["game_pk"])], games], ignore_index=True)
+        games = games.sort_values(["game_date", "game_pk"], kind="stable")
+
+    pathlib.Path(args.out).parent.mkdir(exist_ok=True, parents=True)
+    games.to_csv(args.out, index=False)
+    print(f"✅ wrote {args.out}  ({len(games)} games, {n_new} new, {n_changed} changed)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,4 @@
+# repo root on sys.path for `pytest` as well as `python -m pytest`
+# (utils/, models/, serve/ are imported as top-level packages)
+
+collect_ignore = ["test_vc.py"]     # manual Visual Crossing probe script, hits the network
@@ -1,17 +1,169 @@
 
-"""CLI to download Statcast events between two dates and store as Parquet."""
-import sys, pathlib, argparse
-from pybaseball import statcast
+"""CLI to download Statcast events between two dates and store as Parquet.
+
+Single file (original behaviour):
+    python data/download_statcast.py 2024-03-28 2024-10-01 --out data/2024.parquet
+
+Partitioned, incremental dataset:
+    python data/download_statcast.py 2024-03-28 yesterday --dataset data/statcast \\
+        [--chunk-days 7] [--workers 4] [--source pybaseball | fixtures:<dir>]
+
+Dataset mode fetches day-chunks in parallel and writes Hive partitions
+``season=YYYY/month=M/game_date=YYYY-MM-DD/part-0.parquet``.  Finished
+dates are recorded in ``<dataset>/_manifest.json``; a daily cron run with
+the same arguments only fetches dates that are not in the manifest yet.
+Today and later are never marked complete, since games may still be live.
+"""
+import sys, json, os, pathlib, argparse, datetime as dt
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 
+PARTITION_COLS = ["season", "month", "game_date"]
+MANIFEST = "_manifest.json"
+
+
+# ---------------------------------------------------------------------
+# Fetch sources
+# ---------------------------------------------------------------------
+class PybaseballSource:
+    """Live Baseball Savant pulls via ``pybaseball.statcast``."""
+
+    def fetch(self, start: str, end: str) -> pd.DataFrame:
+        from pybaseball import statcast          # heavy import, only when used
+        return statcast(start_dt=start, end_dt=end)
+
+
+class FixtureSource:
+    """Offline source: every .parquet/.csv under ``root``, filtered by date."""
+
+    def __init__(self, root: str):
+        files = sorted(pathlib.Path(root).glob("*.parquet")) + sorted(pathlib.Path(root).glob("*.csv"))
+        if not files:
+            raise FileNotFoundError(f"no .parquet/.csv fixtures in {root}")
+        frames = [pd.read_parquet(f) if f.suffix == ".parquet" else pd.read_csv(f) for f in files]
+        self.df = pd.concat(frames, ignore_index=True)
+        self.dates = pd.to_datetime(self.df["game_date"]).dt.strftime("%Y-%m-%d")
+
+    def fetch(self, start: str, end: str) -> pd.DataFrame:
+        return self.df[(self.dates >= start) & (self.dates <= end)].copy()
+
+
+def make_source(spec: str):
+    """``pybaseball`` or ``fixtures:<dir>``."""
+    name, _, arg = spec.partition(":")
+    if name == "pybaseball":
+        return PybaseballSource()
+    if name == "fixtures":
+        return FixtureSource(arg)
+    raise ValueError(f"unknown source '{spec}'")
+
+
+# ---------------------------------------------------------------------
+# Manifest + partition writing
+# ---------------------------------------------------------------------
+def load_manifest(root: pathlib.Path) -> dict:
+    path = root / MANIFEST
+    if path.exists():
+        with open(path) as fh:
+            return json.load(fh)
+    return {"dates": {}}
+
+def save_manifest(root: pathlib.Path, manifest: dict) -> None:
+    tmp = root / (MANIFEST + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, root / MANIFEST)
+
+def write_partitions(df: pd.DataFrame, root: pathlib.Path) -> dict:
+    """Write one file per game_date; returns {date: rows}."""
+    if df.empty:
+        return {}
+    dates = pd.to_datetime(df["game_date"])
+    df = df.assign(season=dates.dt.year, month=dates.dt.month,
+                   game_date=dates.dt.strftime("%Y-%m-%d"))
+    written = {}
+    for (season, month, day), part in df.groupby(PARTITION_COLS, sort=False):
+        d = root / f"season={season}" / f"month={month}" / f"game_date={day}"
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / "part-0.parquet.tmp"
+        part.drop(columns=PARTITION_COLS).to_parquet(tmp, index=False)
+        os.replace(tmp, d / "part-0.parquet")       # re-runs overwrite, never duplicate
+        written[day] = len(part)
+    return written
+
+def date_chunks(dates: list, chunk_days: int) -> list:
+    """Group sorted ``YYYY-MM-DD`` strings into runs of ≤ chunk_days consecutive days."""
+    chunks, cur = [], []
+    for d in dates:
+        if cur and (len(cur) == chunk_days or
+                    dt.date.fromisoformat(d) - dt.date.fromisoformat(cur[-1]) != dt.timedelta(days=1)):
+            chunks.append(cur)
+            cur = []
+        cur.append(d)
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def resolve_date(s: str) -> str:
+    today = dt.date.today()
+    if s == "today":
+        return today.isoformat()
+    if s == "yesterday":
+        return (today - dt.timedelta(days=1)).isoformat()
+    return s
+
+def ingest(start: str, end: str, root: str, source, chunk_days: int = 7,
+           workers: int = 4) -> dict:
+    """Fetch every date in [start, end] missing from the manifest."""
+    root = pathlib.Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(root)
+    today = dt.date.today().isoformat()
+
+    wanted = [d.strftime("%Y-%m-%d") for d in pd.date_range(start, end, freq="D")]
+    missing = [d for d in wanted if d not in manifest["dates"]]
+    chunks = date_chunks(missing, chunk_days)
+    print(f"{len(wanted)} dates requested, {len(missing)} missing → {len(chunks)} chunks")
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futs = {pool.submit(source.fetch, c[0], c[-1]): c for c in chunks}
+        for fut in as_completed(futs):
+            chunk = futs[fut]
+            try:
+                df = fut.result()
+            except Exception as e:                 # leave the chunk for the next run
+                print(f"[warn] {chunk[0]}..{chunk[-1]} failed: {e!r}")
+                continue
+            written = write_partitions(df, root)
+            for d in chunk:
+                if d < today:                      # only finished days are final
+                    manifest["dates"][d] = {"rows": written.get(d, 0)}
+            save_manifest(root, manifest)          # after every chunk: resumable
+            total += len(df)
+            print(f"  {chunk[0]}..{chunk[-1]}: {len(df):,} rows")
+    return {"rows": total, "chunks": len(chunks)}
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("start", help="YYYY-MM-DD")
-    ap.add_argument("end", help="YYYY-MM-DD")
+    ap.add_argument("end", help="YYYY-MM-DD, 'today' or 'yesterday'")
     ap.add_argument("--out", default="data/statcast.parquet")
+    ap.add_argument("--dataset", help="partitioned output dir (enables incremental mode)")
+    ap.add_argument("--chunk-days", type=int, default=7)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--source", default="pybaseball", help="pybaseball | fixtures:<dir>")
     args = ap.parse_args()
+    start, end = resolve_date(args.start), resolve_date(args.end)
+
+    if args.dataset:
+        stats = ingest(start, end, args.dataset, make_source(args.source),
+                       chunk_days=args.chunk_days, workers=args.workers)
+        print(f"Saved {stats['rows']:,} new rows to {args.dataset}")
+        return
 
-    df = statcast(start_dt=args.start, end_dt=args.end)
+    df = make_source(args.source).fetch(start, end)
     out_path = pathlib.Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_parquet(out_path, index=False)
@@ -5,61 +5,243 @@ data/weather_2024.parquet.
 
 Needs a Visual Crossing key in env var VC_API_KEY.
 Free-tier key works; one season ~2,400 calls ≈ 2–3 minutes.
+
+Requests run concurrently through a token-bucket rate limiter and are
+retried with jittered exponential backoff.  Every answer is cached in a
+SQLite file keyed by (lat, lon, date), so a rerun – or the next season's
+backfill – only asks for what is missing, and doubleheaders at the same
+park share one call.  A failed game no longer kills the run: the
+parquet is written for everything that succeeded and the rest is
+reported (exit code 1) so the next run picks it up.
+
+Usage:
+    python data/get_weather.py [--meta data/games_2024_meta.csv]
+                               [--out data/weather_2024.parquet]
+                               [--rate 10] [--concurrency 8]
+                               [--base-url http://127.0.0.1:8081/timeline]   # stub server
+
+Offline, against the stub (``utils/fake_weather.py``, with injected
+429 / 503 answers to exercise the retries):
+    python -m utils.fake_weather --port 8081 --fail-rate 0.2 &
+    python data/get_weather.py --base-url http://127.0.0.1:8081/timeline --cache /tmp/wx.sqlite
 """
 
-import os, time, json, pathlib, requests
-import pandas as pd, requests, tqdm
-from requests.exceptions import RequestException
+import os, json, time, random, asyncio, sqlite3, pathlib, argparse
+import aiohttp, pandas as pd, tqdm
 
 KEY = os.getenv("VC_API_KEY")
-if not KEY:
-    raise SystemExit("❗  Set VC_API_KEY before running (setx or $Env).")
 
 BASE = "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline"
 
-META_CSV = "data/games_2024_meta.csv"
-OUT_PARQ = "data/weather_2024.parquet"
+META_CSV   = "data/games_2024_meta.csv"
+OUT_PARQ   = "data/weather_2024.parquet"
+CACHE_PATH = "data/weather_cache.sqlite"
 
-def one_game(lat: float, lon: float, date: str) -> dict:
-    """Return weather dict for the 7 p.m. local hour, retrying on timeout."""
-    url = (
-        f"https://weather.visualcrossing.com/VisualCrossingWebServices/"
-        f"rest/services/timeline/{lat},{lon}/{date}"
-    )
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# ---------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------
+class TokenBucket:
+    """Allow ``rate`` requests/s on average with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# ---------------------------------------------------------------------
+# Persistent response cache
+# ---------------------------------------------------------------------
+class WeatherCache:
+    """SQLite table of parsed 7 p.m. readings keyed by (lat, lon, date)."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS weather ("
+            " lat REAL, lon REAL, date TEXT, payload TEXT, fetched_at REAL,"
+            " PRIMARY KEY (lat, lon, date))"
+        )
+        self.db.commit()
+
+    def get_many(self, keys) -> dict:
+        """Cached readings for ``keys``: one primary-key join, not a table scan."""
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (lat REAL, lon REAL, date TEXT)")
+        self.db.execute("DELETE FROM wanted")
+        self.db.executemany("INSERT INTO wanted VALUES (?, ?, ?)", list(keys))
+        found = {
+            (lat, lon, date): json.loads(payload)
+            for lat, lon, date, payload in self.db.execute(
+                "SELECT w.lat, w.lon, w.date, w.payload FROM wanted"
+                " JOIN weather w USING (lat, lon, date)")
+        }
+        self.db.execute("DELETE FROM wanted")
+        self.db.commit()
+        return found
+
+    def put(self, key, wx: dict) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO weather VALUES (?, ?, ?, ?, ?)",
+            (*key, json.dumps(wx), time.time()),
+        )
+        self.db.commit()                       # commit per game: crash-safe resume
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# ---------------------------------------------------------------------
+# Fetching
+# ---------------------------------------------------------------------
+def parse_hour19(payload: dict) -> dict:
+    hr19 = payload["days"][0]["hours"][19]
+    return {
+        "temp_F": hr19.get("temp", hr19.get("tempf")),
+        "wind_speed_mph": hr19.get("wspd", hr19.get("windspeed")),
+        "wind_dir_deg": hr19.get("wdir", hr19.get("winddir")),
+    }
+
+async def one_game(session: aiohttp.ClientSession, bucket: TokenBucket,
+                   lat: float, lon: float, date: str, *,
+                   base: str = BASE, key: str = None,
+                   retries: int = 5, backoff: float = 1.0) -> dict:
+    """Return weather dict for the 7 p.m. local hour, retrying transient errors."""
+    url = f"{base}/{lat},{lon}/{date}"
     params = {
-        "key": KEY,
+        "key": key or KEY or "",
         "unitGroup": "us",
         "include": "hours",
         "contentType": "json",
     }
 
-    for attempt in (1, 2):                       # max 2 tries
+    for attempt in range(1, retries + 1):
+        await bucket.acquire()
+        delay = None
         try:
-            r = requests.get(url, params=params, timeout=(4, 60))
-            r.raise_for_status()
-            hr19 = r.json()["days"][0]["hours"][19]
-            return {
-                "temp_F": hr19.get("temp", hr19.get("tempf")),
-                "wind_speed_mph": hr19.get("wspd", hr19.get("windspeed")),
-                "wind_dir_deg": hr19.get("wdir", hr19.get("winddir")),
-            }
-        except RequestException as e:
-            if attempt == 2:
-                raise                     # bubble up on second failure
-            print("↻ timeout, retrying in 10 s …")
-            time.sleep(10)
+            async with session.get(url, params=params) as r:
+                if r.status in RETRY_STATUS:
+                    ra = r.headers.get("Retry-After")
+                    delay = float(ra) if ra and ra.isdigit() else None
+                    raise aiohttp.ClientResponseError(
+                        r.request_info, r.history, status=r.status, message=r.reason)
+                r.raise_for_status()
+                return parse_hour19(await r.json(content_type=None))
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUS or attempt == retries:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        # full jitter: sleep U(0, backoff·2^attempt), or the server's Retry-After
+        await asyncio.sleep(delay if delay is not None else random.uniform(0, backoff * 2 ** attempt))
+
+async def fetch_all(keys, cache: WeatherCache, *, rate: float, concurrency: int,
+                    base: str = BASE, key: str = None, retries: int = 5,
+                    backoff: float = 1.0) -> tuple:
+    """
+    Fetch every (lat, lon, date) not already cached.
+
+    Returns ``(results, failures)``; results include cache hits.
+    """
+    results = cache.get_many(set(keys))
+    todo = [k for k in keys if k not in results]
+    failures = {}
+    if not todo:
+        return results, failures
+
+    bucket = TokenBucket(rate, burst=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(sock_connect=4, sock_read=60)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async def run(k):
+            async with sem:
+                try:
+                    wx = await one_game(session, bucket, *k, base=base, key=key,
+                                        retries=retries, backoff=backoff)
+                except Exception as e:
+                    failures[k] = repr(e)
+                    return
+                cache.put(k, wx)
+                results[k] = wx
+
+        tasks = [asyncio.ensure_future(run(k)) for k in todo]
+        for t in tqdm.tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="weather"):
+            await t
+    return results, failures
+
+
+def game_keys(games: pd.DataFrame) -> pd.Series:
+    """(lat, lon, date) per game; rounded so doubleheaders share one key."""
+    return pd.Series(
+        list(zip(games["lat"].round(3), games["lon"].round(3), games["game_date"].astype(str))),
+        index=games.index,
+    )
+
 def main() -> None:
-    games = pd.read_csv(META_CSV)
-    rows  = []
-
-    for _, g in tqdm.tqdm(games.iterrows(), total=len(games)):
-        wx = one_game(g.lat, g.lon, g.game_date)
-        wx["game_pk"] = g.game_pk
-        rows.append(wx)
-        time.sleep(.1)                 # free-tier pace
-
-    pathlib.Path("data").mkdir(exist_ok=True)
-    pd.DataFrame(rows).to_parquet(OUT_PARQ, index=False)
-    print(f"✅ wrote {OUT_PARQ} ({len(rows)} rows)")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--meta", default=META_CSV)
+    ap.add_argument("--out", default=OUT_PARQ)
+    ap.add_argument("--cache", default=CACHE_PATH)
+    ap.add_argument("--rate", type=float, default=10.0, help="requests per second")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--retries", type=int, default=5)
+    ap.add_argument("--base-url", default=os.getenv("VC_BASE_URL", BASE))
+    args = ap.parse_args()
+
+    if not KEY and args.base_url == BASE:
+        raise SystemExit("❗  Set VC_API_KEY before running (setx or $Env).")
+
+    games = pd.read_csv(args.meta)
+    no_park = games["lat"].isna() | games["lon"].isna()
+    if no_park.any():                          # nothing to ask for, and NaN never hits the cache
+        print(f"[warn] {int(no_park.sum())} games without park coordinates skipped "
+              f"(e.g. {games.loc[no_park, 'home_team'].unique()[:5].tolist()})")
+        games = games[~no_park]
+    keys  = game_keys(games)
+    unique = list(dict.fromkeys(keys))
+    print(f"{len(games)} games → {len(unique)} distinct (park, date) lookups")
+
+    cache = WeatherCache(args.cache)
+    try:
+        results, failures = asyncio.run(fetch_all(
+            unique, cache, rate=args.rate, concurrency=args.concurrency,
+            base=args.base_url, retries=args.retries,
+        ))
+    finally:
+        cache.close()
+
+    rows = []
+    for game_pk, k in zip(games["game_pk"], keys):
+        if k in results:
+            rows.append({**results[k], "game_pk": game_pk})
+
+    pathlib.Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows).to_parquet(args.out, index=False)
+    print(f"✅ wrote {args.out} ({len(rows)} rows)")
+
+    if failures:
+        for k, err in list(failures.items())[:10]:
+            print(f"[warn] {k}: {err}")
+        raise SystemExit(f"❗ {len(failures)} lookups failed; rerun to fetch only those")
+
 if __name__ == "__main__":
     main()
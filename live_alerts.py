@@ -1,28 +1,58 @@
 """
 live_alerts.py
-Polls Statcast live feed every 30 s, scores each PA with /predict_batch,
-sends a Slack alert whenever hr_probability ≥ THRESHOLD.
+Polls the Statcast live feed, scores each new PA and sends a Slack alert
+whenever hr_probability ≥ THRESHOLD.
+
+    python live_alerts.py                                   # Savant, today
+    python live_alerts.py --feed-url "http://127.0.0.1:8765/gf?game_pk={game_pk}" \\
+                          --games 1 2 3 --score local --console   # utils/fake_feed.py
+
+One aiohttp session is kept for the whole run.  Every feed URL (one per
+game with ``{game_pk}``, or the day feed) is polled by its own task with
+conditional GETs (ETag / Last-Modified), so an unchanged feed costs a 304
+and a changed one is parsed only past the rows already seen.  New PAs are
+scored in-process (``--score local``) or by the API's /predict_batch over
+the same session, and alerts go through a bounded queue drained by async
+Slack senders, so polling never waits on Slack.
+
+Models trained with rolling batter/pitcher form (``processing.rolling``)
+need the players' form before each PA.  ``--form-state`` keeps it here: a
+snapshot built with ``python -m processing.rolling`` plus every finished
+PA of the feed, in order, O(1) each.  With ``--score http --observe`` the
+API keeps it instead: PAs are scored with their players and date, then
+posted to its /observe once each.
+
+``--monitor`` feeds the calibration / drift monitor (``serve.monitor``)
+with every scored batted ball once its outcome is in the feed: the
+probability that was served, the ``events`` value, the park and the raw
+inputs.  With ``--score local`` the monitor lives here and is
+snapshotted to ``--monitor-state``; with ``--score http`` the rows go to
+the API's /outcomes, and its /monitor reports them.
 """
 
-import os, time, asyncio, aiohttp, requests, pandas as pd, joblib, json, logging
-from slack_sdk.webhook import WebhookClient
-from utils.request_helper import build_payload
+import os, time, asyncio, aiohttp, argparse, json, logging
+from typing import Optional
+import numpy as np, pandas as pd
+from utils.dedup import DEDUP_PATH, SeenStore
 
 # ---------- CONFIG ----------------------------------------------------
 MODEL_PATH = "models/hr_model.pkl"
-THRESHOLD  = 0.08       # alert if prob >= 10 %
-POLL_SECS  = 30         # how often to hit Statcast live endpoint
+THRESHOLD  = 0.08       # alert if prob >= 8 %
+POLL_SECS  = 2.0        # per feed; unchanged feeds answer 304
+FEED_URL   = os.getenv("HR_FEED_URL", "https://baseballsavant.mlb.com/gf?date={date}")
+FEED_TZ    = "America/New_York"   # MLB's calendar day; late games end after UTC midnight
+API_URL    = "http://127.0.0.1:8000/predict_batch"
 WEBHOOK_URL = os.getenv("SLACK_WEBHOOK")   # set in PowerShell
 # ----------------------------------------------------------------------
 
-model     = joblib.load(MODEL_PATH)
-webhook   = WebhookClient(WEBHOOK_URL)
-today     = pd.Timestamp.utcnow().strftime("%Y-%m-%d")
-seen_ids  = set()
+log = logging.getLogger("live_alerts")
+
+def feed_date() -> str:
+    return pd.Timestamp.now(FEED_TZ).strftime("%Y-%m-%d")
 
-def pa_to_payload(pb: dict) -> dict:
-    """Extract raw fields needed for /predict."""
-    return dict(
+def pa_to_payload(pb: dict, players: bool = False) -> dict:
+    """Extract raw fields needed for /predict (+ batter, pitcher, date for the API's form)."""
+    out = dict(
         launch_speed = pb["launch_speed"],
         launch_angle = pb["launch_angle"],
         stand        = pb["stand"],
@@ -33,56 +63,440 @@ def pa_to_payload(pb: dict) -> dict:
         balls        = pb["balls"],
         strikes      = pb["strikes"],
     )
+    if players:
+        out.update(batter=pb.get("batter"), pitcher=pb.get("pitcher"), game_date=pb.get("game_date"))
+    return out
+
+# ---------------------------------------------------------------------
+# Feed: conditional GET, only rows appended since the last poll
+# ---------------------------------------------------------------------
+class FeedPoller:
+    """
+    Poll one feed URL.  The feed is a JSON list that only grows during the
+    day, so after a 200 the rows already seen are skipped before parsing;
+    a shorter list means the feed was reset and is read from the start.
+
+    ``{date}`` in the URL is re-rendered on every poll (``date`` pinned or
+    today in ``FEED_TZ``), so a long-running process moves to the next
+    day's feed on its own.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url_template: str,
+                 game_pk: Optional[str] = None, date: Optional[str] = None,
+                 timeout: float = 20):
+        self.session, self.template = session, url_template
+        self.game_pk, self.pinned_date = game_pk, date
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.url: Optional[str] = None
+        self.date: Optional[str] = None
+
+    def _roll(self):
+        date = self.pinned_date or feed_date()
+        url = self.template.format(date=date, game_pk=self.game_pk)
+        if url != self.url:                     # first poll or a new day
+            self.url, self.date = url, date
+            self.etag: Optional[str] = None
+            self.last_modified: Optional[str] = None
+            self.n_seen = 0
+
+    async def poll(self) -> list[dict]:
+        self._roll()
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        async with self.session.get(self.url, headers=headers, timeout=self.timeout) as r:
+            if r.status == 304:
+                return []
+            r.raise_for_status()
+            raw_list = await r.json(content_type=None)      # list[str] (or list[dict])
+            self.etag = r.headers.get("ETag")
+            self.last_modified = r.headers.get("Last-Modified")
 
-async def fetch_live(date_str: str) -> list[dict]:
-    """Return list[dict] PAs. Ignores blank or malformed rows."""
-    url = f"https://baseballsavant.mlb.com/gf?date={date_str}"
-    async with aiohttp.ClientSession() as ses:
-        async with ses.get(url, timeout=20) as r:
+        if len(raw_list) < self.n_seen:
+            self.n_seen = 0
+        fresh, self.n_seen = raw_list[self.n_seen:], len(raw_list)
+
+        good = []
+        for s in fresh:
+            if not s:              # skip empty string
+                continue
+            if isinstance(s, dict):
+                good.append(s)
+                continue
+            try:
+                good.append(json.loads(s))
+            except json.JSONDecodeError:
+                log.warning("bad JSON row skipped")
+        return good
+
+# ---------------------------------------------------------------------
+# Scoring: in-process or async HTTP
+# ---------------------------------------------------------------------
+class LocalScorer:
+    """
+    Score with the model in this process (a few rows take ~1 ms), or from
+    a lookup grid built for the same model (microseconds), falling back to
+    the model for contexts the grid does not cover.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, backend: str = "inplace",
+                 grid_path: Optional[str] = None, grid_tolerance: float = 1e-4):
+        import joblib
+        from processing.rolling import form_columns
+        from utils.request_helper import FeatureEncoder
+        from utils.scoring import make_backend
+        model = joblib.load(model_path)
+        self.encoder = FeatureEncoder.from_model(model)
+        self.form_cols = form_columns(self.encoder.feature_names)
+        try:
+            self.backend = make_backend(backend, model)
+        except NotImplementedError as e:
+            log.warning("%s backend unavailable (%s); using inplace", backend, e)
+            self.backend = make_backend("inplace", model)
+        self.grid = None
+        if grid_path:
+            from utils.artifacts import model_key
+            from utils.prob_grid import ProbGrid
+            self.grid = ProbGrid(grid_path, grid_tolerance)
+            if self.grid.meta["model_sha"] != model_key(model):
+                raise SystemExit(f"❗ {grid_path} was built for a different model")
+            if self.form_cols:
+                raise SystemExit("❗ the grid only covers the nine raw fields; "
+                                 "this model also reads rolling form")
+
+    def _model(self, rows: list[dict]) -> np.ndarray:
+        return self.backend.predict(self.encoder.encode(rows))
+
+    async def __call__(self, rows: list[dict]) -> np.ndarray:
+        if self.grid is not None:
+            return self.grid.predict(rows, self._model)
+        return self._model(rows)
+
+class HttpScorer:
+    """Score through the API's /predict_batch on the shared session."""
+    form_cols: list = []                        # the API adds form itself
+
+    def __init__(self, session: aiohttp.ClientSession, url: str = API_URL, timeout: float = 10):
+        self.session, self.url = session, url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def __call__(self, rows: list[dict]) -> np.ndarray:
+        async with self.session.post(self.url, json={"data": rows}, timeout=self.timeout) as r:
             r.raise_for_status()
-            raw_list = await r.json()           # list[str]
+            return np.asarray((await r.json())["hr_probability"])
 
-    good = []
-    for s in raw_list:
-        if not s:              # skip empty string
+# ---------------------------------------------------------------------
+# Rolling form: every finished PA, in feed order
+# ---------------------------------------------------------------------
+def track_form(form, pbs: list[dict], default_day: str, columns: list) -> dict:
+    """
+    Run the feed rows through ``form`` (a ``RollingState``) in order and
+    return the form of every batted ball *before* its own PA, by play_id.
+    Days already in the snapshot (``as_of``) are skipped, so a restart
+    replays today's feed on top of the snapshot without double counting.
+    """
+    out = {}
+    for pb in pbs:
+        day = pb.get("game_date", default_day)
+        if form.as_of and day <= form.as_of:
             continue
+        if pb.get("launch_speed"):
+            out[pb.get("play_id")] = form.features(pb.get("batter"), pb.get("pitcher"), day, columns)
+        try:
+            form.update({**pb, "game_date": day})
+        except ValueError as e:                 # out of order for a player: state unchanged
+            log.warning("play %s left out of form: %s", pb.get("play_id"), e)
+    return out
+
+def claim_plays(seen: SeenStore, pbs: list[dict], default_day: str, key=lambda pb: pb["play_id"]) -> dict:
+    """Claim ``key(pb)`` under each game's own date; ``{day: ids claimed now}``."""
+    by_day = {}
+    for pb in pbs:
+        by_day.setdefault(pb.get("game_date", default_day), []).append(key(pb))
+    return {day: seen.claim(day, ids) for day, ids in by_day.items()}
+
+def release_plays(seen: SeenStore, claimed: dict):
+    for day, ids in claimed.items():
+        seen.release(day, ids)
+
+async def observe_remote(session: aiohttp.ClientSession, url: str, seen: SeenStore,
+                         pbs: list[dict], default_day: str):
+    """
+    Post finished PAs to the API's /observe, each once (claimed as
+    ``form:<play_id>``).  Claims are released if the post fails, so the
+    caller can send the same rows again.
+    """
+    pas = [dict(pb, game_date=pb.get("game_date", default_day)) for pb in pbs
+           if pb.get("events") and pb.get("batter") and pb.get("pitcher") and pb.get("play_id")]
+    claimed = claim_plays(seen, pas, default_day, key=lambda pa: f"form:{pa['play_id']}")
+    fresh = set().union(*claimed.values())
+    body = [{k: pa.get(k) for k in ("batter", "pitcher", "game_date", "events",
+                                    "launch_speed", "launch_angle")}
+            for pa in pas if f"form:{pa['play_id']}" in fresh]
+    if body:
         try:
-            good.append(json.loads(s))
-        except json.JSONDecodeError:
-            logging.warning("bad JSON row skipped")
-    return good
+            async with session.post(url, json={"data": body}) as r:
+                r.raise_for_status()
+        except BaseException:
+            release_plays(seen, claimed)
+            raise
+
+# ---------------------------------------------------------------------
+# Calibration / drift monitor: served probability + outcome per PA
+# ---------------------------------------------------------------------
+def resolved_rows(pbs: list[dict], payloads: list[dict], probs, default_day: str) -> list[dict]:
+    """Monitor rows for the scored PAs whose outcome (``events``) is known."""
+    return [{**payload, "hr_probability": float(prob), "events": pb["events"],
+             "home_team": pb.get("home_team"), "game_date": pb.get("game_date", default_day)}
+            for pb, payload, prob in zip(pbs, payloads, probs) if pb.get("events")]
+
+async def outcomes_remote(session: aiohttp.ClientSession, url: str, rows: list[dict]):
+    """Post resolved PAs to the API's /outcomes."""
+    async with session.post(url, json={"data": rows}) as r:
+        r.raise_for_status()
+
+# ---------------------------------------------------------------------
+# Alerts: bounded queue, async senders
+# ---------------------------------------------------------------------
+class AlertQueue:
+    """
+    ``offer`` never blocks the pollers: when ``maxsize`` alerts are already
+    waiting the new one is dropped with a warning.  ``senders`` tasks post
+    concurrently.
+    """
+
+    def __init__(self, send, maxsize: int = 100, senders: int = 4):
+        self.send = send
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.senders = senders
+        self.latencies: list[float] = []
+
+    def offer(self, text: str, play_id, detected: float) -> bool:
+        try:
+            self.queue.put_nowait((text, play_id, detected))
+            return True
+        except asyncio.QueueFull:
+            log.warning("alert queue full; dropped %s", play_id)
+            return False
+
+    async def _sender(self):
+        while True:
+            text, play_id, detected = await self.queue.get()
+            try:
+                await self.send(text)
+                ms = (time.perf_counter() - detected) * 1e3
+                self.latencies.append(ms)
+                print("alert sent", play_id, f"{ms:.0f} ms after detection")
+            except Exception:
+                log.exception("alert for %s failed", play_id)
+            finally:
+                self.queue.task_done()
+
+    def start(self) -> list[asyncio.Task]:
+        return [asyncio.create_task(self._sender()) for _ in range(self.senders)]
+
+def slack_sender(session: aiohttp.ClientSession, url: str):
+    from slack_sdk.webhook.async_client import AsyncWebhookClient
+    webhook = AsyncWebhookClient(url, session=session)
 
-def send_slack(msg: str):
-    webhook.send(text=msg)
+    async def send(text: str):
+        resp = await webhook.send(text=text)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Slack webhook returned {resp.status_code}: {resp.body}")
+    return send
 
-async def main():
-    if not WEBHOOK_URL:
-        raise SystemExit("❗ Set SLACK_WEBHOOK before running this script.")
+async def console_sender(text: str):
+    print(text)
 
+def alert_text(pb: dict, prob: float) -> str:
+    return (
+        f":baseball: *HR Risk {prob:.1%}* | "
+        f"{pb['away_team']} @ {pb['home_team']} – "
+        f"Inning {pb['inning']} | {pb['player_name']} vs {pb['pitcher_name']}\n"
+        f"Speed {pb['launch_speed']} mph, Angle {pb['launch_angle']}°"
+    )
+
+# ---------------------------------------------------------------------
+async def watch(poller: FeedPoller, seen: SeenStore, score, alerts: AlertQueue,
+                threshold: float, poll_secs: float, form=None, observe=None, monitor=None):
+    """
+    Poll one feed forever: new PAs -> dedup -> score -> alert queue.
+
+    The feed hands out each row once, so rows are never dropped on a
+    failure: batted balls whose scoring failed have their claims released
+    and are scored on the next poll, and rows not yet posted to /observe
+    are posted again.  Any error is logged and the feed keeps polling.
+    """
+    blank = dict.fromkeys(score.form_cols)      # no form yet: missing, as in training
+    retry: list = []                            # (batted ball, its form) still to score
+    unobserved: list = []                       # rows not yet accepted by /observe
     while True:
-        pbs = await fetch_live(today)
-        new = [pb for pb in pbs if pb["play_id"] not in seen_ids and pb.get("launch_speed")]
-        if new:
-            seen_ids.update(pb["play_id"] for pb in new)
-            rows = [pa_to_payload(pb) for pb in new]
-
-            # score via local /predict_batch
-            resp = requests.post(
-                "http://127.0.0.1:8000/predict_batch",
-                json={"data": rows},
-                timeout=10
-            ).json()
-
-            for pb, prob in zip(new, resp["hr_probability"]):
-                if prob >= THRESHOLD:
-                    send_slack(
-                        f":baseball: *HR Risk {prob:.1%}* | "
-                        f"{pb['away_team']} @ {pb['home_team']} – "
-                        f"Inning {pb['inning']} | {pb['player_name']} vs {pb['pitcher_name']}\n"
-                        f"Speed {pb['launch_speed']} mph, Angle {pb['launch_angle']}°"
-                    )
-                    print("alert sent", pb["play_id"], prob)
-        await asyncio.sleep(POLL_SECS)
+        started = time.perf_counter()
+        try:
+            pbs = await poller.poll()
+            detected = time.perf_counter()
+            forms = track_form(form, pbs, poller.date, score.form_cols) if form else {}
+            if observe is not None:
+                unobserved += pbs
+            batted, retry = retry, []
+            for pb in pbs:
+                if not pb.get("launch_speed"):
+                    continue
+                if pb.get("play_id") is None:
+                    log.warning("%s: batted ball without play_id skipped", poller.url)
+                    continue
+                batted.append((pb, forms.get(pb["play_id"], blank)))
+            retry = batted                      # until they are claimed and scored
+            # keyed by the game's own date, so a game running past midnight
+            # keeps its day; claimed (and committed) before alerting, so a
+            # restart never re-alerts
+            claimed = claim_plays(seen, [pb for pb, _ in batted], poller.date)
+            fresh = set().union(*claimed.values())
+            new, payloads = [], []
+            for pb, pb_form in batted:
+                if pb["play_id"] not in fresh:
+                    continue
+                try:
+                    payloads.append({**pa_to_payload(pb, observe is not None), **pb_form})
+                    new.append(pb)
+                except (KeyError, TypeError, ValueError) as e:
+                    log.warning("play %s skipped: bad row (%r)", pb["play_id"], e)
+            probs = []
+            if new:
+                try:
+                    probs = await score(payloads)
+                except Exception as e:
+                    # nothing alerted yet: hand the plays back, score them next poll
+                    release_plays(seen, claimed)
+                    log.warning("%s: scoring %d PAs failed (%r); retrying next poll",
+                                poller.url, len(new), e)
+                    probs = None
+            if probs is not None:
+                retry = []
+                for pb, prob in zip(new, probs):
+                    if prob >= threshold:
+                        alerts.offer(alert_text(pb, float(prob)), pb["play_id"], detected)
+                if monitor is not None and len(probs):
+                    rows = resolved_rows(new, payloads, probs, poller.date)
+                    if rows:
+                        await monitor(rows)
+                if observe is not None:
+                    # after scoring: form is "before the PA"
+                    await observe(unobserved, poller.date)
+                    unobserved = []
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("%s: %s", poller.url, e)
+        except Exception:                       # one bad poll must not stop the other feeds
+            log.exception("%s: poll failed", poller.url)
+        await asyncio.sleep(max(0.0, poll_secs - (time.perf_counter() - started)))
+
+async def main(args):
+    if not (args.console or WEBHOOK_URL):
+        raise SystemExit("❗ Set SLACK_WEBHOOK before running this script (or use --console).")
+
+    connector = aiohttp.TCPConnector(limit=64, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if args.score == "local":
+            score = LocalScorer(args.model, args.backend, args.grid, args.grid_tolerance)
+        else:
+            score = HttpScorer(session, args.api)
+        send = console_sender if args.console else slack_sender(session, WEBHOOK_URL)
+        alerts = AlertQueue(send, args.queue_size, args.senders)
+        senders = alerts.start()
+
+        if "{game_pk}" in args.feed_url:
+            if not args.games:
+                raise SystemExit("❗ --feed-url has {game_pk}; pass --games")
+            pollers = [FeedPoller(session, args.feed_url, g, args.date) for g in args.games]
+        else:
+            pollers = [FeedPoller(session, args.feed_url, date=args.date)]
+        seen = SeenStore(args.dedup_db, args.retention_days)
+        form = observe = monitor = monitor_store = None
+        if args.form_state:
+            from processing.rolling import RollingState
+            if args.score != "local" or not score.form_cols:
+                raise SystemExit("❗ --form-state is for --score local with a model that reads rolling form")
+            form = RollingState.load(args.form_state)
+            print(f"form snapshot as of {form.as_of}: {form.stats()['batters']:,} batters, "
+                  f"{form.stats()['pitchers']:,} pitchers")
+        if args.observe:
+            if args.score != "http":
+                raise SystemExit("❗ --observe feeds the API's form; use it with --score http")
+            url = args.api.rsplit("/", 1)[0] + "/observe"
+            observe = lambda pbs, day: observe_remote(session, url, seen, pbs, day)
+        if args.monitor and args.score == "http":
+            url = args.api.rsplit("/", 1)[0] + "/outcomes"
+            monitor = lambda rows: outcomes_remote(session, url, rows)
+        elif args.monitor:
+            from serve.monitor import MonitorStore
+            monitor_store = MonitorStore(args.monitor_state, snapshot_secs=args.monitor_snapshot_secs,
+                                         reference_path=args.monitor_reference)
+            print(f"monitor: {monitor_store.stats()['rows']:,} resolved PAs so far "
+                  f"({args.monitor_state})")
+
+            async def monitor(rows):
+                monitor_store.observe(rows)
+        print(f"watching {len(pollers)} feed(s), scoring {args.score}, "
+              f"threshold {args.threshold:.0%}, {len(seen):,} plays already seen")
+
+        try:
+            await asyncio.gather(*(watch(p, seen, score, alerts, args.threshold, args.poll_secs,
+                                         form, observe, monitor)
+                                   for p in pollers))
+        finally:
+            seen.close()
+            if monitor_store is not None:
+                monitor_store.save()
+                overall = monitor_store.live.report()["overall"]
+                if overall["n"]:
+                    print(f"monitor: {overall['n']:,} PAs, log-loss {overall['logloss']:.4f}, "
+                          f"ECE {overall['ece']:.4f}, mean p {overall['mean_p']:.3f} "
+                          f"vs HR rate {overall['hr_rate']:.3f}")
+            for t in senders:
+                t.cancel()
+            if alerts.latencies:
+                lat = np.array(alerts.latencies)
+                print(f"{len(lat)} alerts, detection→alert p50 {np.median(lat):.0f} ms, "
+                      f"max {lat.max():.0f} ms")
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Slack alerts for high HR-probability PAs")
+    ap.add_argument("--feed-url", default=FEED_URL,
+                    help="feed URL; {date} and {game_pk} are filled in")
+    ap.add_argument("--games", nargs="*", default=[], help="game_pks for a per-game feed URL")
+    ap.add_argument("--date", help=f"pin the feed date (default: today in {FEED_TZ})")
+    ap.add_argument("--poll-secs", type=float, default=POLL_SECS)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--score", choices=["local", "http"], default="local")
+    ap.add_argument("--api", default=API_URL, help="/predict_batch URL for --score http")
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--backend", default="inplace")
+    ap.add_argument("--grid", help="lookup grid (python -m utils.prob_grid) for --score local")
+    ap.add_argument("--grid-tolerance", type=float, default=1e-4)
+    ap.add_argument("--queue-size", type=int, default=100)
+    ap.add_argument("--senders", type=int, default=4)
+    ap.add_argument("--console", action="store_true", help="print alerts instead of Slack")
+    ap.add_argument("--dedup-db", default=DEDUP_PATH, help="SQLite file of alerted play IDs")
+    ap.add_argument("--retention-days", type=int, default=2)
+    ap.add_argument("--form-state", help="rolling form snapshot (python -m processing.rolling) "
+                                         "for a model with form inputs, --score local")
+    ap.add_argument("--observe", action="store_true",
+                    help="--score http: send players with each PA and post finished PAs "
+                         "to the API's /observe")
+    ap.add_argument("--monitor", action="store_true",
+                    help="feed scored PAs with their outcome to the calibration/drift monitor "
+                         "(here with --score local, the API's /outcomes with --score http)")
+    ap.add_argument("--monitor-state", default="data/monitor/alerts",
+                    help="--score local: directory of the monitor's snapshot")
+    ap.add_argument("--monitor-reference", default="data/monitor/reference.pkl",
+                    help="drift reference (python -m serve.monitor) for --score local")
+    ap.add_argument("--monitor-snapshot-secs", type=float, default=60.0)
+    return ap.parse_args()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
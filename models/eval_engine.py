@@ -0,0 +1,227 @@
+"""
+Vectorized evaluation: metrics per slice with bootstrap confidence intervals.
+
+Everything works on three flat arrays – predictions ``p``, labels ``y``
+and, per slicing field, an integer group code per row (-1 = no group) –
+so no slice ever becomes its own DataFrame.
+
+Point estimates are exact and computed for all groups of a field at once:
+
+* brier / logloss  ``np.bincount`` of per-row losses by group
+* ece              |Σy − Σp| over ``ECE_BINS`` equal-width bins, per group
+* auc              one ``np.lexsort`` by (group, p), tie-averaged ranks,
+                   Mann-Whitney U per group
+
+Bootstrap replicates use a binned Poisson bootstrap.  Rows are collapsed
+into cells (group, score bin, label), where the score bins are quantiles
+of ``p``.  Resampling n rows with replacement is approximated by
+independent Poisson(1) row weights, and the total weight of a cell with
+c rows is then Poisson(c).  So one replicate is a single
+``rng.poisson(counts)`` draw over at most 2·``score_bins`` cells per
+group, however many rows the season has.  Losses inside a cell are
+replaced by the cell mean, which is exact up to the width of a score bin;
+replicates are recentred on the exact point estimate before taking the
+percentile interval.
+
+Fields are evaluated in parallel, one process per field.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+METRICS = ("logloss", "brier", "auc", "ece")
+ECE_BINS = 20                                   # same bins as the calibration plot
+EPS = 1e-15
+
+
+# ---------------------------------------------------------------------
+# Slice codes
+# ---------------------------------------------------------------------
+def field_codes(df: pd.DataFrame, field: str) -> tuple:
+    """
+    ``(codes, labels)`` for ``field`` from either feature layout: a
+    categorical/plain column, or its one-hot group ``field_<level>``.
+    """
+    if field in df:
+        cat = df[field].astype("category")
+        return cat.cat.codes.to_numpy(np.int64), [str(v) for v in cat.cat.categories]
+    group = [c for c in df.columns if c.startswith(f"{field}_")]
+    if not group:
+        raise KeyError(f"no column or one-hot group for '{field}'")
+    block = df[group].to_numpy(dtype=np.int8)
+    codes = np.where(block.any(axis=1), block.argmax(axis=1), -1).astype(np.int64)
+    return codes, [c[len(field) + 1:] for c in group]
+
+
+# ---------------------------------------------------------------------
+# Exact point estimates, all groups at once
+# ---------------------------------------------------------------------
+def row_losses(p: np.ndarray, y: np.ndarray) -> tuple:
+    p = np.clip(p.astype(np.float64), EPS, 1 - EPS)
+    brier = (p - y) ** 2
+    logloss = -(y * np.log(p) + (1 - y) * np.log1p(-p))
+    return brier, logloss
+
+def grouped_auc(g: np.ndarray, p: np.ndarray, y: np.ndarray, n_groups: int) -> np.ndarray:
+    """ROC-AUC of every group (NaN where a group lacks a class)."""
+    order = np.lexsort((p, g))
+    gs, ps, ys = g[order], p[order], y[order]
+    n = len(gs)
+    group_start = np.flatnonzero(np.r_[True, gs[1:] != gs[:-1]]) if n else np.array([], int)
+    sizes = np.diff(np.r_[group_start, n])
+    rank = np.arange(n) - np.repeat(group_start, sizes) + 1.0
+    tie_run = np.cumsum(np.r_[True, (gs[1:] != gs[:-1]) | (ps[1:] != ps[:-1])]) - 1
+    rank = (np.bincount(tie_run, rank) / np.bincount(tie_run))[tie_run]
+
+    pos = np.bincount(gs, ys, minlength=n_groups)
+    cnt = np.bincount(gs, minlength=n_groups)
+    neg = cnt - pos
+    r_pos = np.bincount(gs, rank * ys, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (r_pos - pos * (pos + 1) / 2) / (pos * neg)
+
+def grouped_metrics(g: np.ndarray, p: np.ndarray, y: np.ndarray, n_groups: int) -> dict:
+    """Exact metrics for every group code in ``[0, n_groups)``."""
+    brier, logloss = row_losses(p, y)
+    n = np.bincount(g, minlength=n_groups).astype(np.float64)
+    e = np.minimum((p * ECE_BINS).astype(np.int64), ECE_BINS - 1)
+    cell = g * ECE_BINS + e
+    size = n_groups * ECE_BINS
+    gap = np.abs(np.bincount(cell, y, minlength=size) - np.bincount(cell, p, minlength=size))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "n": n.astype(np.int64),
+            "hr_rate": np.bincount(g, y, minlength=n_groups) / n,
+            "mean_p": np.bincount(g, p, minlength=n_groups) / n,
+            "logloss": np.bincount(g, logloss, minlength=n_groups) / n,
+            "brier": np.bincount(g, brier, minlength=n_groups) / n,
+            "auc": grouped_auc(g, p, y, n_groups),
+            "ece": gap.reshape(n_groups, ECE_BINS).sum(axis=1) / n,
+        }
+
+
+# ---------------------------------------------------------------------
+# Binned Poisson bootstrap
+# ---------------------------------------------------------------------
+def score_bins(p: np.ndarray, n_bins: int) -> np.ndarray:
+    """Quantile bin of every prediction (shared by all groups)."""
+    edges = np.unique(np.quantile(p, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return np.searchsorted(edges, p, side="right")
+
+def bootstrap_group(cells: dict, n_bins: int, replicates: int,
+                    rng: np.random.Generator) -> dict:
+    """
+    ``replicates`` bootstrap values of every metric for one group, given
+    its per-(score bin, label) sums in ``cells`` (arrays of n_bins × 2).
+    """
+    count = cells["count"].ravel()
+    nz = np.flatnonzero(count)
+    replicates += 1                             # row 0: the sample itself (binned point)
+    W = np.zeros((replicates, n_bins * 2), dtype=np.float32)
+    W[0, nz] = count[nz]
+    W[1:, nz] = rng.poisson(count[nz], size=(replicates - 1, len(nz)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.zeros((3, n_bins * 2), dtype=np.float32)
+        for j, k in enumerate(("p", "brier", "logloss")):
+            mean[j, nz] = cells[k].ravel()[nz] / count[nz]
+        sums = W @ mean.T                        # (replicates, 3) weighted sums
+        n = W.sum(axis=1, dtype=np.float64)
+        out = {"brier": sums[:, 1] / n, "logloss": sums[:, 2] / n}
+
+        W3 = W.reshape(replicates, n_bins, 2)
+        neg, pos = W3[..., 0], W3[..., 1]
+        below = np.cumsum(neg, axis=1, dtype=np.float64) - neg    # negatives in lower bins
+        out["auc"] = (np.einsum("rk,rk->r", pos, below + 0.5 * neg)
+                      / (pos.sum(axis=1, dtype=np.float64) * neg.sum(axis=1, dtype=np.float64)))
+
+        bin_n = count.reshape(n_bins, 2).sum(axis=1)
+        bin_p = np.where(bin_n > 0, cells["p"].sum(axis=1) / np.maximum(bin_n, 1), 0.0)
+        ece_of_bin = np.minimum((bin_p * ECE_BINS).astype(np.int64), ECE_BINS - 1)
+        to_ece = np.zeros((n_bins * 2, ECE_BINS), dtype=np.float32)
+        rows = np.arange(n_bins * 2)
+        to_ece[rows, ece_of_bin[rows // 2]] = mean[0]           # Σp per ECE bin
+        y_to_ece = np.zeros_like(to_ece)
+        y_to_ece[rows[1::2], ece_of_bin] = 1                      # Σy per ECE bin
+        out["ece"] = np.abs(W @ (y_to_ece - to_ece)).sum(axis=1) / n
+    return out
+
+def evaluate_field(field: Optional[str], codes: np.ndarray, labels: Sequence[str],
+                   p: np.ndarray, y: np.ndarray, bins: np.ndarray, *,
+                   replicates: int = 1000, n_bins: int = 512, ci: float = 0.95,
+                   seed: int = 0, min_rows: int = 1) -> dict:
+    """
+    Point estimates + bootstrap CIs for every group of one field.
+    ``bins`` is ``score_bins(p, n_bins)`` over all rows, so every slice
+    shares the same score grid.
+    """
+    keep = codes >= 0
+    g, pf, yf = codes[keep], p[keep], y[keep]
+    G = len(labels)
+    point = grouped_metrics(g, pf, yf, G)
+
+    k = bins[keep]
+    brier, logloss = row_losses(pf, yf)
+    cell = (g * n_bins + k) * 2 + yf.astype(np.int64)
+    size = G * n_bins * 2
+    sums = {
+        "count": np.bincount(cell, minlength=size),
+        "p": np.bincount(cell, pf, minlength=size),
+        "brier": np.bincount(cell, brier, minlength=size),
+        "logloss": np.bincount(cell, logloss, minlength=size),
+    }
+    sums = {name: a.reshape(G, n_bins, 2) for name, a in sums.items()}
+
+    lo_q, hi_q = 100 * (1 - ci) / 2, 100 * (1 + ci) / 2
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence([seed, G]).spawn(G)]
+    out = {}
+    for i, label in enumerate(labels):
+        n = int(point["n"][i])
+        if n < min_rows:
+            continue
+        boot = bootstrap_group({c: a[i] for c, a in sums.items()}, n_bins, replicates, rngs[i])
+        entry = {"n": n, "hr_rate": _num(point["hr_rate"][i]), "mean_p": _num(point["mean_p"][i])}
+        for m in METRICS:
+            # recentre on the exact estimate (removes the score-bin bias of the replicates)
+            vals = boot[m][1:] + (point[m][i] - boot[m][0])
+            vals = vals[np.isfinite(vals)]
+            lo, hi = (np.percentile(vals, [lo_q, hi_q]) if len(vals) else (np.nan, np.nan))
+            entry[m] = {"value": _num(point[m][i]), "lo": _num(lo), "hi": _num(hi)}
+        out[label] = entry
+    return {"field": field, "groups": out}
+
+def _num(x) -> Optional[float]:
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+
+def evaluate(p: np.ndarray, y: np.ndarray, slices: dict, *, replicates: int = 1000,
+             n_bins: int = 512, ci: float = 0.95, seed: int = 0, min_rows: int = 1,
+             workers: Optional[int] = None) -> dict:
+    """
+    Overall metrics plus every field in ``slices`` ({field: (codes, labels)}),
+    fields spread over a process pool.  Returns the report dict.
+    """
+    p = np.asarray(p, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bins = score_bins(p, n_bins)
+    kw = dict(replicates=replicates, n_bins=n_bins, ci=ci, seed=seed, min_rows=min_rows)
+    jobs = [(None, np.zeros(len(p), np.int64), ["all"])] + \
+           [(f, codes, labels) for f, (codes, labels) in slices.items()]
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futs = [pool.submit(evaluate_field, f, c, l, p, y, bins, **kw) for f, c, l in jobs]
+            results = [f.result() for f in futs]
+    else:
+        results = [evaluate_field(f, c, l, p, y, bins, **kw) for f, c, l in jobs]
+
+    return {
+        "rows": int(len(p)),
+        "bootstrap": {"replicates": replicates, "score_bins": n_bins, "ci": ci, "seed": seed},
+        "overall": results[0]["groups"]["all"],
+        "slices": {r["field"]: r["groups"] for r in results[1:]},
+    }
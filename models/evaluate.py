@@ -1,21 +1,49 @@
+"""Evaluate calibration and classification metrics.
 
-"""Evaluate calibration and classification metrics."""
-import argparse, joblib, pandas as pd
+Usage:
+    python -m models.evaluate features.parquet models/hr_model.pkl [--backend inplace]
+        [--report eval_report.json] [--bootstrap 1000] [--workers 4]
+        [--slices home_team month pitch_type stand p_throws] [--since 2024-09-01]
+
+Writes ``calibration_plot.png`` and a JSON report with log-loss, Brier,
+ROC-AUC and calibration error (ECE), each with a bootstrap confidence
+interval, overall and for every park (``home_team``), month, pitch type
+and handedness.  See ``models/eval_engine.py`` for how it is computed.
+"""
+import argparse, json, time, joblib, pandas as pd
 from sklearn.calibration import calibration_curve
 import matplotlib.pyplot as plt
+from models.eval_engine import METRICS, evaluate, field_codes
+from utils.request_helper import FeatureEncoder
+from utils.scoring import BACKENDS, make_backend
+
+SLICES = ["home_team", "month", "pitch_type", "stand", "p_throws"]
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("features_parquet")
     ap.add_argument("model_path")
+    ap.add_argument("--backend", default="inplace", choices=sorted(BACKENDS))
+    ap.add_argument("--report", default="eval_report.json")
+    ap.add_argument("--bootstrap", type=int, default=1000, help="bootstrap replicates")
+    ap.add_argument("--score-bins", type=int, default=512)
+    ap.add_argument("--ci", type=float, default=0.95)
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: one per field)")
+    ap.add_argument("--slices", nargs="*", default=SLICES)
+    ap.add_argument("--min-rows", type=int, default=50, help="skip smaller slices")
+    ap.add_argument("--since", help="only rows with game_date on/after this date (needs game_date)")
+    ap.add_argument("--seed", type=int, default=0)
     args = ap.parse_args()
 
     df = pd.read_parquet(args.features_parquet)
-    y = df.pop("is_hr")
-    X = df
+    if args.since:
+        df = df[pd.to_datetime(df["game_date"]) >= args.since]
+    y = df.pop("is_hr").to_numpy()
+    X = df                                  # feature-store META_COLS are dropped below
 
     model = joblib.load(args.model_path)
-    preds = model.predict_proba(X)[:,1]
+    X = FeatureEncoder.from_model(model).encode_frame(X)   # one-hot or categorical layout
+    preds = make_backend(args.backend, model).predict(X)
 
     prob_true, prob_pred = calibration_curve(y, preds, n_bins=20)
     plt.figure()
@@ -27,5 +55,23 @@ def main():
     plt.savefig("calibration_plot.png", dpi=150, bbox_inches="tight")
     print("Saved calibration_plot.png")
 
+    t0 = time.perf_counter()
+    slices = {f: field_codes(df, f) for f in args.slices}
+    report = evaluate(preds, y, slices, replicates=args.bootstrap, n_bins=args.score_bins,
+                      ci=args.ci, seed=args.seed, min_rows=args.min_rows, workers=args.workers)
+    report = {"model": args.model_path, "features": args.features_parquet,
+              "backend": args.backend, "since": args.since, **report,
+              "seconds": time.perf_counter() - t0}
+
+    overall = report["overall"]
+    print(f"{len(y):,} rows, HR rate {overall['hr_rate']:.4f}, mean p {overall['mean_p']:.4f}")
+    for m in METRICS:
+        v = overall[m]
+        print(f"  {m:<8} {v['value']:.5f}  [{v['lo']:.5f}, {v['hi']:.5f}]")
+    with open(args.report, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"✅ wrote {args.report} ({sum(len(g) for g in report['slices'].values())} slices, "
+          f"{report['seconds']:.1f}s)")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,32 @@
+"""Export a trained .pkl as a version-stamped serving artifact.
+
+Usage:
+    python -m models.export_artifact models/hr_model.pkl 2024-wind-v2 [--no-activate]
+
+Writes models/artifacts/<version>/ and, unless --no-activate is given,
+atomically points serve/config.json at it.  Running API workers pick the
+new version up on their next config poll without a restart.
+"""
+import argparse, joblib
+from utils.artifacts import ARTIFACT_ROOT, export_artifact, update_config
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("model_path")
+    ap.add_argument("version")
+    ap.add_argument("--root", default=ARTIFACT_ROOT)
+    ap.add_argument("--config", default="serve/config.json")
+    ap.add_argument("--no-activate", action="store_true")
+    args = ap.parse_args()
+
+    model = joblib.load(args.model_path)
+    out = export_artifact(model, args.version, root=args.root, source=args.model_path)
+    print(f"✅ wrote {out}")
+
+    if not args.no_activate:
+        update_config(args.config, model_version=args.version,
+                      model_path=args.model_path, artifact_dir=str(out))
+        print(f"✅ {args.config} now serves {args.version}")
+
+if __name__ == "__main__":
+    main()
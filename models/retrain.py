@@ -0,0 +1,412 @@
+"""Scheduled retraining: parallel hyper-parameter search + promotion.
+
+Usage:
+    python -m models.retrain data/feature_store [--run 2024-W40] [--trials 32]
+        [--workers 4] [--threads 2] [--valid-from 2024-09-01 | --valid-frac 0.2]
+        [--holdout-frac 0.35] [--train-from 2023-03-30] [--metric logloss] [--promote]
+
+Weekly cron (Monday 06:00, last ~6 weeks as the validation window):
+    0 6 * * 1  cd /srv/hr_model && python -m models.retrain data/feature_store --promote
+
+Every trial draws its parameters from ``SPACE`` with a seed derived from
+``(--seed, trial number)``, so a rerun of the same ``--run`` regenerates
+the same trials.  Trials run in a spawn-based process pool; each worker
+memory-maps the shared column store, quantises train/validation once and
+trains with ``nthread=--threads`` (workers × threads ≤ cores, so OpenMP
+does not oversubscribe).  The time-ordered validation window (every game
+on/after the cutoff date) is split by date: its earlier part drives early
+stopping and trial selection, its last ``--holdout-frac`` is held out for
+the promotion decision only.
+
+Results go to ``<out>/trials.sqlite`` (one row per (run, trial)) and each
+finished booster to ``<out>/<run>/trial-NNN.ubj``; finished trials are
+skipped on restart, so an interrupted search resumes where it stopped.
+``--promote`` refits the best trial's parameters on train + validation
+for its ``best_iteration + 1`` rounds and compares that model with the one
+currently served on the holdout (or, when the served model may have
+trained on holdout games, with a refit of its parameters on the same
+rows).  If it wins, the same parameters are
+refit once more on every row (holdout included, so the newest games reach
+production), exported as artifact ``<run>-tNNN`` and ``serve/config.json``
+is pointed at it.
+"""
+import argparse, atexit, datetime as dt, json, math, os, pathlib, shutil, sqlite3, tempfile, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Optional
+
+import joblib, numpy as np, xgboost as xgb
+from sklearn.metrics import brier_score_loss, log_loss, roc_auc_score
+
+from models.train_xgb import build_model, open_store, predict_store, store_dmatrices, wrap_booster
+from processing.feature_engineering import VOCAB_PATH
+from utils.artifacts import ARTIFACT_ROOT, export_artifact, load_model, read_meta, update_config
+from utils.column_store import STORE_PATH, ColumnStore
+from utils.request_helper import FeatureEncoder
+
+OUT_DIR = "models/retrain"
+CONFIG_PATH = "serve/config.json"
+METRICS = ("logloss", "brier")
+
+# (kind, low, high): "log" = log-uniform, "uniform", "int" = inclusive ints,
+# "choice" = one of the listed values
+SPACE = {
+    "learning_rate":    ("log", 0.01, 0.2),
+    "max_depth":        ("int", 3, 10),
+    "min_child_weight": ("log", 1.0, 50.0),
+    "subsample":        ("uniform", 0.5, 1.0),
+    "colsample_bytree": ("uniform", 0.5, 1.0),
+    "reg_lambda":       ("log", 0.1, 20.0),
+    "gamma":            ("choice", [0.0, 0.1, 0.5, 1.0]),
+    "scale_pos_weight": ("choice", [1.0, "balanced"]),
+}
+
+
+# ---------------------------------------------------------------------
+# Search space
+# ---------------------------------------------------------------------
+def sample_params(seed: int, trial: int) -> dict:
+    """Deterministic draw for ``trial`` (same seed + trial -> same params)."""
+    rng = np.random.default_rng([seed, trial])
+    params = {}
+    for name, (kind, *spec) in SPACE.items():
+        if kind == "log":
+            params[name] = float(math.exp(rng.uniform(math.log(spec[0]), math.log(spec[1]))))
+        elif kind == "uniform":
+            params[name] = float(rng.uniform(spec[0], spec[1]))
+        elif kind == "int":
+            params[name] = int(rng.integers(spec[0], spec[1] + 1))
+        else:
+            params[name] = spec[0][int(rng.integers(len(spec[0])))]
+    return params
+
+
+# ---------------------------------------------------------------------
+# Results table
+# ---------------------------------------------------------------------
+class TrialTable:
+    """SQLite table of trials; the parent process is the only writer."""
+
+    def __init__(self, path: str):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS trials ("
+            " run TEXT, trial INTEGER, status TEXT, params TEXT,"
+            " best_iteration INTEGER, logloss REAL, brier REAL, auc REAL,"
+            " seconds REAL, model_path TEXT, error TEXT, finished REAL,"
+            " PRIMARY KEY (run, trial))"
+        )
+        self.db.commit()
+
+    def done(self, run: str) -> set:
+        return {t for (t,) in self.db.execute(
+            "SELECT trial FROM trials WHERE run = ? AND status = 'done'", (run,))}
+
+    def record(self, run: str, result: dict) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run, result["trial"], result["status"], json.dumps(result["params"]),
+             result.get("best_iteration"), result.get("logloss"), result.get("brier"),
+             result.get("auc"), result.get("seconds"), result.get("model_path"),
+             result.get("error"), time.time()),
+        )
+        self.db.commit()                         # per trial: crash-safe resume
+
+    def best(self, run: str, metric: str) -> Optional[dict]:
+        cur = self.db.execute(
+            f"SELECT trial, params, {metric}, model_path, best_iteration FROM trials"
+            f" WHERE run = ? AND status = 'done' ORDER BY {metric} LIMIT 1", (run,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return {"trial": row[0], "params": json.loads(row[1]), metric: row[2],
+                "model_path": row[3], "best_iteration": row[4]}
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# ---------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------
+_W = {}                                          # per-process state set by _init_worker
+
+def _init_worker(store_root: str, train_idx: np.ndarray, valid_idx: np.ndarray,
+                 threads: int, external_memory: bool, batch_rows: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    xgb.set_config(nthread=threads)
+    store = ColumnStore(store_root)              # mmap: pages shared between workers
+    cache = None
+    if external_memory:
+        cache = tempfile.mkdtemp(prefix="xgb-cache-")
+        atexit.register(shutil.rmtree, cache, True)
+    dtrain, dvalid = store_dmatrices(store, train_idx, valid_idx, cache, batch_rows)
+    y_train = np.asarray(store.y[train_idx])
+    _W.update(store=store, dtrain=dtrain, dvalid=dvalid, threads=threads,
+              y_valid=np.asarray(store.y[valid_idx]),
+              imbalance=float((len(y_train) - y_train.sum()) / y_train.sum()))
+
+def run_trial(trial: int, params: dict, max_rounds: int, early_stopping: int,
+              model_dir: str) -> dict:
+    """Train one parameter set with early stopping; returns its metrics."""
+    t0 = time.perf_counter()
+    params = dict(params)
+    if params.get("scale_pos_weight") == "balanced":
+        params["scale_pos_weight"] = _W["imbalance"]
+    xgb_params = {
+        "objective": "binary:logistic",
+        "eval_metric": "logloss",
+        "tree_method": "hist",
+        "nthread": _W["threads"],
+        **params,
+    }
+    booster = xgb.train(xgb_params, _W["dtrain"], num_boost_round=max_rounds,
+                        evals=[(_W["dvalid"], "valid")],
+                        early_stopping_rounds=early_stopping, verbose_eval=False)
+    best = booster.best_iteration
+    p = booster.predict(_W["dvalid"], iteration_range=(0, best + 1))
+    y = _W["y_valid"]
+
+    path = pathlib.Path(model_dir) / f"trial-{trial:03d}.ubj"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    booster.save_model(path)
+    return {
+        "trial": trial, "status": "done", "params": params, "best_iteration": best,
+        "logloss": float(log_loss(y, p, labels=[0, 1])),
+        "brier": float(brier_score_loss(y, p)),
+        "auc": float(roc_auc_score(y, p)) if 0 < y.sum() < len(y) else None,
+        "seconds": time.perf_counter() - t0, "model_path": str(path),
+    }
+
+
+# ---------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------
+def search(store: ColumnStore, train_idx: np.ndarray, valid_idx: np.ndarray,
+           table: TrialTable, run: str, trials: int, workers: int, threads: int, *,
+           seed: int = 0, max_rounds: int = 2000, early_stopping: int = 50,
+           external_memory: bool = False, batch_rows: int = 100_000,
+           out_dir: str = OUT_DIR) -> int:
+    """Run every trial of ``run`` not finished yet; returns how many ran."""
+    todo = [t for t in range(trials) if t not in table.done(run)]
+    print(f"run {run}: {trials - len(todo)}/{trials} trials already done, "
+          f"{len(todo)} to go on {workers} workers × {threads} threads")
+    if not todo:
+        return 0
+
+    model_dir = str(pathlib.Path(out_dir) / run)
+    pool = ProcessPoolExecutor(
+        workers, mp_context=get_context("spawn"), initializer=_init_worker,
+        initargs=(str(store.root), train_idx, valid_idx, threads, external_memory, batch_rows))
+    try:
+        pending = {}
+        for t in todo:
+            params = sample_params(seed, t)
+            pending[pool.submit(run_trial, t, params, max_rounds, early_stopping, model_dir)] = (t, params)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                t, params = pending.pop(fut)
+                try:
+                    result = fut.result()
+                    print(f"  trial {t:3d}: logloss {result['logloss']:.5f}  "
+                          f"brier {result['brier']:.5f}  rounds {result['best_iteration'] + 1}  "
+                          f"({result['seconds']:.0f}s)")
+                except Exception as e:           # recorded; retried on the next run
+                    result = {"trial": t, "status": "failed", "params": params, "error": repr(e)}
+                    print(f"[warn] trial {t} failed: {e!r}")
+                table.record(run, result)
+    except KeyboardInterrupt:
+        print("[warn] interrupted; finished trials are saved, rerun to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return len(todo)
+
+
+def split_holdout(store: ColumnStore, valid_idx: np.ndarray, frac: float) -> tuple:
+    """
+    ``(valid_idx, holdout_idx)``: the last ~``frac`` of the validation rows
+    by game date become the holdout, so no game is split.  Without dates
+    the last rows (file order) are used.
+    """
+    n = len(valid_idx)
+    if n == 0 or frac <= 0:
+        return valid_idx, valid_idx[:0]
+    if store.game_date is None:
+        cut = int(n * (1 - frac))
+        return valid_idx[:cut], valid_idx[cut:]
+    dates = np.asarray(store.game_date[valid_idx])
+    cutoff = np.sort(dates)[min(n - 1, int(n * (1 - frac)))]
+    held = dates >= cutoff
+    return valid_idx[~held], valid_idx[held]
+
+
+def metric_value(y: np.ndarray, p: np.ndarray, metric: str) -> float:
+    return float(log_loss(y, p, labels=[0, 1]) if metric == "logloss" else brier_score_loss(y, p))
+
+
+def served_model(config_path: str) -> tuple:
+    """``(model, training)`` served by ``config_path``; ``training`` is the
+    artifact's record of its training rows, ``None`` when unknown."""
+    with open(config_path, encoding="utf-8") as fh:
+        cfg = json.load(fh)
+    if cfg.get("artifact_dir"):
+        return load_model(cfg["artifact_dir"]), read_meta(cfg["artifact_dir"]).get("training")
+    return joblib.load(cfg["model_path"]), None
+
+
+def score_current(config_path: str, store: ColumnStore, holdout_idx: np.ndarray,
+                  fit_idx: np.ndarray, metric: str, threads: int,
+                  external_memory: bool = False, batch_rows: int = 100_000) -> Optional[float]:
+    """
+    Metric of the model ``config_path`` serves on the holdout rows.
+
+    Scored as is only when its artifact says it was trained on games
+    before the holdout.  Otherwise (a random split of the season, or no
+    record) it may have seen holdout rows and would look better than it
+    is, so its parameters are refit on ``fit_idx`` (the candidate's
+    training rows, same number of rounds) and that refit is scored.
+    """
+    model, training = served_model(config_path)
+    encoder = FeatureEncoder.from_model(model)
+    if encoder.feature_names != store.feature_names:
+        print("[warn] served model uses a different feature layout; not comparable")
+        return None
+    through = (training or {}).get("through")
+    start = store.game_date[holdout_idx].min() if store.game_date is not None else None
+    booster = model.get_booster()
+    best = booster.attr("best_iteration")
+    rounds = int(best) + 1 if best is not None else booster.num_boosted_rounds()
+    if through is None or start is None or np.datetime64(through, "D") >= start:
+        print(f"[warn] served model trained through {through or 'unknown'}, holdout starts "
+              f"{start if start is not None else 'unknown'}; scoring a refit of its "
+              f"parameters ({rounds} rounds) on the candidate's {len(fit_idx):,} training rows")
+        model = refit(model, rounds, store, fit_idx, threads, external_memory, batch_rows)
+        booster = model.get_booster()
+    p = booster.inplace_predict(store.X[holdout_idx], validate_features=False,
+                                iteration_range=(0, rounds))
+    return metric_value(np.asarray(store.y[holdout_idx]), p, metric)
+
+
+def refit(template, rounds: int, store: ColumnStore, idx: np.ndarray, threads: int,
+          external_memory: bool = False, batch_rows: int = 100_000):
+    """
+    ``template``'s parameters trained on rows ``idx`` for ``rounds`` rounds
+    (no early stopping: there is no window left to stop on).  Returns the
+    XGBClassifier the API loads.
+    """
+    categorical = "c" in store.feature_types
+    params = {**template.get_xgb_params(), "tree_method": "hist", "nthread": threads}
+    with tempfile.TemporaryDirectory(prefix="xgb-cache-") as cache:
+        if external_memory:
+            dtrain = xgb.ExtMemQuantileDMatrix(
+                store.iterator(idx, batch_rows, os.path.join(cache, "train")),
+                enable_categorical=categorical)
+        else:
+            dtrain = xgb.QuantileDMatrix(store.iterator(idx, batch_rows),
+                                         enable_categorical=categorical)
+        booster = xgb.train(params, dtrain, num_boost_round=rounds)
+        del dtrain
+    return wrap_booster(booster, template, store)
+
+
+def training_record(store: ColumnStore, idx: np.ndarray, run: str, best: dict) -> dict:
+    """What a promoted model was fit on, for the artifact's meta.json."""
+    return {
+        "run": run, "trial": best["trial"], "params": best["params"],
+        "rounds": best["best_iteration"] + 1, "rows": int(len(idx)),
+        "through": str(store.game_date[idx].max()) if store.game_date is not None else None,
+    }
+
+
+def promote(model, best: dict, run: str, training: dict, config_path: str = CONFIG_PATH,
+            root: str = ARTIFACT_ROOT) -> pathlib.Path:
+    """Export the refit ``model`` of the best trial and point the API config at it."""
+    version = f"{run}-t{best['trial']:03d}"
+    out = export_artifact(model, version, root=root, training=training)
+    update_config(config_path, model_version=version, artifact_dir=str(out))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("features", help="features parquet or partitioned feature store")
+    ap.add_argument("--run", default=None, help="run id (default: ISO week, e.g. 2024-W40)")
+    ap.add_argument("--trials", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    ap.add_argument("--threads", type=int, default=None, help="threads per trial (default cores/workers)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-rounds", type=int, default=2000)
+    ap.add_argument("--early-stopping", type=int, default=50)
+    ap.add_argument("--valid-frac", type=float, default=0.15)
+    ap.add_argument("--valid-from", help="first validation game_date (YYYY-MM-DD)")
+    ap.add_argument("--holdout-frac", type=float, default=0.35,
+                    help="last share of the validation window kept for the promote decision")
+    ap.add_argument("--train-from", help="drop training rows before this game_date")
+    ap.add_argument("--metric", default="logloss", choices=METRICS)
+    ap.add_argument("--column-store", default=STORE_PATH)
+    ap.add_argument("--vocab", default=VOCAB_PATH)
+    ap.add_argument("--external-memory", action="store_true")
+    ap.add_argument("--batch-rows", type=int, default=100_000)
+    ap.add_argument("--out", default=OUT_DIR)
+    ap.add_argument("--promote", action="store_true", help="export + activate the best trial")
+    ap.add_argument("--config", default=CONFIG_PATH)
+    ap.add_argument("--artifact-root", default=ARTIFACT_ROOT)
+    args = ap.parse_args()
+
+    year, week, _ = dt.date.today().isocalendar()
+    run = args.run or f"{year}-W{week:02d}"
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    store = open_store(args.features, args.column_store, args.vocab)
+    train_idx, valid_idx = store.time_split(args.valid_frac, args.valid_from)
+    if args.train_from and store.game_date is not None:
+        train_idx = train_idx[np.asarray(store.game_date[train_idx]) >= np.datetime64(args.train_from, "D")]
+    valid_idx, holdout_idx = split_holdout(store, valid_idx, args.holdout_frac)
+    print(f"train {len(train_idx):,} rows, validate {len(valid_idx):,} rows, "
+          f"holdout {len(holdout_idx):,} rows")
+
+    table = TrialTable(os.path.join(args.out, "trials.sqlite"))
+    try:
+        search(store, train_idx, valid_idx, table, run, args.trials, args.workers, threads,
+               seed=args.seed, max_rounds=args.max_rounds, early_stopping=args.early_stopping,
+               external_memory=args.external_memory, batch_rows=args.batch_rows, out_dir=args.out)
+        best = table.best(run, args.metric)
+    finally:
+        table.close()
+    if best is None:
+        raise SystemExit("❗ no finished trials")
+    print(f"best trial {best['trial']}: {args.metric} {best[args.metric]:.5f}  {best['params']}")
+
+    if args.promote:
+        if len(holdout_idx) == 0:
+            raise SystemExit("❗ --promote needs a holdout (--holdout-frac > 0)")
+        fit_idx = np.concatenate([train_idx, valid_idx])
+        template = build_model(np.asarray(store.y[fit_idx]),
+                               categorical="c" in store.feature_types, **best["params"])
+        rounds = best["best_iteration"] + 1
+        print(f"refitting trial {best['trial']} on {len(fit_idx):,} rows for {rounds} rounds")
+        candidate = refit(template, rounds, store, fit_idx, threads * args.workers,
+                          args.external_memory, args.batch_rows)
+        score = metric_value(np.asarray(store.y[holdout_idx]),
+                             predict_store(candidate.get_booster(), store, holdout_idx, args.batch_rows),
+                             args.metric)
+        current = score_current(args.config, store, holdout_idx, fit_idx, args.metric,
+                                threads * args.workers, args.external_memory, args.batch_rows)
+        print(f"holdout {args.metric}: candidate {score:.5f}"
+              + (f", served {current:.5f}" if current is not None else ""))
+        if current is not None and current <= score:
+            print("served model is as good or better on the holdout; not promoting")
+            return
+        all_idx = np.concatenate([fit_idx, holdout_idx])
+        print(f"refitting on all {len(all_idx):,} rows")
+        model = refit(template, rounds, store, all_idx, threads * args.workers,
+                      args.external_memory, args.batch_rows)
+        out = promote(model, best, run, training_record(store, all_idx, run, best),
+                      args.config, args.artifact_root)
+        print(f"✅ promoted {out} → {args.config}")
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,178 @@
+"""Train an XGBoost classifier for HR probability.
 
-"""Train an XGBoost classifier for HR probability."""
-import argparse, joblib, pandas as pd
+Usage:
+    python -m models.train_xgb features.parquet models/hr_model.pkl [--vocab data/feature_vocab.json]
+
+Works with either feature layout (see ``processing/feature_engineering.py``).
+If the frame has ``category`` columns the model is trained with XGBoost's
+native categorical splits, their categories are pinned to the vocabulary
+and the vocabulary is stored on the booster (attribute ``category_vocab``)
+so the serving encoder maps raw values to the same codes.
+
+Column-store mode (no pandas, bounded memory):
+    python -m models.train_xgb data/feature_store models/hr_model.pkl \
+        --column-store data/column_store [--valid-from 2024-09-01 | --valid-frac 0.2]
+        [--external-memory] [--batch-rows 100000]
+
+The features are streamed once from Arrow into a memory-mapped NumPy
+store (rebuilt only when the parquet changes), split by ``game_date``
+into train/validation index arrays, and fed to a ``QuantileDMatrix``
+through a ``DataIter`` one slice at a time.  ``--external-memory`` keeps
+XGBoost's quantised pages on disk too, for data larger than RAM.
+"""
+import argparse, json, os, tempfile, joblib, numpy as np, pandas as pd
+from typing import Optional
+import xgboost as xgb
+from processing.feature_engineering import META_COLS, VOCAB_PATH, apply_vocab, category_vocab, peak_rss_mb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, brier_score_loss
 from xgboost import XGBClassifier
+from utils.column_store import ColumnStore, build_column_store
+
+def build_model(y_train: pd.Series, categorical: bool = False, **params) -> XGBClassifier:
+    """The production classifier; ``params`` override the defaults."""
+    imbalance = (len(y_train) - y_train.sum()) / y_train.sum()
+    defaults = dict(
+        n_estimators=600,
+        learning_rate=0.05,
+        max_depth=6,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        objective="binary:logistic",
+        eval_metric="logloss",
+        scale_pos_weight=imbalance
+    )
+    if categorical:
+        defaults.update(enable_categorical=True, tree_method="hist")
+    return XGBClassifier(**{**defaults, **params})
+
+def predict_store(booster, store: ColumnStore, idx: np.ndarray,
+                  batch_rows: int = 100_000) -> np.ndarray:
+    """P(HR) for store rows ``idx``, one slice at a time."""
+    out = np.empty(len(idx), dtype=np.float32)
+    for i in range(0, len(idx), batch_rows):
+        chunk = idx[i:i + batch_rows]
+        out[i:i + len(chunk)] = booster.inplace_predict(store.X[chunk], validate_features=False)
+    return out
+
+def store_dmatrices(store: ColumnStore, train_idx: np.ndarray, valid_idx: np.ndarray,
+                    cache_dir: Optional[str] = None, batch_rows: int = 100_000) -> tuple:
+    """
+    ``(dtrain, dvalid)`` quantised straight from the store; with
+    ``cache_dir`` they are external-memory matrices paged from that dir.
+    """
+    categorical = "c" in store.feature_types
+    if cache_dir:
+        dtrain = xgb.ExtMemQuantileDMatrix(
+            store.iterator(train_idx, batch_rows, os.path.join(cache_dir, "train")),
+            enable_categorical=categorical)
+        dvalid = xgb.ExtMemQuantileDMatrix(
+            store.iterator(valid_idx, batch_rows, os.path.join(cache_dir, "valid")),
+            ref=dtrain, enable_categorical=categorical)
+    else:
+        dtrain = xgb.QuantileDMatrix(store.iterator(train_idx, batch_rows),
+                                     enable_categorical=categorical)
+        dvalid = xgb.QuantileDMatrix(store.iterator(valid_idx, batch_rows),
+                                     ref=dtrain, enable_categorical=categorical)
+    return dtrain, dvalid
+
+def wrap_booster(booster, template: XGBClassifier, store: ColumnStore) -> XGBClassifier:
+    """Natively trained booster -> the XGBClassifier pickle the API loads."""
+    if store.category_vocab:
+        booster.set_attr(category_vocab=json.dumps(store.category_vocab))
+    model = XGBClassifier(**template.get_params())
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+def train_from_store(store: ColumnStore, train_idx: np.ndarray, valid_idx: np.ndarray,
+                     external_memory: bool = False, batch_rows: int = 100_000,
+                     **params) -> XGBClassifier:
+    """Fit the production model on column-store rows without a pandas copy."""
+    template = build_model(store.y[train_idx], categorical="c" in store.feature_types, **params)
+
+    with tempfile.TemporaryDirectory(prefix="xgb-cache-") as cache:
+        dtrain, dvalid = store_dmatrices(store, train_idx, valid_idx,
+                                         cache if external_memory else None, batch_rows)
+        booster = xgb.train(template.get_xgb_params(), dtrain,
+                            num_boost_round=template.n_estimators,
+                            evals=[(dvalid, "valid")], verbose_eval=100)
+        del dtrain, dvalid
+    return wrap_booster(booster, template, store)
+
+def open_store(features_path: str, root: str, vocab_path: str = VOCAB_PATH,
+               batch_rows: int = 250_000) -> ColumnStore:
+    """The column store for ``features_path``, (re)built if missing or stale."""
+    if os.path.exists(os.path.join(root, "meta.json")):
+        store = ColumnStore(root)
+        if not store.is_stale(features_path):
+            return store
+    vocab = None
+    if os.path.exists(vocab_path):
+        with open(vocab_path) as fh:
+            vocab = json.load(fh)
+    build_column_store(features_path, root, vocab, batch_rows)
+    store = ColumnStore(root)
+    print(f"built column store {root} ({len(store):,} rows)")
+    return store
+
+def main_store(args):
+    store = open_store(args.features_parquet, args.column_store, args.vocab)
+    train_idx, valid_idx = store.time_split(args.valid_frac, args.valid_from)
+    if store.game_date is not None:
+        print(f"train {len(train_idx):,} rows, validate {len(valid_idx):,} rows "
+              f"from {store.game_date[valid_idx].min()}")
+    model = train_from_store(store, train_idx, valid_idx, args.external_memory, args.batch_rows)
+
+    preds = predict_store(model.get_booster(), store, valid_idx, args.batch_rows)
+    y_val = np.asarray(store.y[valid_idx])
+    print("ROC-AUC:", roc_auc_score(y_val, preds))
+    print("Brier:", brier_score_loss(y_val, preds))
+    print(f"peak RSS {peak_rss_mb():,.0f} MB")
+
+    joblib.dump(model, args.model_out)
+    print(f"Model saved to {args.model_out}")
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("features_parquet")
     ap.add_argument("model_out")
+    ap.add_argument("--vocab", default=VOCAB_PATH,
+                    help="category vocabulary for the categorical layout (if the file exists)")
+    ap.add_argument("--column-store", help="train from this memory-mapped store (built if missing/stale)")
+    ap.add_argument("--external-memory", action="store_true", help="keep DMatrix pages on disk")
+    ap.add_argument("--valid-frac", type=float, default=0.2)
+    ap.add_argument("--valid-from", help="first validation game_date (YYYY-MM-DD)")
+    ap.add_argument("--batch-rows", type=int, default=100_000)
     args = ap.parse_args()
+    if args.column_store:
+        return main_store(args)
 
     df = pd.read_parquet(args.features_parquet)
     y = df.pop("is_hr")
-    X = df
+    X = df.drop(columns=[c for c in META_COLS if c in df])
+
+    vocab = category_vocab(X)
+    if vocab:
+        if os.path.exists(args.vocab):
+            with open(args.vocab) as fh:
+                vocab = json.load(fh)
+        X = apply_vocab(X, vocab)
+        vocab = category_vocab(X)
 
     X_train, X_val, y_train, y_val = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    imbalance = (len(y_train) - y_train.sum()) / y_train.sum()
-
-    model = XGBClassifier(
-        n_estimators=600,
-        learning_rate=0.05,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        objective="binary:logistic",
-        eval_metric="logloss",
-        scale_pos_weight=imbalance
-    )
+    model = build_model(y_train, categorical=bool(vocab))
     model.fit(X_train, y_train)
+    if vocab:
+        model.get_booster().set_attr(category_vocab=json.dumps(vocab))
     preds = model.predict_proba(X_val)[:,1]
     print("ROC-AUC:", roc_auc_score(y_val, preds))
     print("Brier:", brier_score_loss(y_val, preds))
 
+    print(f"peak RSS {peak_rss_mb():,.0f} MB")
+
     joblib.dump(model, args.model_out)
     print(f"Model saved to {args.model_out}")
 
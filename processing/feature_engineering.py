@@ -3,10 +3,32 @@
 
 Usage:
     python processing/feature_engineering.py raw.parquet features.parquet
+    python processing/feature_engineering.py data/statcast features.parquet --stream \
+        [--batch-rows 250000] [--vocab data/feature_vocab.json]
+
+``--stream`` reads the input (single file or partitioned dataset) in
+record batches, one-hot encodes every batch against a fixed category
+vocabulary and appends it to the output with a ParquetWriter, so peak
+memory depends on --batch-rows, not on the season count.  The vocabulary
+is built on first use by scanning only the categorical columns, saved as
+JSON, and reused afterwards so every run emits the same columns.
+
+``--layout categorical`` keeps each categorical as one integer-coded
+pandas ``category`` column (codes = position in the vocabulary) instead
+of ~100 one-hot columns; ``train_xgb`` trains those with XGBoost's native
+categorical splits.  The parquet is dictionary encoded and several times
+smaller, and every downstream matrix is 15 columns wide instead of 110.
+
+``--rolling`` adds trailing batter/pitcher form (``processing.rolling``:
+EV, barrel and HR rates over the last N PAs / days) computed over the
+whole input at once, so it needs the in-memory path, not ``--stream``
+(run as ``python -m processing.feature_engineering ... --rolling``).
 """
-import sys, argparse, pathlib, pandas as pd, numpy as np
+import sys, json, argparse, pathlib, pandas as pd, numpy as np
+import pyarrow as pa, pyarrow.dataset as ds, pyarrow.parquet as pq
 WEATHER_PATH   = "data/weather_2024.parquet"
 PARK_ORIENT_CSV = "utils/park_orientation.csv"
+VOCAB_PATH     = "data/feature_vocab.json"
 BASIC_KEEP = [
     "game_date", "batter", "pitcher", "stand", "p_throws",
     "pitch_type", "balls", "strikes", "inning",
@@ -15,24 +37,82 @@ BASIC_KEEP = [
     "wind_out_to_cf"
 ]
 
-def engineer(df: pd.DataFrame) -> pd.DataFrame:
-    df = df[BASIC_KEEP].copy()
+CAT_COLS = ["stand", "p_throws", "pitch_type", "home_team", "away_team", "inning", "month"]
+META_COLS = ["game_pk", "game_date"]   # row keys kept by the feature store; never model inputs
+LAYOUTS = ("onehot", "categorical")
+
+def engineer(df: pd.DataFrame, vocab: dict = None, layout: str = "onehot",
+             extra: list = ()) -> pd.DataFrame:
+    """
+    Model-ready feature frame.
+
+    ``layout="onehot"`` expands every categorical into dummy columns.
+    With ``vocab`` ({col: [levels]}) every categorical gets exactly those
+    dummy columns, in that order, whatever subset of levels the frame
+    contains; unseen levels encode as all-zero.
+
+    ``layout="categorical"`` keeps one ``category`` column per field whose
+    categories are the vocabulary levels (or the frame's own sorted levels
+    without ``vocab``); unseen levels become missing.
+
+    ``extra`` numeric columns (e.g. ``processing.rolling.ROLLING_COLS``)
+    are passed through unchanged.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown layout '{layout}' (expected one of {LAYOUTS})")
+    df = df[BASIC_KEEP + list(extra)].copy()
     df["is_hr"] = (df["events"] == "home_run").astype("int8")
     df["month"] = pd.to_datetime(df["game_date"]).dt.month.astype("int8")
-    df = df.drop(columns=["game_date"])
-    cat_cols = ["stand", "p_throws", "pitch_type", "home_team", "away_team", "inning", "month"]
-    df = pd.get_dummies(df, columns=cat_cols, dummy_na=False)
-    return df.drop(columns=["events"])
+    df = df.drop(columns=["game_date", "events"])
+    if layout == "categorical":
+        return apply_vocab(df, vocab)
+    if vocab is not None:
+        for col in CAT_COLS:
+            df[col] = pd.Categorical(df[col], categories=vocab[col])
+    return pd.get_dummies(df, columns=CAT_COLS, dummy_na=False)
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("in_path")
-    ap.add_argument("out_path")
-    args = ap.parse_args()
+def apply_vocab(df: pd.DataFrame, vocab: dict = None) -> pd.DataFrame:
+    """
+    Turn the ``CAT_COLS`` present in ``df`` into ``category`` columns with
+    fixed categories, so category codes mean the same thing in every file
+    (parquet round trips and batch subsets can drop unused categories).
+    """
+    for col in CAT_COLS:
+        if col not in df:
+            continue
+        values = df[col].astype(object) if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col]
+        levels = vocab[col] if vocab is not None else sorted(values.dropna().unique().tolist())
+        df[col] = pd.Categorical(values, categories=levels)
+    return df
 
-    df_raw = pd.read_parquet(args.in_path)
-    weather = pd.read_parquet(WEATHER_PATH)
-    orient  = pd.read_csv(PARK_ORIENT_CSV)
+def category_vocab(df: pd.DataFrame) -> dict:
+    """{col: [levels]} of every ``category`` column, in code order."""
+    return {c: df[c].cat.categories.tolist() for c in df.columns
+            if isinstance(df[c].dtype, pd.CategoricalDtype)}
+
+def onehot_to_categorical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse the one-hot groups of an existing feature frame back into
+    categorical columns (rows with no level set become missing), so old
+    feature files can be converted without re-engineering raw Statcast.
+    Levels keep the one-hot column order, i.e. the vocabulary order.
+    """
+    out = df.drop(columns=[c for c in df.columns
+                           if any(c.startswith(f"{f}_") for f in CAT_COLS)])
+    for col in CAT_COLS:
+        group = [c for c in df.columns if c.startswith(f"{col}_")]
+        if not group:
+            continue
+        levels = [c[len(col) + 1:] for c in group]
+        if all(v.lstrip("-").isdigit() for v in levels):
+            levels = [int(v) for v in levels]
+        block = df[group].to_numpy(dtype=np.int8)
+        codes = np.where(block.any(axis=1), block.argmax(axis=1), -1)
+        out[col] = pd.Categorical.from_codes(codes, categories=levels)
+    return out
+
+def add_wind(df_raw: pd.DataFrame, weather: pd.DataFrame, orient: pd.DataFrame) -> pd.DataFrame:
+    """Attach ``wind_out_to_cf`` (mph, positive = blowing out) per game."""
     weather = weather.merge(
         df_raw[["game_pk", "home_team"]].drop_duplicates(),
         on="game_pk", how="left"
@@ -42,12 +122,114 @@ def main():
     angle_diff = (weather["wind_dir_deg"] - weather["cf_deg"] + 360) % 360
     weather["wind_out_to_cf"] = weather["wind_speed_mph"] * np.cos(np.deg2rad(angle_diff))
 
-    df_raw = df_raw.merge(
+    return df_raw.merge(
         weather[["game_pk", "wind_out_to_cf"]],
         on="game_pk", how="left"
     )
-   
-    df_feat = engineer(df_raw)
+
+# ---------------------------------------------------------------------
+# Fixed category vocabulary
+# ---------------------------------------------------------------------
+def build_vocab(dataset: ds.Dataset, batch_rows: int = 1_000_000) -> dict:
+    """Scan only the categorical columns and collect sorted level lists
+    (the same order ``pd.get_dummies`` uses on the full frame)."""
+    raw_cols = [c for c in CAT_COLS if c != "month"] + ["game_date"]
+    levels = {c: set() for c in CAT_COLS}
+    for batch in dataset.to_batches(columns=raw_cols, batch_size=batch_rows):
+        df = batch.to_pandas()
+        df["month"] = pd.to_datetime(df["game_date"]).dt.month
+        for c in CAT_COLS:
+            levels[c].update(df[c].dropna().unique().tolist())
+    return {c: sorted(v) for c, v in levels.items()}
+
+def load_or_build_vocab(path: str, dataset: ds.Dataset, rebuild: bool = False) -> dict:
+    p = pathlib.Path(path)
+    if p.exists() and not rebuild:
+        with open(p) as fh:
+            return json.load(fh)
+    vocab = build_vocab(dataset)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, "w") as fh:
+        json.dump(vocab, fh, indent=1)
+    print(f"wrote category vocabulary → {p}")
+    return vocab
+
+def open_dataset(in_path: str) -> ds.Dataset:
+    """Single parquet file or Hive-partitioned directory."""
+    return ds.dataset(in_path, format="parquet", partitioning="hive")
+
+# ---------------------------------------------------------------------
+# Streaming mode
+# ---------------------------------------------------------------------
+def stream_features(in_path: str, out_path: str, vocab: dict,
+                    batch_rows: int = 250_000, layout: str = "onehot") -> int:
+    """Engineer ``in_path`` batch by batch into ``out_path``; returns rows."""
+    dataset = open_dataset(in_path)
+    weather = pd.read_parquet(WEATHER_PATH)
+    orient  = pd.read_csv(PARK_ORIENT_CSV)
+    raw_cols = [c for c in BASIC_KEEP if c != "wind_out_to_cf"] + ["game_pk"]
+
+    out = pathlib.Path(out_path)
+    out.parent.mkdir(exist_ok=True, parents=True)
+    writer, rows = None, 0
+    try:
+        for batch in dataset.to_batches(columns=raw_cols, batch_size=batch_rows):
+            if batch.num_rows == 0:
+                continue
+            df_feat = engineer(add_wind(batch.to_pandas(), weather, orient), vocab, layout)
+            if writer is None:
+                table = pa.Table.from_pandas(df_feat, preserve_index=False)
+                writer = pq.ParquetWriter(out, table.schema)
+            else:
+                table = pa.Table.from_pandas(df_feat, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(df_feat)
+            del df_feat, table
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def peak_rss_mb() -> float:
+    try:
+        import resource                      # Unix only
+    except ImportError:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("in_path")
+    ap.add_argument("out_path")
+    ap.add_argument("--stream", action="store_true", help="out-of-core batch mode")
+    ap.add_argument("--batch-rows", type=int, default=250_000)
+    ap.add_argument("--vocab", default=VOCAB_PATH)
+    ap.add_argument("--rebuild-vocab", action="store_true")
+    ap.add_argument("--layout", default="onehot", choices=LAYOUTS)
+    ap.add_argument("--rolling", action="store_true", help="add trailing batter/pitcher form")
+    args = ap.parse_args()
+
+    if args.stream:
+        if args.rolling:
+            raise SystemExit("❗ --rolling needs the whole input in order; drop --stream")
+        vocab = load_or_build_vocab(args.vocab, open_dataset(args.in_path), args.rebuild_vocab)
+        n = stream_features(args.in_path, args.out_path, vocab, args.batch_rows, args.layout)
+        print(f"Features saved to {args.out_path} ({n:,} rows, peak RSS {peak_rss_mb():,.0f} MB)")
+        return
+
+    df_raw = pd.read_parquet(args.in_path)
+    weather = pd.read_parquet(WEATHER_PATH)
+    orient  = pd.read_csv(PARK_ORIENT_CSV)
+    df_raw = add_wind(df_raw, weather, orient)
+    extra = []
+    if args.rolling:
+        from processing.rolling import ROLLING_COLS, add_rolling
+        df_raw, extra = add_rolling(df_raw), ROLLING_COLS
+
+    vocab = None
+    if args.layout == "categorical":            # codes must match across runs
+        vocab = load_or_build_vocab(args.vocab, open_dataset(args.in_path), args.rebuild_vocab)
+    df_feat = engineer(df_raw, vocab, args.layout, extra)
     out = pathlib.Path(args.out_path)
     out.parent.mkdir(exist_ok=True, parents=True)
     df_feat.to_parquet(out, index=False)
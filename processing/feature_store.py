@@ -0,0 +1,249 @@
+"""Incremental feature store keyed by game_pk.
+
+Usage:
+    python -m processing.feature_store data/statcast [--store data/feature_store]
+                                       [--since 2024-09-01] [--vocab data/feature_vocab.json]
+
+Each game's inputs are fingerprinted:
+
+* statcast - order-independent hash of the game's raw rows (+ row count)
+* weather  - hash of the game's weather row
+* orient   - hash of the home park's orientation row
+* vocab    - hash of the category vocabulary (a change re-encodes everything)
+
+Only games whose fingerprint differs from the stored one are engineered
+again.  Their rows are upserted into ``<store>/features/game_date=.../``
+(one file per date, rewritten atomically), so a daily refresh costs
+O(new or corrected games) instead of O(season).  ``--since`` restricts
+the raw scan to recent partitions when older dates are known to be final.
+
+``fingerprints.parquet`` also records the dates each game was stored
+under.  A rescheduled game is deleted from its old date files before the
+new rows go in, and a game that is gone from raw (within the scanned
+dates) is deleted from the store.
+
+Rows keep ``game_pk`` and ``game_date`` (``feature_engineering.META_COLS``) so training
+can split by date; ``pd.read_parquet(<store>/features)`` loads the lot.
+"""
+import argparse, hashlib, json, os, pathlib, time
+import numpy as np, pandas as pd
+
+from processing.feature_engineering import (
+    BASIC_KEEP, PARK_ORIENT_CSV, VOCAB_PATH, WEATHER_PATH,
+    add_wind, engineer, load_or_build_vocab, open_dataset,
+)
+
+STORE_PATH = "data/feature_store"
+RAW_COLS = [c for c in BASIC_KEEP if c != "wind_out_to_cf"] + ["game_pk"]
+FP_COLS = ["statcast_fp", "rows", "weather_fp", "orient_fp", "vocab_fp"]
+DATES = "game_dates"                             # ","-joined partitions a game is stored under
+
+
+# ---------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------
+def _group_hash(keys: np.ndarray, row_hashes: np.ndarray) -> pd.DataFrame:
+    """Sum of uint64 row hashes per key (wraps mod 2**64; order-independent)."""
+    order = np.argsort(keys, kind="stable")
+    keys, row_hashes = keys[order], row_hashes[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return pd.DataFrame({
+        "game_pk": keys[starts],
+        "fp": np.add.reduceat(row_hashes, starts),
+        "rows": np.diff(np.r_[starts, len(keys)]),
+    })
+
+def fingerprints(raw: pd.DataFrame, weather: pd.DataFrame, orient: pd.DataFrame,
+                 vocab: dict) -> pd.DataFrame:
+    """One row per game_pk with the fingerprint of each input."""
+    h = pd.util.hash_pandas_object(raw[RAW_COLS], index=False).to_numpy(np.uint64)
+    fp = _group_hash(raw["game_pk"].to_numpy(np.int64), h).rename(columns={"fp": "statcast_fp"})
+
+    wx = weather.drop_duplicates("game_pk")
+    wx_h = pd.Series(pd.util.hash_pandas_object(wx, index=False).to_numpy(np.uint64),
+                     index=wx["game_pk"].to_numpy(np.int64))
+    or_h = pd.Series(pd.util.hash_pandas_object(orient, index=False).to_numpy(np.uint64),
+                     index=orient["home_team"].to_numpy())
+    home = raw.drop_duplicates("game_pk").set_index("game_pk")["home_team"]
+
+    fp["weather_fp"] = wx_h.reindex(fp["game_pk"]).fillna(0).to_numpy(np.uint64)
+    fp["orient_fp"] = or_h.reindex(home.reindex(fp["game_pk"]).to_numpy()).fillna(0).to_numpy(np.uint64)
+    fp["vocab_fp"] = hashlib.sha1(json.dumps(vocab, sort_keys=True).encode()).hexdigest()[:16]
+    dates = raw.groupby("game_pk")["game_date"].agg(lambda d: ",".join(sorted(set(d))))
+    fp[DATES] = dates.reindex(fp["game_pk"]).to_numpy()
+    return fp
+
+def changed_games(new_fp: pd.DataFrame, old_fp: pd.DataFrame) -> np.ndarray:
+    """game_pks that are new or whose fingerprint differs."""
+    if old_fp.empty:
+        return new_fp["game_pk"].to_numpy()
+    m = new_fp.merge(old_fp, on="game_pk", how="left", suffixes=("", "_old"), indicator=True)
+    diff = m["_merge"].eq("left_only")
+    for c in FP_COLS:
+        diff |= m[c].ne(m[f"{c}_old"])
+    return m.loc[diff, "game_pk"].to_numpy()
+
+
+# ---------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------
+class FeatureStore:
+    """``<root>/fingerprints.parquet`` + ``<root>/features/game_date=*/part-0.parquet``."""
+
+    def __init__(self, root: str = STORE_PATH):
+        self.root = pathlib.Path(root)
+        self.features = self.root / "features"
+        self.fp_path = self.root / "fingerprints.parquet"
+
+    def load_fingerprints(self) -> pd.DataFrame:
+        if self.fp_path.exists():
+            fp = pd.read_parquet(self.fp_path)
+            if DATES not in fp:                  # written before dates were recorded
+                fp[DATES] = None
+            return fp
+        return pd.DataFrame(columns=["game_pk"] + FP_COLS + [DATES])
+
+    def save_fingerprints(self, fp: pd.DataFrame) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.fp_path.with_suffix(".tmp")
+        fp.to_parquet(tmp, index=False)
+        os.replace(tmp, self.fp_path)
+
+    def upsert(self, feats: pd.DataFrame) -> int:
+        """Replace the rows of every game in ``feats``, one date file at a time."""
+        for day, part in feats.groupby("game_date", sort=True):
+            d = self.features / f"game_date={day}"
+            d.mkdir(parents=True, exist_ok=True)
+            path = d / "part-0.parquet"
+            part = part.drop(columns="game_date")          # lives in the path
+            if path.exists():
+                old = pd.read_parquet(path)
+                old = old[~old["game_pk"].isin(part["game_pk"])]
+                if len(old):
+                    part = pd.concat([old, part], ignore_index=True)
+            tmp = d / "part-0.parquet.tmp"
+            part.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        return feats["game_date"].nunique()
+
+    def delete(self, games: dict) -> int:
+        """
+        Drop ``{game_pk: [dates]}`` from those date files (every file when
+        the dates are unknown); returns how many files changed.  A file
+        left empty is removed with its directory.
+        """
+        by_date = {}
+        for pk, dates in games.items():
+            for day in dates if dates is not None else [p.name.split("=", 1)[1]
+                                                          for p in self.features.glob("game_date=*")]:
+                by_date.setdefault(day, set()).add(pk)
+        changed = 0
+        for day, pks in sorted(by_date.items()):
+            d = self.features / f"game_date={day}"
+            path = d / "part-0.parquet"
+            if not path.exists():
+                continue
+            old = pd.read_parquet(path)
+            keep = old[~old["game_pk"].isin(pks)]
+            if len(keep) == len(old):
+                continue
+            if len(keep):
+                tmp = d / "part-0.parquet.tmp"
+                keep.to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+            else:
+                path.unlink()
+                d.rmdir()
+            changed += 1
+        return changed
+
+
+def load_raw(in_path: str, since: str = None) -> pd.DataFrame:
+    """Raw columns the features need, optionally only dates ≥ ``since``."""
+    dataset = open_dataset(in_path)
+    cols = [c for c in RAW_COLS if c in dataset.schema.names]
+    raw = dataset.to_table(columns=cols).to_pandas()
+    raw["game_date"] = pd.to_datetime(raw["game_date"]).dt.strftime("%Y-%m-%d")
+    if since:
+        raw = raw[raw["game_date"] >= since]
+    return raw.reset_index(drop=True)
+
+def _dates(value) -> list:
+    return value.split(",") if isinstance(value, str) else None
+
+def stale_rows(new_fp: pd.DataFrame, old_fp: pd.DataFrame, todo: np.ndarray,
+               since: str = None) -> tuple:
+    """
+    ``({game_pk: [old dates]}, removed)``: where rows of the recomputed
+    games ``todo`` sit under dates they no longer have, plus every stored
+    game missing from raw.  With ``since``, only games stored on/after it
+    can be missing (older dates were not scanned).  Old dates are ``None``
+    for games recorded before dates were kept.
+    """
+    old = old_fp.set_index("game_pk")[DATES]
+    new = new_fp.set_index("game_pk")[DATES]
+    stale = {}
+    for pk in np.intersect1d(todo, old.index.to_numpy()):
+        was = _dates(old[pk])
+        gone = None if was is None else sorted(set(was) - set(_dates(new[pk])))
+        if gone is None or gone:
+            stale[pk] = gone
+    removed = []
+    for pk, was in old.drop(new.index, errors="ignore").items():
+        was = _dates(was)
+        if since is None or (was is not None and min(was) >= since):
+            stale[pk] = was
+            removed.append(pk)
+    return stale, removed
+
+def refresh(in_path: str, store: FeatureStore, vocab: dict, since: str = None) -> dict:
+    t0 = time.perf_counter()
+    raw = load_raw(in_path, since)
+    weather = pd.read_parquet(WEATHER_PATH)
+    orient = pd.read_csv(PARK_ORIENT_CSV)
+
+    new_fp = fingerprints(raw, weather, orient, vocab)
+    old_fp = store.load_fingerprints()
+    todo = changed_games(new_fp, old_fp)
+    stale, removed = stale_rows(new_fp, old_fp, todo, since)
+    # games recorded without dates: an unchanged fingerprint (game_date is
+    # hashed with the raw rows) means they are stored under today's dates
+    legacy = old_fp[DATES].isna() & ~old_fp["game_pk"].isin(todo) & old_fp["game_pk"].isin(new_fp["game_pk"])
+    if legacy.any():
+        old_fp.loc[legacy, DATES] = old_fp.loc[legacy, "game_pk"].map(new_fp.set_index("game_pk")[DATES])
+
+    dates = 0
+    if len(todo) or stale or legacy.any():
+        # old rows first: a crash before the fingerprints are saved just
+        # redoes both steps on the next run
+        dates += store.delete(stale)
+        if len(todo):
+            df = add_wind(raw[raw["game_pk"].isin(todo)], weather, orient)
+            feats = engineer(df, vocab)                # same row order as df
+            feats.insert(0, "game_date", df["game_date"].to_numpy())
+            feats.insert(0, "game_pk", df["game_pk"].to_numpy())
+            dates += store.upsert(feats)
+
+        keep = ~old_fp["game_pk"].isin(todo) & ~old_fp["game_pk"].isin(removed)
+        parts = [old_fp[keep], new_fp[new_fp["game_pk"].isin(todo)]]
+        store.save_fingerprints(pd.concat([p for p in parts if len(p)], ignore_index=True))
+    return {"games_seen": len(new_fp), "games_recomputed": int(len(todo)),
+            "games_removed": len(removed), "dates_rewritten": dates,
+            "seconds": time.perf_counter() - t0}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("in_path", help="raw Statcast parquet file or partitioned dataset")
+    ap.add_argument("--store", default=STORE_PATH)
+    ap.add_argument("--since", help="only scan games on/after YYYY-MM-DD")
+    ap.add_argument("--vocab", default=VOCAB_PATH)
+    args = ap.parse_args()
+
+    vocab = load_or_build_vocab(args.vocab, open_dataset(args.in_path))
+    stats = refresh(args.in_path, FeatureStore(args.store), vocab, args.since)
+    print(f"✅ {stats['games_recomputed']}/{stats['games_seen']} games recomputed, "
+          f"{stats['games_removed']} removed, {stats['dates_rewritten']} date files rewritten in {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Trailing batter / pitcher form: offline columns and online state that agree
+bit for bit.
+
+Usage:
+    python -m processing.rolling raw.parquet --state data/rolling_state.pkl \
+        [--until 2024-09-29] [--check]
+
+For every row and for each of ``batter`` and ``pitcher`` the features
+describe that player's plate appearances *before* the row:
+
+    <bat|pit>_<stat>_<window>
+    stat    avg_ev (mph over batted balls), barrel_rate (per batted ball),
+            hr_rate (per PA)
+    window  <N>pa  the player's last N PAs (earlier PAs of the same game count)
+            <N>d   PAs in the N calendar days before the game date
+
+A row is a PA when ``events`` is set, and a batted ball when it also has a
+``launch_speed``; pitch rows without an event get the form as of their PA
+and add nothing.  Windows only ever sum integer counters (PAs, HRs,
+batted balls, barrels, exit velocity in tenths of a mph), and each stat is
+one division of two exact integers, so both paths below produce the same
+float64 whatever order the sums were accumulated in.
+
+Offline (``rolling_features``): rows are sorted by player, date, game_pk,
+at_bat_number, pitch_number; one cumulative sum per counter gives every
+window as a difference of two rows, the start row found by ``searchsorted``
+(day windows) or by PA ordinal (PA windows).  No groupby-rolling.
+
+Online (``RollingState``): per player a ring buffer of the last
+max(PA windows) PA counters plus per-day buckets, with a running sum per
+window; ``update`` and ``features`` are O(1) (amortized for day windows).
+PAs must reach a player in the same order the offline sort uses, which a
+live feed does (one game at a time per player).  ``feature_store`` does not
+add these columns: a per-game refresh cannot see the games before it.
+"""
+import argparse, datetime as dt, pathlib, pickle, os, threading
+from collections import deque
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np, pandas as pd
+
+STATE_PATH = "data/rolling_state.pkl"
+ROLES = {"batter": "bat", "pitcher": "pit"}
+PA_WINDOWS = (50, 200)              # trailing plate appearances
+DAY_WINDOWS = (14,)                 # trailing calendar days, game day excluded
+STATS = ("avg_ev", "barrel_rate", "hr_rate")
+COUNTS = ("pa", "hr", "bbe", "ev10", "barrel")
+WINDOWS = [f"{w}pa" for w in PA_WINDOWS] + [f"{w}d" for w in DAY_WINDOWS]
+ROLLING_COLS = [f"{p}_{s}_{w}" for p in ROLES.values() for w in WINDOWS for s in STATS]
+ORDER_COLS = ["game_pk", "at_bat_number", "pitch_number"]   # after the date, when present
+_NAMES = {role: [[f"{p}_{s}_{w}" for s in STATS] for w in WINDOWS] for role, p in ROLES.items()}
+_EMPTY = [[0] * len(COUNTS)] * len(WINDOWS)
+_EPOCH = dt.date(1970, 1, 1).toordinal()
+
+
+def is_barrel(speed, angle):
+    """
+    Statcast barrel (approximation of the published zone): at least 98 mph
+    with the angle inside 26–30°, widening by 1° down and 1.2° up per mph
+    above 98, capped at 8–50°.  Works on scalars and arrays alike.
+    """
+    over = speed - 98.0
+    return (over >= 0) & (angle >= np.maximum(8.0, 26.0 - over)) \
+                       & (angle <= np.minimum(50.0, 30.0 + 1.2 * over))
+
+
+def _is_barrel_one(speed: float, angle: float) -> bool:
+    """Scalar ``is_barrel``, the same float64 operations without numpy dispatch."""
+    over = speed - 98.0
+    return over >= 0 and max(8.0, 26.0 - over) <= angle <= min(50.0, 30.0 + 1.2 * over)
+
+
+def form_columns(feature_names) -> List[str]:
+    """The rolling columns a model was trained with, in ``ROLLING_COLS`` order."""
+    names = set(feature_names)
+    return [c for c in ROLLING_COLS if c in names]
+
+
+def _stats(pa, hr, bbe, ev10, barrel) -> tuple:
+    """(avg_ev, barrel_rate, hr_rate); arrays or ints, NaN on empty windows."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (np.where(bbe > 0, ev10 / (10 * bbe), np.nan),
+                np.where(bbe > 0, barrel / bbe, np.nan),
+                np.where(pa > 0, hr / pa, np.nan))
+
+
+def _stats_one(pa: int, hr: int, bbe: int, ev10: int, barrel: int) -> tuple:
+    """Scalar ``_stats``: int / int is one IEEE division (exact ints < 2**53), as in numpy."""
+    nan = float("nan")
+    return (ev10 / (10 * bbe) if bbe else nan,
+            barrel / bbe if bbe else nan,
+            hr / pa if pa else nan)
+
+
+def _day_numbers(dates) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _day_number(date) -> int:
+    """Days since 1970-01-01, like ``_day_numbers``."""
+    return dt.date.fromisoformat(str(date)[:10]).toordinal() - _EPOCH
+
+
+# ---------------------------------------------------------------------
+# Offline
+# ---------------------------------------------------------------------
+def pa_counts(df: pd.DataFrame) -> np.ndarray:
+    """(n, len(COUNTS)) int64 counters per row; all zero for non-PA rows."""
+    ev = df["events"]
+    pa = ev.notna().to_numpy() & ev.ne("").to_numpy()
+    speed = df["launch_speed"].to_numpy(dtype=np.float64, na_value=np.nan)
+    angle = df["launch_angle"].to_numpy(dtype=np.float64, na_value=np.nan)
+    bbe = pa & ~np.isnan(speed)
+    out = np.zeros((len(df), len(COUNTS)), dtype=np.int64)
+    out[:, 0] = pa
+    out[:, 1] = pa & ev.eq("home_run").to_numpy()
+    out[:, 2] = bbe
+    out[bbe, 3] = np.rint(speed[bbe] * 10)
+    out[bbe, 4] = is_barrel(speed[bbe], angle[bbe])
+    return out
+
+
+def _role_features(pid: np.ndarray, day: np.ndarray, ties: list,
+                   counts: np.ndarray, prefix: str) -> Dict[str, np.ndarray]:
+    order = np.lexsort(ties[::-1] + [day, pid])          # lexsort: last key primary
+    P, D, C = pid[order], day[order], counts[order]
+    n = len(P)
+    cum = np.zeros((n + 1, C.shape[1]), dtype=np.int64)
+    np.cumsum(C, axis=0, out=cum[1:])
+    here = np.arange(n)
+
+    first = np.flatnonzero(np.r_[True, P[1:] != P[:-1]])
+    group_start = np.repeat(first, np.diff(np.r_[first, n]))
+    pa_rows = np.r_[np.flatnonzero(C[:, 0]), n]           # row of the k-th PA (+ sentinel)
+    seen = cum[:n, 0]                                     # PAs before each row
+    floor = cum[group_start, 0]                           # ... before the player's first row
+
+    sums = {}
+    for w in PA_WINDOWS:
+        s = np.maximum(seen - w, floor)
+        start = np.where(s < seen, pa_rows[np.minimum(s, len(pa_rows) - 1)], here)
+        sums[f"{w}pa"] = cum[here] - cum[start]
+    key = P * (1 << 32) + D                               # sorted: player, then day
+    for w in DAY_WINDOWS:
+        lo = np.searchsorted(key, key - w, side="left")
+        hi = np.searchsorted(key, key, side="left")       # game day excluded
+        sums[f"{w}d"] = cum[hi] - cum[lo]
+
+    out = {}
+    for label, s in sums.items():
+        for stat, v in zip(STATS, _stats(*s.T)):
+            col = np.empty(n)
+            col[order] = v
+            out[f"{prefix}_{stat}_{label}"] = col
+    return out
+
+
+def rolling_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``ROLLING_COLS`` for every row of raw (pitch- or PA-level) Statcast,
+    same index as ``df``.  Needs batter, pitcher, game_date, events,
+    launch_speed and launch_angle; ``ORDER_COLS`` order PAs within a date
+    (without them rows keep their input order within a date).
+    """
+    counts = pa_counts(df)
+    day = _day_numbers(df["game_date"])
+    ties = [df[c].to_numpy(np.int64) for c in ORDER_COLS if c in df]
+    ties.append(np.arange(len(df)))
+    cols = {}
+    for role, prefix in ROLES.items():
+        pid, _ = pd.factorize(df[role])
+        known = pid >= 0
+        feats = _role_features(pid, day, ties, counts * known[:, None], prefix)
+        for c, v in feats.items():
+            v[~known] = np.nan                            # no player, no form
+        cols.update(feats)
+    return pd.DataFrame(cols, index=df.index)[ROLLING_COLS]
+
+
+def add_rolling(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([df, rolling_features(df)], axis=1)
+
+
+# ---------------------------------------------------------------------
+# Online
+# ---------------------------------------------------------------------
+class _Form:
+    """One player's windows: ring of PA counters, per-day buckets, running sums."""
+    __slots__ = ("ring", "n", "pa_sums", "days", "day_base", "day_lo", "day_sums")
+
+    def __init__(self):
+        self.ring: list = [None] * max(PA_WINDOWS)
+        self.n = 0
+        self.pa_sums = [[0] * len(COUNTS) for _ in PA_WINDOWS]
+        self.days: deque = deque()                # [day, counts] per day with PAs
+        self.day_base = 0                         # absolute index of days[0]
+        self.day_lo = [0] * len(DAY_WINDOWS)      # first bucket inside each window
+        self.day_sums = [[0] * len(COUNTS) for _ in DAY_WINDOWS]
+
+    def _evict(self, day: int) -> None:
+        for k, w in enumerate(DAY_WINDOWS):
+            s, lo = self.day_sums[k], self.day_lo[k]
+            while lo < self.day_base + len(self.days) and self.days[lo - self.day_base][0] < day - w:
+                for j, v in enumerate(self.days[lo - self.day_base][1]):
+                    s[j] -= v
+                lo += 1
+            self.day_lo[k] = lo
+        while self.days and self.day_base < min(self.day_lo):
+            self.days.popleft()
+            self.day_base += 1
+
+    def check(self, day: int) -> None:
+        """Raise before anything changes if a PA on ``day`` would be out of order."""
+        if self.days and day < self.days[-1][0]:
+            raise ValueError("PAs must reach a player in date order")
+
+    def add(self, day: int, c: tuple) -> None:
+        self.check(day)
+        size = len(self.ring)
+        for k, w in enumerate(PA_WINDOWS):
+            s = self.pa_sums[k]
+            old = self.ring[(self.n - w) % size] if self.n >= w else None
+            for j, v in enumerate(c):
+                s[j] += v - (old[j] if old else 0)
+        self.ring[self.n % size] = c
+        self.n += 1
+
+        self._evict(day)
+        if self.days and self.days[-1][0] == day:
+            bucket = self.days[-1][1]
+            for j, v in enumerate(c):
+                bucket[j] += v
+        else:
+            self.days.append([day, list(c)])
+        for s in self.day_sums:
+            for j, v in enumerate(c):
+                s[j] += v
+
+    def windows(self, day: int) -> list:
+        """Counter sums per window (``WINDOWS`` order) for a PA on ``day``."""
+        self._evict(day)
+        today = self.days[-1][1] if self.days and self.days[-1][0] == day else None
+        out = list(self.pa_sums)
+        for s in self.day_sums:
+            out.append([v - today[j] for j, v in enumerate(s)] if today else s)
+        return out
+
+
+class RollingState:
+    """
+    Online form for every batter and pitcher seen so far.
+
+    ``features(batter, pitcher, game_date)`` is the form for the next PA;
+    ``update(pa)`` adds a finished PA (a row with ``events``).  ``as_of``
+    is the last date a snapshot was built through, so a process started
+    mid-day can replay today's feed on top of it.  Thread-safe.
+    """
+
+    def __init__(self):
+        self.players: Dict[str, Dict[object, _Form]] = {role: {} for role in ROLES}
+        self.as_of: Optional[str] = None
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def counts(pa: Mapping) -> Optional[tuple]:
+        """Counters of one row (``pa_counts`` for a dict); ``None`` if not a PA."""
+        ev = pa.get("events")
+        if ev is None or ev != ev or ev == "":
+            return None
+        speed, angle = pa.get("launch_speed"), pa.get("launch_angle")
+        speed = np.nan if speed is None or speed == "" else float(speed)
+        angle = np.nan if angle is None or angle == "" else float(angle)
+        if speed != speed:
+            return (1, int(ev == "home_run"), 0, 0, 0)
+        # round() is half-to-even like np.rint
+        return (1, int(ev == "home_run"), 1, round(speed * 10), int(_is_barrel_one(speed, angle)))
+
+    def update(self, pa: Mapping) -> bool:
+        """
+        Add one row; ``False`` (and no change) if it is not a finished PA.
+        Raises ``ValueError`` if it is older than either player's last PA,
+        before either player's form is touched.
+        """
+        c = self.counts(pa)
+        if c is None:
+            return False
+        day = _day_number(pa["game_date"])
+        with self._lock:
+            roles = [(role, pa.get(role)) for role in ROLES if pa.get(role) is not None]
+            for role, pid in roles:                   # both checked, then both added
+                form = self.players[role].get(pid)
+                if form is not None:
+                    form.check(day)
+            for role, pid in roles:
+                form = self.players[role].get(pid)
+                if form is None:
+                    form = self.players[role][pid] = _Form()
+                form.add(day, c)
+            self.updates += 1
+        return True
+
+    def features(self, batter, pitcher, game_date,
+                 columns: Optional[List[str]] = None) -> Dict[str, float]:
+        """Form of both players before their next PA on ``game_date``."""
+        day = _day_number(game_date)
+        out = {}
+        with self._lock:
+            for role, pid in (("batter", batter), ("pitcher", pitcher)):
+                if pid is None:                       # no player, no form
+                    for names in _NAMES[role]:
+                        out.update(dict.fromkeys(names, float("nan")))
+                    continue
+                form = self.players[role].get(pid)
+                sums = form.windows(day) if form else _EMPTY
+                for names, s in zip(_NAMES[role], sums):
+                    out.update(zip(names, _stats_one(*s)))
+        if columns is not None:
+            out = {c: out[c] for c in columns}
+        return out
+
+    def observe(self, pa: Mapping, columns: Optional[List[str]] = None) -> Dict[str, float]:
+        """``features`` for this row, then ``update`` with it."""
+        feats = self.features(pa.get("batter"), pa.get("pitcher"), pa["game_date"], columns)
+        self.update(pa)
+        return feats
+
+    # -----------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "RollingState":
+        """Replay raw rows in the offline sort order."""
+        state = cls()
+        keys = ["game_date"] + [c for c in ORDER_COLS if c in df]
+        pas = df[df["events"].notna() & df["events"].ne("")]
+        pas = pas.assign(game_date=pd.to_datetime(pas["game_date"]).dt.strftime("%Y-%m-%d"))
+        pas = pas.sort_values(keys, kind="stable")
+        cols = ["batter", "pitcher", "game_date", "events", "launch_speed", "launch_angle"]
+        for row in pas[cols].astype(object).where(pas[cols].notna(), None).to_dict("records"):
+            state.update(row)
+        state.as_of = pas["game_date"].max() if len(pas) else None
+        return state
+
+    def save(self, path: str = STATE_PATH) -> None:
+        p = pathlib.Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+
+    @classmethod
+    def load(cls, path: str = STATE_PATH) -> "RollingState":
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != "_lock"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            "as_of": self.as_of,
+            "updates": self.updates,
+            "batters": len(self.players["batter"]),
+            "pitchers": len(self.players["pitcher"]),
+        }
+
+
+def check(df: pd.DataFrame) -> int:
+    """Replay ``df`` online and count cells that differ from ``rolling_features``."""
+    offline = rolling_features(df)
+    keys = ["game_date"] + [c for c in ORDER_COLS if c in df]
+    rows = df.assign(game_date=pd.to_datetime(df["game_date"]).dt.strftime("%Y-%m-%d"))
+    rows = rows.sort_values(keys, kind="stable")
+    cols = ["batter", "pitcher", "game_date", "events", "launch_speed", "launch_angle"]
+    state, online = RollingState(), {}
+    recs = rows[cols].astype(object).where(rows[cols].notna(), None).to_dict("records")
+    for i, rec in zip(rows.index, recs):
+        online[i] = state.observe(rec)
+    online = pd.DataFrame.from_dict(online, orient="index").loc[df.index, ROLLING_COLS]
+    a, b = offline.to_numpy(), online.to_numpy(dtype=np.float64)
+    return int((~((a == b) | (np.isnan(a) & np.isnan(b)))).sum())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("raw", help="raw Statcast parquet file or partitioned dataset")
+    ap.add_argument("--state", default=STATE_PATH, help="online state snapshot to write")
+    ap.add_argument("--until", help="last game_date (YYYY-MM-DD) in the snapshot")
+    ap.add_argument("--check", action="store_true",
+                    help="replay online and compare with the offline columns")
+    args = ap.parse_args()
+
+    from processing.feature_engineering import open_dataset
+    dataset = open_dataset(args.raw)
+    cols = [c for c in ["batter", "pitcher", "game_date", "events", "launch_speed",
+                        "launch_angle"] + ORDER_COLS if c in dataset.schema.names]
+    df = dataset.to_table(columns=cols).to_pandas()
+    if args.until:
+        df = df[pd.to_datetime(df["game_date"]) <= args.until].reset_index(drop=True)
+
+    if args.check:
+        bad = check(df)
+        if bad:
+            raise SystemExit(f"❗ {bad:,} cells differ between offline and online form")
+        print(f"✅ offline == online on {len(df):,} rows × {len(ROLLING_COLS)} columns")
+
+    state = RollingState.from_frame(df)
+    state.save(args.state)
+    print(f"✅ wrote {args.state} (as of {state.as_of}, "
+          f"{len(state.players['batter']):,} batters, {len(state.players['pitcher']):,} pitchers)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Micro-batching for single-PA requests.
+
+Concurrent ``/predict`` calls drop their encoded row into a queue; one
+worker task waits up to ``window_ms`` (or until ``max_batch`` rows are
+queued), scores the rows as one matrix in a worker thread and resolves
+each caller's future with its own probability.
+
+``close`` (from any thread, e.g. the model watcher after a hot swap)
+lets the task score what is already queued and then end, so a swapped-out
+bundle leaves no task behind; rows submitted after that are scored on
+their own.
+"""
+import asyncio
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class QueueFull(Exception):
+    """Raised by ``submit`` when ``max_queue`` rows are already waiting."""
+
+
+class MicroBatcher:
+    """
+    Parameters
+    ----------
+    score_fn : callable
+        ``(n_rows, n_features) float32 -> (n_rows,)`` probabilities,
+        e.g. ``backend.predict``.  Runs in the default executor.
+    window_ms : float
+        Max time the first queued row waits for company.
+    max_batch : int
+        Rows per scoring call; a full batch is scored immediately.
+    max_queue : int
+        Backpressure limit on rows waiting to be batched.
+    """
+
+    def __init__(self, score_fn: Callable[[np.ndarray], np.ndarray],
+                 window_ms: float = 2.0, max_batch: int = 256, max_queue: int = 4096):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # metrics
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.batch_sizes = np.zeros(max_batch.bit_length() + 1, dtype=np.int64)  # log2 buckets
+
+    # -----------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    def close(self) -> None:
+        """Stop the worker task once the queued rows are scored.  Thread-safe."""
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            try:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+            except RuntimeError:                # loop already closed: task is gone with it
+                pass
+
+    async def submit(self, x: np.ndarray) -> float:
+        """Queue one encoded row (1-D) and wait for its probability."""
+        if self._closed:                        # request that picked up a swapped-out bundle
+            loop = asyncio.get_running_loop()
+            return float((await loop.run_in_executor(None, self.score_fn, x[None]))[0])
+        self._ensure_started()
+        depth = self._queue.qsize()
+        if depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{depth} rows waiting")
+
+        fut = self._loop.create_future()
+        self._queue.put_nowait((x, fut))
+        self.max_depth = max(self.max_depth, depth + 1)
+        if depth + 1 >= self.max_batch:
+            self._full.set()
+        return await fut
+
+    async def _run(self) -> None:
+        stopping = False                        # close() queues a None sentinel
+        while not (stopping and self._queue.empty()):
+            item = await self._queue.get()
+            if item is None:
+                stopping = True
+                continue
+            items: List[Tuple[np.ndarray, asyncio.Future]] = [item]
+            if not stopping and self._queue.qsize() + 1 < self.max_batch:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+            while len(items) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                else:
+                    items.append(item)
+            await self._score(items)
+
+    async def _score(self, items: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        live = [(x, f) for x, f in items if not f.done()]       # drop cancelled callers
+        if not live:
+            return
+        X = np.stack([x for x, _ in live])
+        try:
+            probs = await self._loop.run_in_executor(None, self.score_fn, X)
+        except Exception as e:                                   # fan the error out
+            for _, f in live:
+                if not f.done():
+                    f.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(live)
+        self.batch_sizes[len(live).bit_length()] += 1
+        for (_, f), p in zip(live, probs.tolist()):
+            if not f.done():
+                f.set_result(p)
+
+    # -----------------------------------------------------------------
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "rejected": self.rejected,
+            "closed": self._closed,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            # bucket i counts batches of size [2**(i-1), 2**i)
+            "batch_size_hist": {
+                f"<{2 ** i}": int(c) for i, c in enumerate(self.batch_sizes) if c
+            },
+        }
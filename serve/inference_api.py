@@ -1,15 +1,23 @@
 
-from typing import Literal, List, Dict, Any
-from fastapi import FastAPI
-import joblib, pandas as pd, shap, json
+from typing import Literal, List, Dict, Any, Optional, get_args
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+import asyncio, io, os, time, zipfile, zlib, numpy as np, pyarrow, pyarrow.ipc
 from pydantic import BaseModel
-from utils.request_helper import build_payload
+from serve.batching import QueueFull
+from serve.metrics import (METRICS, PROMETHEUS_TYPE, Histogram, MetricsMiddleware,
+                           SamplingProfiler, stage)
+from serve.model_store import ModelStore, worker_memory
+from serve.monitor import SLICE_FIELDS
 
-MODEL_VERSION = "2024-wind-v1"
+CONFIG_PATH = os.getenv("HR_CONFIG", "serve/config.json")
 app = FastAPI(title="HR Probability API")
-MODEL_PATH = "models/hr_model.pkl"
-model = joblib.load("models/hr_model.pkl")
-explainer = shap.TreeExplainer(model)
+app.add_middleware(MetricsMiddleware)      # per-route latency; stage() splits it up
+
+# encoder, backend, SHAP engine and batcher for the live model version;
+# handlers read store.current once so a hot swap never splits a request
+store = ModelStore(CONFIG_PATH)
+store.start_watcher(store.config.get("reload_poll_secs", 2.0))
 
 class RawPA(BaseModel):
     launch_speed: float
@@ -22,17 +30,177 @@ class RawPA(BaseModel):
     inning: int
     month: int
 
+class PlayerPA(RawPA):
+    """RawPA plus who and when, for models trained with rolling form features."""
+    batter: Optional[int] = None
+    pitcher: Optional[int] = None
+    game_date: Optional[str] = None
+
+N_RAW = len(RawPA.model_fields)
+
+def with_form(m, pa: PlayerPA) -> dict:
+    """
+    Encoder input for one PA: ``RawPA.dict()``, whether or not players
+    and date are sent.  For a model with rolling inputs the batter's and
+    pitcher's current form is added (missing when form is off or the
+    player is unknown, like a first PA in training).  The ids themselves
+    reach the model only with ``"player_id_inputs": true`` and a model
+    that has ``batter`` / ``pitcher`` columns.
+    """
+    raw = pa.dict(exclude_none=True)
+    day = raw.pop("game_date", None)
+    batter, pitcher = raw.pop("batter", None), raw.pop("pitcher", None)
+    if m.form_cols:
+        with stage("form"):
+            if store.form is None:
+                raw.update(dict.fromkeys(m.form_cols))
+            else:
+                raw.update(store.form.features(batter, pitcher,
+                                               day or time.strftime("%Y-%m-%d"), m.form_cols))
+    for f, v in zip(("batter", "pitcher"), (batter, pitcher)):
+        if v is not None and f in m.id_inputs:
+            raw[f] = v
+    return raw
+
 @app.post("/predict")
-def predict(pa: RawPA):
-    features = build_payload("models/hr_model.pkl", **pa.dict())
-    proba = model.predict_proba(pd.DataFrame([features]))[:, 1][0]
+async def predict(pa: PlayerPA):
+    m = store.current
+    raw = with_form(m, pa)
+    if m.grid is not None and len(raw) == N_RAW:    # grid covers the nine raw fields only
+        with stage("grid"):
+            proba = m.grid.lookup_one(raw)       # exact, microseconds
+        if proba is not None:
+            return {"hr_probability": proba, "model_version": m.version}
+    cache = m.result_cache
+    raw = cache.normalize(raw)
+    if cache.enabled:
+        key = cache.key(raw)
+        with stage("cache"):
+            proba = cache.get(key)
+        if proba is not None:
+            return {"hr_probability": proba, "model_version": m.version}
+    with stage("encode"):
+        X = m.encoder.encode_one(raw)
+    with stage("predict"):                       # includes the coalescing wait
+        if m.batcher is None:
+            proba = (await run_in_threadpool(m.backend.predict, X))[0]
+        else:
+            try:
+                proba = await m.batcher.submit(X[0])
+            except QueueFull:
+                raise HTTPException(503, "scoring queue full", headers={"Retry-After": "1"})
+    proba = float(proba)
+    if cache.enabled:
+        cache.put(key, proba)
     return {
-    "hr_probability": float(proba),
-    "model_version": MODEL_VERSION
+    "hr_probability": proba,
+    "model_version": m.version
 }
 
 class RawPABatch(BaseModel):
-    data: List[RawPA]
+    data: List[PlayerPA]
+
+# ---------------------------------------------------------------------
+# Columnar (struct-of-arrays) input for bulk re-scoring
+# ---------------------------------------------------------------------
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NPZ          = "application/x-npz"
+INT_FIELDS   = [f for f, info in RawPA.model_fields.items() if info.annotation is int]
+STR_DOMAINS  = {                                   # Literal[...] fields
+    f: np.array(get_args(info.annotation))
+    for f, info in RawPA.model_fields.items()
+    if get_args(info.annotation)
+}
+
+def read_columns(body: bytes, content_type: str) -> Dict[str, np.ndarray]:
+    """Decode an Arrow IPC stream or an .npz struct-of-arrays body."""
+    try:
+        if content_type.startswith(ARROW_STREAM):
+            table = pyarrow.ipc.open_stream(body).read_all()
+            return {
+                name: table.column(name).to_numpy()
+                for name in table.column_names if name in RawPA.model_fields
+            }
+        if content_type.startswith(NPZ):
+            npz = np.load(io.BytesIO(body), allow_pickle=False)
+            if not isinstance(npz, np.lib.npyio.NpzFile):   # a bare .npy array
+                raise HTTPException(400, "npz body must be an archive of named arrays, one per field")
+            with npz:
+                return {name: npz[name] for name in npz.files if name in RawPA.model_fields}
+    except (ValueError, OSError, EOFError, zipfile.BadZipFile, zlib.error,
+            pyarrow.ArrowException) as e:               # empty / truncated / not that format
+        raise HTTPException(400, f"could not decode body: {e}")
+    raise HTTPException(415, f"use {ARROW_STREAM} or {NPZ}")
+
+def validate_columns(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Column-wise equivalent of RawPA validation: required fields present,
+    equal lengths, ints integral, Literal fields inside their domain.
+    Every check is one vectorized pass over the column.
+    """
+    missing = [f for f, info in RawPA.model_fields.items()
+               if info.is_required() and f not in cols]
+    if missing:
+        raise HTTPException(422, f"missing columns: {missing}")
+    n = len(next(iter(cols.values())))
+    for f, info in RawPA.model_fields.items():
+        if f not in cols:
+            cols[f] = np.full(n, info.default)
+        if len(cols[f]) != n:
+            raise HTTPException(422, f"column '{f}' has {len(cols[f])} rows, expected {n}")
+
+    for f in INT_FIELDS:
+        col = cols[f]
+        if col.dtype.kind == "f":
+            if not np.isfinite(col).all() or (col != np.round(col)).any():
+                raise HTTPException(422, f"column '{f}' must hold whole numbers")
+        elif col.dtype.kind not in "iu":
+            raise HTTPException(422, f"column '{f}' must be integer, got {col.dtype}")
+        cols[f] = col.astype(np.int64, copy=False)
+
+    for f in ("launch_speed", "launch_angle"):
+        if cols[f].dtype.kind not in "iuf":
+            raise HTTPException(422, f"column '{f}' must be numeric, got {cols[f].dtype}")
+
+    for f, domain in STR_DOMAINS.items():
+        bad = ~np.isin(cols[f].astype(str), domain)
+        if bad.any():
+            raise HTTPException(
+                422,
+                f"column '{f}': {int(bad.sum())} rows outside {domain.tolist()}, "
+                f"e.g. {np.unique(cols[f][bad])[:5].tolist()}",
+            )
+    cols["pitch_type"] = cols["pitch_type"].astype(str)
+    return cols
+
+def score_columnar(body: bytes, content_type: str):
+    """decode -> validate -> encode -> predict; returns ``(bundle, float32 probabilities)``."""
+    with stage("decode"):
+        cols = read_columns(body, content_type)
+    with stage("validate"):
+        cols = validate_columns(cols)
+    m = store.current
+    with stage("encode"):
+        X = m.encoder.encode_columns(cols)
+    METRICS.observe_batch("/predict_columnar", len(X))
+    with stage("predict"):
+        return m, m.backend.predict(X)              # contiguous float32
+
+@app.post("/predict_columnar")
+async def predict_columnar(request: Request):
+    """
+    Accepts: Arrow IPC stream or .npz body with one array per RawPA field
+    Returns: raw little-endian float32 buffer, one probability per row
+    """
+    body = await request.body()
+    # hundreds of thousands of rows: off the event loop, like the sync routes
+    m, probs = await run_in_threadpool(score_columnar, body, request.headers.get("content-type", ""))
+    return Response(
+        content=memoryview(probs).cast("B"),        # hand the buffer over as-is
+        media_type="application/octet-stream",
+        headers={"X-Rows": str(len(probs)), "X-Dtype": "float32",
+                 "X-Model-Version": m.version},
+    )
 
 @app.post("/predict_batch")
 def predict_batch(batch: RawPABatch):
@@ -40,13 +208,53 @@ def predict_batch(batch: RawPABatch):
     Accepts: {"data": [ {...}, {...}, ... ]}
     Returns: {"hr_probability": [0.041, 0.023, ... ]}
     """
-    # Expand every raw PA dict to full one-hot feature dict
-    full_rows = [
-        build_payload(MODEL_PATH, **pa.dict()) for pa in batch.data
-    ]
-    df   = pd.DataFrame(full_rows)
-    probs = model.predict_proba(df)[:, 1].tolist()
-    return {"hr_probability": probs}
+    m = store.current
+    rows = [with_form(m, pa) for pa in batch.data]
+    METRICS.observe_batch("/predict_batch", len(rows))
+    if m.grid is None or any(len(r) != N_RAW for r in rows):
+        return {"hr_probability": score_rows(m, rows)}
+    # grid for every context it covers, the model for the rest
+    with stage("grid"):
+        probs = m.grid.predict(rows, lambda rest: score_rows(m, rest))
+    return {"hr_probability": probs.tolist()}
+
+def score_rows(m, rows: List[dict]) -> List[float]:
+    """Model probabilities for raw PA dicts, through the result cache."""
+    cache = m.result_cache
+    rows = [cache.normalize(r) for r in rows]
+    if not cache.enabled:
+        # Expand every raw PA straight into one float32 feature matrix
+        with stage("encode"):
+            X = m.encoder.encode(rows)
+        with stage("predict"):
+            return m.backend.predict(X).tolist()
+
+    # score only the distinct PAs the cache does not have
+    with stage("cache"):
+        keys = [cache.key(r) for r in rows]
+        probs = cache.get_many(keys)
+        todo = {}
+        for i, (k, p) in enumerate(zip(keys, probs)):
+            if p is None:
+                todo.setdefault(k, i)
+    if todo:
+        with stage("encode"):
+            X = m.encoder.encode([rows[i] for i in todo.values()])
+        with stage("predict"):
+            fresh = m.backend.predict(X).tolist()
+        cache.put_many(list(todo), fresh)
+        fresh = dict(zip(todo, fresh))
+        probs = [fresh[k] if p is None else p for k, p in zip(keys, probs)]
+    return probs
+
+def explain_engine(m):
+    """The bundle's SHAP engine; the first call after a (re)load imports shap."""
+    with stage("explainer"):
+        try:
+            return m.explain_engine
+        except Exception as e:
+            first = str(e).splitlines()[:1]         # xgboost appends a native stack trace
+            raise HTTPException(503, f"explainer unavailable: {type(e).__name__}: {''.join(first)}")
 
 @app.post("/explain_batch")
 def explain_batch(
@@ -65,48 +273,281 @@ def explain_batch(
       ]
     }
     """
-    full_rows = [build_payload(MODEL_PATH, **pa.dict()) for pa in batch.data]
-    df   = pd.DataFrame(full_rows)
+    m = store.current
+    METRICS.observe_batch("/explain_batch", len(batch.data))
+    with stage("encode"):
+        X = m.encoder.encode([with_form(m, pa) for pa in batch.data])
 
-    probs      = model.predict_proba(df)[:, 1]
-    shap_vals  = explainer.shap_values(df)          # ndarray (n_rows, n_feat)
-
-    # Build list[dict] of top_n |impact| per row
-    contribs = []
-    for row_vals in shap_vals:
-        impact = (
-            pd.Series(row_vals, index=df.columns)
-              .abs()
-              .sort_values(ascending=False)
-              .head(top_n)
-        )
-        contribs.append(impact.to_dict())
+    # probability comes from the SHAP margin; top_n ranked for all rows at once
+    engine = explain_engine(m)
+    with stage("shap"):
+        probs, contribs = engine.explain(X, top_n)
 
     return {
         "hr_probability": probs.tolist(),
-        "baseline": float(explainer.expected_value),
+        "baseline": engine.baseline,
         "contributions": contribs
     }
 
 @app.post("/explain")
-def explain(pa: RawPA, top_n: int = 10):
+def explain(pa: PlayerPA, top_n: int = 10):
     """
     Return SHAP contributions for the specified plate appearance.
     top_n: number of largest-magnitude features to return (default 10).
     """
-    features = build_payload(MODEL_PATH, **pa.dict())
-    X = pd.DataFrame([features])
-    shap_vals = explainer.shap_values(X)[0]        # 1-row → 1-D array
+    m = store.current
+    cache = m.result_cache
+    raw = cache.normalize(with_form(m, pa))
+    key = cache.key(raw, "explain", top_n)
+    with stage("cache"):
+        hit = cache.get(key) if cache.enabled else None
+    if hit is not None:
+        return hit
 
-    # Build {feature: value} dict sorted by |impact|
-    impact = (
-        pd.Series(shap_vals, index=X.columns)
-          .abs()
-          .sort_values(ascending=False)
-          .head(top_n)
-    )
+    with stage("encode"):
+        X = m.encoder.encode_one(raw)
+    engine = explain_engine(m)
+    with stage("shap"):
+        probs, contribs = engine.explain(X, top_n)
+
+    out = {
+        "hr_probability": float(probs[0]),
+        "baseline": engine.baseline,
+        "contributions": contribs[0]               # e.g. {"launch_speed":0.015,…}
+    }
+    if cache.enabled:
+        cache.put(key, out)
+    return out
+
+# ---------------------------------------------------------------------
+# Rolling form: finished PAs in, O(1) per PA
+# ---------------------------------------------------------------------
+class PAOutcome(BaseModel):
+    batter: int
+    pitcher: int
+    game_date: str
+    events: Optional[str] = None          # set on the PA's last pitch
+    launch_speed: Optional[float] = None
+    launch_angle: Optional[float] = None
+
+class PAOutcomeBatch(BaseModel):
+    data: List[PAOutcome]
+
+@app.post("/observe")
+def observe(batch: PAOutcomeBatch):
+    """
+    Add finished PAs, in game order, to the batter/pitcher form used by
+    models with rolling inputs.  Score a PA before observing it.  Each
+    worker keeps its own form: run one worker, or score those models in
+    live_alerts.py (--form-state).
+    """
+    if store.form is None:
+        raise HTTPException(404, "rolling form disabled (set rolling.enabled in the config)")
+    n = 0
+    for i, pa in enumerate(batch.data):
+        try:
+            n += store.form.update(pa.dict())
+        except ValueError as e:                 # older than a player's last PA; form unchanged
+            raise HTTPException(422, f"data[{i}]: {e}; data[:{i}] observed ({n} PAs)")
+    return {"observed": n, **store.form.stats()}
+
+# ---------------------------------------------------------------------
+# Calibration / drift monitor: resolved PAs in, fixed memory per slice
+# ---------------------------------------------------------------------
+class ResolvedPA(BaseModel):
+    hr_probability: float                 # what was served for this PA
+    is_hr: Optional[bool] = None          # or events, e.g. "home_run"
+    events: Optional[str] = None
+    game_date: Optional[str] = None       # day bucket; today when missing
+    home_team: Optional[str] = None       # park slice
+    month: Optional[int] = None
+    model_version: Optional[str] = None   # defaults to the live version
+    launch_speed: Optional[float] = None
+    launch_angle: Optional[float] = None
+    balls: Optional[int] = None
+    strikes: Optional[int] = None
+    stand: Optional[str] = None
+    p_throws: Optional[str] = None
+    pitch_type: Optional[str] = None
+    inning: Optional[int] = None
+
+class ResolvedPABatch(BaseModel):
+    data: List[ResolvedPA]
+
+def monitor_store():
+    if store.monitor is None:
+        raise HTTPException(404, "monitor disabled (set monitor.enabled in the config)")
+    return store.monitor
+
+@app.post("/outcomes")
+def outcomes(batch: ResolvedPABatch):
+    """
+    Add resolved PAs (served probability + outcome) to the calibration and
+    drift monitor.  Each worker counts what it receives; ``/monitor``
+    merges every worker's snapshot.
+    """
+    mon = monitor_store()
+    rows = []
+    for i, pa in enumerate(batch.data):
+        if pa.is_hr is None and pa.events is None:
+            raise HTTPException(422, f"data[{i}]: need is_hr or events")
+        if not 0.0 <= pa.hr_probability <= 1.0:
+            raise HTTPException(422, f"data[{i}]: hr_probability {pa.hr_probability} outside [0, 1]")
+        row = pa.dict()
+        row["model_version"] = row["model_version"] or store.current.version
+        rows.append(row)
+    with stage("monitor"):
+        n = mon.observe(rows)
+    return {"observed": n, **mon.stats()}
+
+@app.get("/monitor")
+def monitor(window: str = "season", slice: Optional[str] = None):
+    """
+    Calibration (log-loss, Brier, ECE, reliability curve, AUC) and input
+    drift (quantiles, PSI against the training reference) over the
+    ``season`` or the ``recent`` days, overall with a per-slice table or
+    for one ``slice=home_team:NYY`` / ``month:6`` / ``pitch_type:SL``.
+    """
+    mon = monitor_store()
+    key = None
+    if slice is not None:
+        field, _, value = slice.partition(":")
+        if field not in SLICE_FIELDS or not value:
+            raise HTTPException(422, f"slice must be field:value with field in {list(SLICE_FIELDS)}")
+        key = (field, value)
+    if window not in ("season", "recent"):
+        raise HTTPException(422, "window must be season or recent")
+    with stage("monitor"):
+        return mon.report(window, key)
+
+# ---------------------------------------------------------------------
+# Liveness / readiness probes
+# ---------------------------------------------------------------------
+@app.get("/healthz")
+def healthz():
+    """Liveness: the worker is up and its event loop answers."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@app.get("/readyz")
+def readyz(response: Response, explain: bool = False):
+    """
+    Readiness: a model bundle is loaded and has scored a warm-up row, so
+    ``/predict`` answers at full speed.  ``?explain=true`` also waits for
+    the SHAP explainer (``/explain*`` pools with background warmup).
+    """
+    m = store.current
+    state = m.explainer_state
+    ready = state == "ready" if explain else True
+    if not ready:
+        response.status_code = 503
     return {
-        "hr_probability": float(model.predict_proba(X)[:, 1][0]),
-        "baseline": float(explainer.expected_value),
-        "contributions": impact.to_dict()          # e.g. {"launch_speed":0.015,…}
-    }
\ No newline at end of file
+        "ready": ready,
+        "model_version": m.version,
+        "scoring_backend": m.backend.name,
+        "explainer": state,
+        "explainer_error": m.explainer_error,
+        "model_load_seconds": m.load_seconds,
+    }
+
+@app.get("/stats")
+def stats():
+    """Runtime counters for the worker that answers (cache, batcher, memory)."""
+    m = store.current
+    return {
+        "model_version": m.version,
+        "artifact_dir": m.artifact_dir,
+        "scoring_backend": m.backend.name,
+        "model_loaded_at": m.loaded_at,
+        "model_load_seconds": m.load_seconds,
+        "model_load_timings": m.load_timings,
+        "hot_swaps": store.swaps,
+        "reload_errors": store.reload_errors,
+        "explain_cache": m.explain_stats(),
+        "result_cache": m.result_cache.stats(),
+        "grid": m.grid.stats() if m.grid else None,
+        "coalescer": m.batcher.stats() if m.batcher else None,
+        "rolling": {**store.form.stats(), "model_inputs": len(m.form_cols)} if store.form else None,
+        "monitor": store.monitor.stats() if store.monitor else None,
+        "latency": METRICS.summary(),
+        "worker": worker_memory(),
+    }
+
+# ---------------------------------------------------------------------
+# Prometheus metrics and the opt-in profiler
+# ---------------------------------------------------------------------
+@app.get("/metrics")
+def metrics():
+    """Latency/stage/batch histograms plus model and cache gauges, Prometheus text format."""
+    m = store.current
+    v = {"model_version": m.version}
+    gauges = [
+        ("hr_model_load_seconds", "Time to build the live model bundle, by part.",
+         {**v, "part": part}, secs) for part, secs in m.load_timings.items()
+    ]
+    gauges += [
+        ("hr_model_loaded_at_seconds", "When the live model bundle was loaded (unix).", v, m.loaded_at),
+        ("hr_hot_swaps_total", "Model versions swapped in since start.", {}, store.swaps),
+        ("hr_reload_errors_total", "Failed model reloads.", {}, store.reload_errors),
+    ]
+    for name, s in (("result", m.result_cache.stats()), ("explain", m.explain_stats())):
+        gauges += [
+            ("hr_cache_hits_total", "Cache hits.", {**v, "cache": name}, s["hits"]),
+            ("hr_cache_misses_total", "Cache misses.", {**v, "cache": name}, s["misses"]),
+            ("hr_cache_entries", "Cache entries.", {**v, "cache": name}, s["size"]),
+        ]
+    if m.grid is not None:
+        gauges += [
+            ("hr_grid_hits_total", "PAs answered from the lookup grid.", v, m.grid.hits),
+            ("hr_grid_fallbacks_total", "PAs the grid passed to the model.", v, m.grid.fallbacks),
+        ]
+    if store.monitor is not None:
+        gauges += monitor_gauges(store.monitor)
+    histograms = []
+    if m.batcher is not None:
+        b = m.batcher
+        gauges.append(("hr_coalescer_queue_depth", "Rows waiting to be batched.", v,
+                       b.stats()["queue_depth"]))
+        # MicroBatcher bucket i holds sizes [2**(i-1), 2**i): upper bound 2**i - 1
+        h = Histogram([2 ** i - 1 for i in range(1, len(b.batch_sizes))])
+        h.counts = [int(c) for c in b.batch_sizes[1:]] + [0]
+        h.sum, h.count = float(b.rows), b.batches
+        histograms.append(("hr_coalescer_batch_rows", "Rows per coalesced scoring call.", v, h))
+    return Response(METRICS.render_prometheus(gauges, histograms), media_type=PROMETHEUS_TYPE)
+
+def monitor_gauges(mon) -> list:
+    """Overall calibration and PSI per input, season and recent window."""
+    merged = mon.merged()
+    out = []
+    for window in ("season", "recent"):
+        r = merged.report(window, reference=mon.reference)
+        w = {"window": window}
+        overall = r["overall"]
+        out.append(("hr_monitor_rows", "Resolved PAs in the monitor.", w, overall["n"]))
+        for k in ("logloss", "brier", "ece", "mean_p", "hr_rate", "auc"):
+            if overall.get(k) is not None:
+                out.append((f"hr_monitor_{k}", f"Monitor {k} over resolved PAs.", w, overall[k]))
+        out += [("hr_monitor_psi", "Population stability index against the training reference.",
+                 {**w, "input": f}, d["psi"]) for f, d in r["drift"].items() if d.get("psi") is not None]
+    return out
+
+_profiling = asyncio.Lock()
+
+@app.get("/debug/profile")
+async def profile(seconds: float = Query(10.0, gt=0), hz: float = Query(100.0, gt=0),
+                  idle: bool = False):
+    """
+    Sample this worker's Python stacks for ``seconds`` and return them in
+    collapsed format (``flamegraph.pl`` / speedscope input).  Off unless
+    ``"profiler": {"enabled": true}`` is in the config; one run at a time.
+    """
+    cfg = store.config.get("profiler", {})
+    if not cfg.get("enabled", False):
+        raise HTTPException(404, "profiler disabled (set profiler.enabled in the config)")
+    if _profiling.locked():
+        raise HTTPException(409, "a profile is already running")
+    async with _profiling:
+        prof = SamplingProfiler(min(hz, cfg.get("max_hz", 1000.0)), include_idle=idle).start()
+        await asyncio.sleep(min(seconds, cfg.get("max_seconds", 60.0)))
+        stacks = await run_in_threadpool(prof.stop)
+    return Response(stacks, media_type="text/plain",
+                    headers={"X-Samples": str(prof.samples), "X-Worker": str(os.getpid())})
\ No newline at end of file
@@ -0,0 +1,346 @@
+"""
+Latency and throughput instrumentation for the inference API.
+
+``MetricsMiddleware`` times every request end to end, per route
+template (``/predict``, ``/explain`` ...).  Handlers wrap their hot-path
+steps in ``stage("encode")``, ``stage("predict")``, ``stage("shap")`` ...;
+whatever the handler did not time itself (routing, pydantic validation,
+response serialization) is recorded as the ``framework`` stage, so the
+stages of a request always add up to its total.
+
+All timings go into fixed-bucket histograms: one ``observe`` is a bisect
+and an increment under a lock (~1 µs), and p50/p95/p99 are interpolated
+from the buckets.  ``render_prometheus`` writes the text exposition
+format served at ``/metrics``.
+
+Counters live in the worker process.  With ``serve.run --workers N``
+each scrape is answered by one worker; every series carries a ``worker``
+label (the pid) so Prometheus keeps them apart instead of seeing resets.
+
+``SamplingProfiler`` is the opt-in profiler behind ``/debug/profile``:
+a thread samples every Python thread's stack at ``hz`` and counts
+collapsed stacks (``root;caller;leaf count``), the input format of
+``flamegraph.pl`` and speedscope.
+"""
+import contextvars, os, sys, threading, time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds: 50 µs .. 10 s
+LATENCY_BUCKETS = (5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# rows per request / per coalesced scoring call
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative-on-read histogram over fixed upper bounds (plus +Inf)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th value."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        out = {f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES}
+        out["mean"] = self.sum / self.count if self.count else 0.0
+        out["count"] = self.count
+        return out
+
+
+class _Request:
+    __slots__ = ("stages", "open")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.open: List[float] = []       # time spent in child stages, per open stage
+
+
+_current: contextvars.ContextVar[Optional[_Request]] = contextvars.ContextVar(
+    "hr_request", default=None)
+
+
+class Metrics:
+    """Per-worker registry: request latency, stage timings, batch sizes."""
+
+    def __init__(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.stages: Dict[Tuple[str, str], Histogram] = {}
+        self.batch_rows: Dict[str, Histogram] = {}
+        self.requests: Counter = Counter()            # (endpoint, status)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    # -----------------------------------------------------------------
+    def _hist(self, table: dict, key, buckets) -> Histogram:
+        h = table.get(key)
+        if h is None:
+            h = table[key] = Histogram(buckets)
+        return h
+
+    def observe_request(self, endpoint: str, status: int, seconds: float,
+                        stages: Optional[Dict[str, float]] = None) -> None:
+        with self._lock:
+            self.requests[endpoint, status] += 1
+            self._hist(self.latency, endpoint, LATENCY_BUCKETS).observe(seconds)
+            for name, s in (stages or {}).items():
+                self._hist(self.stages, (endpoint, name), LATENCY_BUCKETS).observe(s)
+
+    def observe_batch(self, endpoint: str, rows: int) -> None:
+        with self._lock:
+            self._hist(self.batch_rows, endpoint, BATCH_BUCKETS).observe(rows)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block as stage ``name`` of the current request.
+        Stages are exclusive: a stage opened inside another is subtracted
+        from the outer one (the grid's model fallback counts as
+        ``predict``, not ``grid``).  Repeated stages within one request add
+        up.  Outside a request (no middleware) the time is recorded under
+        endpoint ``-``.
+        """
+        req = _current.get()
+        if req is not None:
+            req.open.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            if req is not None:
+                req.stages[name] = req.stages.get(name, 0.0) + dt - req.open.pop()
+                if req.open:
+                    req.open[-1] += dt
+            else:
+                with self._lock:
+                    self._hist(self.stages, ("-", name), LATENCY_BUCKETS).observe(dt)
+
+    # -----------------------------------------------------------------
+    def summary(self) -> dict:
+        """p50/p95/p99 per endpoint and per stage (seconds), for ``/stats``."""
+        with self._lock:
+            stages = defaultdict(dict)
+            for (endpoint, name), h in sorted(self.stages.items()):
+                stages[endpoint][name] = h.summary()
+            return {
+                endpoint: {**h.summary(), "stages": stages.get(endpoint, {})}
+                for endpoint, h in sorted(self.latency.items())
+            }
+
+    def render_prometheus(self, gauges: Iterable[Tuple[str, str, dict, float]] = (),
+                          histograms: Iterable[Tuple[str, str, dict, Histogram]] = ()) -> str:
+        """
+        Prometheus text exposition of the registry plus caller-supplied
+        ``(name, help, labels, value)`` gauges and ``(name, help, labels,
+        histogram)`` histograms (model load times, cache counters ...).
+        """
+        worker = {"worker": str(os.getpid())}
+        with self._lock:
+            hists = [
+                ("hr_request_duration_seconds", "End-to-end request latency.",
+                 [({"endpoint": e}, h) for e, h in sorted(self.latency.items())]),
+                ("hr_stage_duration_seconds",
+                 "Time per request spent in each stage (framework = routing, validation, serialization).",
+                 [({"endpoint": e, "stage": s}, h) for (e, s), h in sorted(self.stages.items())]),
+                ("hr_batch_rows", "Rows per batch request.",
+                 [({"endpoint": e}, h) for e, h in sorted(self.batch_rows.items())]),
+            ]
+            quantiles = [({"endpoint": e, "quantile": str(q)}, h.quantile(q))
+                         for e, h in sorted(self.latency.items()) for q in QUANTILES]
+            requests = [({"endpoint": e, "status": str(s)}, c)
+                        for (e, s), c in sorted(self.requests.items())]
+            # copy under the lock; format outside it
+            hists = [(n, doc, [(l, _snapshot(h)) for l, h in series]) for n, doc, series in hists]
+
+        lines: List[str] = []
+        for name, doc, series in hists:
+            _histogram(lines, name, doc, [({**l, **worker}, h) for l, h in series])
+        _metric(lines, "hr_request_duration_quantile_seconds", "gauge",
+                "Request latency quantiles, interpolated from the histogram buckets.",
+                [({**l, **worker}, v) for l, v in quantiles])
+        _metric(lines, "hr_requests_total", "counter", "Requests by endpoint and status.",
+                [({**l, **worker}, v) for l, v in requests])
+        _metric(lines, "hr_process_start_time_seconds", "gauge", "Worker start time (unix).",
+                [(worker, self.started_at)])
+
+        by_name: Dict[str, Tuple[str, list]] = {}
+        for name, doc, labels, value in gauges:
+            by_name.setdefault(name, (doc, []))[1].append(({**labels, **worker}, value))
+        for name, (doc, series) in by_name.items():
+            _metric(lines, name, "counter" if name.endswith("_total") else "gauge", doc, series)
+        by_name = {}
+        for name, doc, labels, h in histograms:
+            by_name.setdefault(name, (doc, []))[1].append(({**labels, **worker}, h))
+        for name, (doc, series) in by_name.items():
+            _histogram(lines, name, doc, series)
+        return "\n".join(lines) + "\n"
+
+
+def _snapshot(h: Histogram) -> Histogram:
+    c = Histogram(h.buckets)
+    c.counts, c.sum, c.count = list(h.counts), h.sum, h.count
+    return c
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+def _metric(lines: List[str], name: str, kind: str, doc: str, series) -> None:
+    lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_labels(l)} {float(v)!r}" for l, v in series]
+
+
+def _histogram(lines: List[str], name: str, doc: str, series) -> None:
+    lines += [f"# HELP {name} {doc}", f"# TYPE {name} histogram"]
+    for labels, h in series:
+        cum = 0
+        for le, c in zip(h.buckets, h.counts):
+            cum += c
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': repr(float(le))})} {cum}")
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {h.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {h.sum!r}")
+        lines.append(f"{name}_count{_labels(labels)} {h.count}")
+
+
+# one registry per worker process
+METRICS = Metrics()
+stage = METRICS.stage
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task, unlike ``BaseHTTPMiddleware``)
+    that times each HTTP request and files it under its route template.
+    Unmatched paths are grouped as ``other`` to keep label cardinality fixed.
+    """
+
+    def __init__(self, app, metrics: Metrics = METRICS):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        req = _Request()
+        token = _current.set(req)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            total = time.perf_counter() - t0
+            _current.reset(token)
+            route = scope.get("route")              # set by the router on this scope
+            endpoint = getattr(route, "path", None) or "other"
+            req.stages["framework"] = max(total - sum(req.stages.values()), 0.0)
+            self.metrics.observe_request(endpoint, status, total, req.stages)
+
+
+# ---------------------------------------------------------------------
+# Sampling profiler
+# ---------------------------------------------------------------------
+# leaf frames in these modules are threads parked on a lock/selector
+IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "base_events.py",
+                "concurrent/futures/thread.py")
+
+
+class SamplingProfiler:
+    """
+    Sample all Python thread stacks ``hz`` times a second until ``stop``.
+
+    Parameters
+    ----------
+    hz : float
+        Sampling rate; 100 Hz costs well under 1 % of one core.
+    include_idle : bool
+        Keep samples of threads that are only waiting (event loop in
+        ``select``, idle threadpool workers); off by default so the graph
+        shows where CPU time goes.
+    """
+
+    def __init__(self, hz: float = 100.0, include_idle: bool = False):
+        self.interval = 1.0 / hz
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if not self.include_idle and frame.f_code.co_filename.endswith(IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}"
+                                 f":{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)).replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """``thread;outer;...;leaf count`` lines, heaviest first."""
+        return "".join(f"{s} {c}\n" for s, c in self.stacks.most_common())
@@ -0,0 +1,324 @@
+"""
+Model state for the API, swappable at runtime.
+
+Everything derived from one model version (encoder, scoring backend,
+SHAP engine, micro-batcher, result cache, lookup grid) lives in an
+immutable ``ModelBundle``.  Handlers read ``store.current`` once per
+request, so a swap never changes the model under an in-flight request;
+the old bundle is freed when its last request finishes.
+
+Trailing batter/pitcher form (``processing.rolling``) is data, not a
+model artifact: one ``RollingState`` lives in the store, fed through
+``/observe``, and survives swaps.  The same goes for the calibration /
+drift monitor (``serve.monitor``), fed through ``/outcomes``.
+
+A background thread polls ``serve/config.json``; when ``model_version``
+or any other bundle setting (backend, coalesce, result_cache, grid,
+explainer ...) changes, a new bundle is built off the request path,
+published by a single reference assignment, and the old bundle's
+micro-batcher is closed.  ``rolling`` and ``monitor`` hold live state and
+``reload_poll_secs`` is read once, so those take a restart; ``profiler``
+is read per request.
+
+Cold start: ``shap`` (and the sklearn/scipy stack it drags in) is only
+imported when the explainer is first needed, on the first ``/explain*``
+call or on a background warmup thread (``"explainer": {"warmup": ...}``).
+An artifact with compiled trees is served from its ``meta.json`` and the
+mmapped arrays alone; the XGBoost model itself is loaded on first use.
+"""
+import json, logging, os, threading, time
+from typing import Optional
+
+from processing.rolling import STATE_PATH, RollingState, form_columns
+from serve.batching import MicroBatcher
+from serve.monitor import REFERENCE_PATH, STATE_DIR, WINDOW_DAYS, MonitorStore
+from serve.result_cache import ResultCache
+from utils.artifacts import load_model, model_key, read_meta
+from utils.prob_grid import GRID_PATH, ProbGrid
+from utils.request_helper import FeatureEncoder
+from utils.scoring import CompiledTreeBackend, make_backend
+from utils.shap_engine import ExplanationEngine
+
+log = logging.getLogger("hr_api")
+EXPLAINER_WARMUP = ("lazy", "background", "eager")
+STORE_KEYS = ("rolling", "monitor", "profiler", "reload_poll_secs")   # not part of a bundle
+
+
+def bundle_config(config: dict) -> dict:
+    """The settings a ``ModelBundle`` is built from."""
+    return {k: v for k, v in config.items() if k not in STORE_KEYS}
+
+
+def read_config(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+class ModelBundle:
+    """One loaded model version and everything the handlers need from it."""
+
+    def __init__(self, config: dict):
+        t0 = time.perf_counter()
+        self.version = config["model_version"]
+        self.artifact_dir = config.get("artifact_dir")
+        self.model_path = config.get("model_path")
+        backend_name = config.get("scoring_backend", "inplace")
+        self._model = None
+        self._model_key: Optional[str] = None
+        self._lock = threading.RLock()          # explain_engine loads the model under it
+
+        if self.artifact_dir:
+            meta = read_meta(self.artifact_dir)
+            if meta["model_version"] != self.version:
+                raise ValueError(f"{self.artifact_dir} holds {meta['model_version']}, "
+                                 f"config says {self.version}")
+            self._model_key = meta.get("model_key")
+            if backend_name == "compiled" and meta["compiled"]:
+                # read-only mmap: every worker shares the same page-cache pages;
+                # the encoder comes from meta.json, the booster stays on disk
+                self.backend = CompiledTreeBackend.load(f"{self.artifact_dir}/compiled")
+                self.encoder = FeatureEncoder(meta["feature_names"], meta["feature_types"],
+                                              meta.get("category_vocab"))
+            else:
+                self.backend = self._backend(backend_name)
+                self.encoder = FeatureEncoder.from_model(self.model)
+        else:
+            self.backend = self._backend(backend_name)
+            self.encoder = FeatureEncoder.from_model(self.model)
+        self.form_cols = form_columns(self.encoder.feature_names)   # rolling inputs, if any
+        # batter / pitcher ids are form keys; as model inputs only when asked
+        # for and the model has those columns (off: the pre-form /predict results)
+        self.id_inputs = [f for f in ("batter", "pitcher") if f in self.encoder.feature_names] \
+            if config.get("player_id_inputs", False) else []
+        # first call pays for lazy setup (DMatrix config, mmap page faults)
+        self.backend.predict(self.encoder.encode([{}]))
+        t1 = time.perf_counter()
+
+        # SHAP engine: built on first use, at startup, or on a warmup thread
+        self.explain_cache_size = config.get("explain_cache_size", 4096)
+        self.explain_warmup = config.get("explainer", {}).get("warmup", "lazy")
+        if self.explain_warmup not in EXPLAINER_WARMUP:
+            raise ValueError(f"explainer.warmup must be one of {EXPLAINER_WARMUP}, "
+                             f"got {self.explain_warmup!r}")
+        self._engine = None
+        self.explainer_error: Optional[str] = None
+        self._warmer: Optional[threading.Thread] = None
+
+        coalesce = config.get("coalesce", {})
+        self.batcher = MicroBatcher(
+            self.backend.predict,
+            window_ms=coalesce.get("window_ms", 2.0),
+            max_batch=coalesce.get("max_batch", 256),
+            max_queue=coalesce.get("max_queue", 4096),
+        ) if coalesce.get("enabled", False) else None
+
+        # per bundle: a new model version never sees the old version's results
+        rc = config.get("result_cache", {})
+        self.result_cache = ResultCache(
+            max_size=rc.get("max_size", 100_000) if rc.get("enabled", False) else 0,
+            ttl_secs=rc.get("ttl_secs", 300.0),
+            quantize=rc.get("quantize"),
+        )
+
+        grid = config.get("grid", {})
+        self.grid = self._grid(grid) if grid.get("enabled", False) else None
+
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - t0
+        self.load_timings = {"model": t1 - t0, "explainer": 0.0,     # filled in when built
+                             "grid": self.load_seconds - (t1 - t0)}   # + batcher, cache
+
+        if self.explain_warmup == "eager":
+            self.explain_engine
+        elif self.explain_warmup == "background":
+            self._warmer = threading.Thread(target=self._warm, name="explainer-warmup",
+                                            daemon=True)
+            self._warmer.start()
+
+    def close(self) -> None:
+        """Release what outlives the last request: the micro-batcher's task."""
+        if self.batcher is not None:
+            self.batcher.close()
+
+    # -----------------------------------------------------------------
+    # Lazily loaded parts
+    # -----------------------------------------------------------------
+    @property
+    def model(self):
+        """The XGBoost model; for a compiled artifact it is only read when asked for."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self.artifact_dir:
+                        self._model = load_model(self.artifact_dir)
+                    else:
+                        import joblib
+                        self._model = joblib.load(self.model_path)
+        return self._model
+
+    @property
+    def model_key(self) -> str:
+        if self._model_key is None:             # artifacts exported before meta had it
+            self._model_key = model_key(self.model)
+        return self._model_key
+
+    @property
+    def explain_engine(self) -> ExplanationEngine:
+        """SHAP engine; the first access imports shap and builds the explainer."""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    t0 = time.perf_counter()
+                    import shap
+                    explainer = shap.TreeExplainer(self.model)
+                    self._engine = ExplanationEngine(
+                        explainer, self.encoder.feature_names, self.explain_cache_size,
+                    )
+                    self.load_timings["explainer"] = time.perf_counter() - t0
+        return self._engine
+
+    def _warm(self) -> None:
+        try:
+            self.explain_engine
+            log.info("explainer for %s ready (%.2fs)", self.version, self.load_timings["explainer"])
+        except Exception as e:                  # /explain* retries and reports it
+            first = str(e).splitlines()[:1]     # xgboost appends a native stack trace
+            self.explainer_error = f"{type(e).__name__}: {''.join(first)}"
+            log.exception("explainer warmup failed for %s", self.version)
+
+    @property
+    def explainer_state(self) -> str:
+        if self._engine is not None:
+            return "ready"
+        if self._warmer is not None and self._warmer.is_alive():
+            return "warming"
+        return "failed" if self.explainer_error else "cold"
+
+    def explain_stats(self) -> dict:
+        """``ExplanationEngine.stats()`` without building the engine."""
+        if self._engine is not None:
+            return {"state": "ready", **self._engine.stats()}
+        return {"state": self.explainer_state, "hits": 0, "misses": 0, "hit_rate": 0.0,
+                "size": 0, "max_size": self.explain_cache_size}
+
+
+    def _backend(self, name: str):
+        try:
+            return make_backend(name, self.model)
+        except NotImplementedError as e:        # compiled + native categorical splits
+            log.warning("%s backend unavailable for %s (%s); using inplace", name, self.version, e)
+            return make_backend("inplace", self.model)
+
+    def _grid(self, cfg: dict) -> Optional[ProbGrid]:
+        """The configured lookup grid, if it was built from this exact model."""
+        path = cfg.get("path", GRID_PATH)
+        try:
+            grid = ProbGrid(path, cfg.get("tolerance", 1e-4))
+        except FileNotFoundError:
+            log.warning("no lookup grid at %s; scoring every PA with the model", path)
+            return None
+        if grid.meta["model_sha"] != self.model_key:
+            log.warning("grid at %s was built for another model; not using it for %s",
+                        path, self.version)
+            return None
+        return grid
+
+
+class ModelStore:
+    """Holds the current ``ModelBundle`` and swaps it when the config changes."""
+
+    def __init__(self, config_path: str = "serve/config.json"):
+        self.config_path = config_path
+        self.config = read_config(config_path)
+        self._mtime = os.stat(config_path).st_mtime_ns
+        self.current = ModelBundle(self.config)
+        self.form = self._form(self.config.get("rolling", {}))
+        self.monitor = self._monitor(self.config.get("monitor", {}))
+        self.swaps = 0
+        self.reload_errors = 0
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _form(self, cfg: dict) -> Optional[RollingState]:
+        if not cfg.get("enabled", False):
+            return None
+        path = cfg.get("state_path", STATE_PATH)
+        try:
+            return RollingState.load(path)
+        except FileNotFoundError:
+            log.warning("no rolling form snapshot at %s; starting empty", path)
+            return RollingState()
+
+    def _monitor(self, cfg: dict) -> Optional[MonitorStore]:
+        if not cfg.get("enabled", False):
+            return None
+        mon = MonitorStore(cfg.get("state_dir", STATE_DIR), cfg.get("window_days", WINDOW_DAYS),
+                           cfg.get("snapshot_secs", 60), cfg.get("reference_path", REFERENCE_PATH))
+        if mon.reference is None:
+            log.warning("no monitor reference at %s; drift is reported without PSI",
+                        cfg.get("reference_path", REFERENCE_PATH))
+        return mon
+
+    def refresh(self) -> bool:
+        """Rebuild the bundle if the model version or any bundle setting changed."""
+        mtime = os.stat(self.config_path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        config = read_config(self.config_path)
+        for key in ("rolling", "monitor"):
+            if config.get(key) != self.config.get(key):
+                log.warning("config: %r changes take effect on restart", key)
+        if bundle_config(config) == bundle_config(self.config):
+            self.config, self._mtime = config, mtime
+            return False
+
+        bundle = ModelBundle(config)          # built before anyone can see it
+        old = self.current
+        self.config, self.current, self._mtime = config, bundle, mtime
+        old.close()                           # in-flight rows are still scored
+        self.swaps += 1
+        log.info("hot-swapped model -> %s (%.2fs)%s", bundle.version, bundle.load_seconds,
+                 "" if bundle.version != old.version else ", same version, serving config changed")
+        return True
+
+    def start_watcher(self, poll_secs: float = 2.0) -> None:
+        if self._watcher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(poll_secs):      # parked in threading, not C sleep
+                try:
+                    self.refresh()
+                except Exception:               # keep serving the old version
+                    self.reload_errors += 1
+                    log.exception("model reload failed; still serving %s", self.current.version)
+
+        self._watcher = threading.Thread(target=loop, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+
+def worker_memory() -> dict:
+    """
+    Resident memory of this worker in MB.  ``rss_file_mb`` is the part
+    backed by mapped files (shared between workers for mmapped artifacts),
+    ``rss_anon_mb`` is private to the process.
+    """
+    fields = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb",
+              "RssFile": "rss_file_mb", "RssShmem": "rss_shmem_mb"}
+    out = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    out[fields[key]] = int(rest.split()[0]) / 1024
+    except OSError:                             # non-Linux: peak RSS only, if any
+        try:
+            import resource
+            out["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except ImportError:
+            pass
+    return out
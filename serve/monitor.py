@@ -0,0 +1,578 @@
+"""
+Streaming calibration and input-drift monitor for live predictions.
+
+Usage
+-----
+python -m serve.monitor data/features_2024.parquet models/hr_model.pkl
+                        [--reference data/monitor/reference.pkl] [--check]
+
+Every resolved PA arrives as ``(hr_probability, outcome, raw fields)``
+(``POST /outcomes`` in the API, or ``live_alerts.py --monitor``).  It is
+added to one ``Sketch`` for all rows and one per slice value
+(``home_team``, ``month``, ``pitch_type``).  This happens both in the
+season totals and in the bucket for the PA's ``game_date``.  Only the
+last ``window_days`` day buckets are kept.
+
+A ``Sketch`` has fixed-size arrays only, and two sketches merge by
+adding them:
+
+* calibration  n, Σp and Σy per probability bin (``CAL_EDGES``: fine
+               below 5%, 1% wide above, the ``ECE_BINS`` edges included)
+               -> mean p, HR rate, ECE, a reliability curve, a binned
+               AUC, and the prediction histogram for drift
+* losses       Σ log-loss and Σ Brier, per row, as ``eval_engine`` computes them
+* inputs       per numeric field, a histogram on fixed edges (1 mph, 1°,
+               one bin per count / inning) plus a missing counter;
+               quantiles interpolate inside a bin.  The error is at most
+               one bin width, and merging is exact.
+               Categoricals keep per-level counts, capped at
+               ``MAX_LEVELS`` (further levels pool into ``other``).
+
+Memory depends on the number of slice values (capped by ``MAX_LEVELS``)
+and on ``window_days``.  It does not grow with the number of rows, so a
+season costs the same as a day.  Drift is the population stability
+index (PSI) of each input against a reference built from the training
+features by the CLI.
+
+Each API worker keeps its own ``Monitor`` and writes it to
+``<state_dir>/worker-<pid>.pkl`` every ``snapshot_secs``.  Reads merge
+the worker's live state with its siblings' snapshots.  At startup a
+worker adopts the snapshots of workers that are gone: it merges them
+into its own state, then removes the files.  Restarts therefore neither
+lose nor double count outcomes.
+
+``--check`` replays the features file through ``observe`` in chunks and
+compares with ``eval_engine``'s exact metrics.  Log-loss, Brier and ECE
+must match; AUC agrees to the bin resolution.
+"""
+import argparse, datetime as dt, fcntl, glob, os, pathlib, pickle, threading, time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.eval_engine import ECE_BINS, row_losses
+
+STATE_DIR = "data/monitor"
+REFERENCE_PATH = "data/monitor/reference.pkl"
+SLICE_FIELDS = ("home_team", "month", "pitch_type")
+MAX_LEVELS = 64                     # per slice field / categorical input
+WINDOW_DAYS = 7
+OTHER = "other"
+
+# probability bins: log-spaced where HR probabilities live, 1% above 5%;
+# every ECE bin edge is a bin edge, so ECE is exact
+CAL_EDGES = np.unique(np.r_[0.0, np.geomspace(1e-4, 0.05, 80)[:-1],
+                            np.linspace(0.05, 1.0, 96)])
+N_CAL = len(CAL_EDGES) - 1
+_ECE_OF_BIN = np.minimum((CAL_EDGES[:-1] * ECE_BINS + 1e-9).astype(np.int64), ECE_BINS - 1)
+
+NUMERIC = {                         # fixed histogram edges per raw input
+    "launch_speed": np.arange(0.0, 126.0, 1.0),
+    "launch_angle": np.arange(-90.0, 91.0, 1.0),
+    "balls": np.arange(0.0, 5.0),
+    "strikes": np.arange(0.0, 4.0),
+    "inning": np.arange(1.0, 21.0),
+}
+CATEGORICAL = ("stand", "p_throws", "pitch_type")
+PSI_FLOOR = 1e-4
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def _level(counts: dict, value) -> str:
+    """``value`` as a level key, pooled into ``other`` once ``counts`` is full."""
+    v = str(value)
+    return v if v in counts or len(counts) < MAX_LEVELS else OTHER
+
+
+# ---------------------------------------------------------------------
+# One slice
+# ---------------------------------------------------------------------
+class Sketch:
+    """Fixed-memory, mergeable summary of predictions, outcomes and inputs."""
+
+    __slots__ = ("cal", "loss", "hist", "levels")
+
+    def __init__(self):
+        self.cal = np.zeros((3, N_CAL))             # n, Σp, Σy per probability bin
+        self.loss = np.zeros(2)                     # Σ log-loss, Σ Brier
+        # bins: below first edge, one per edge interval, at/above last edge, missing
+        self.hist = {f: np.zeros(len(e) + 2, np.int64) for f, e in NUMERIC.items()}
+        self.levels: Dict[str, Dict[str, int]] = {f: {} for f in CATEGORICAL}
+
+    @property
+    def n(self) -> int:
+        return int(self.cal[0].sum())
+
+    def add(self, p: np.ndarray, y: np.ndarray, num: Mapping[str, np.ndarray],
+            cat: Mapping[str, Sequence]) -> None:
+        b = np.clip(np.searchsorted(CAL_EDGES, p, side="right") - 1, 0, N_CAL - 1)
+        self.cal[0] += np.bincount(b, minlength=N_CAL)
+        self.cal[1] += np.bincount(b, p, minlength=N_CAL)
+        self.cal[2] += np.bincount(b, y, minlength=N_CAL)
+        brier, logloss = row_losses(p, y)
+        self.loss += (logloss.sum(), brier.sum())
+        for f, x in num.items():
+            h = self.hist[f]
+            miss = np.isnan(x)
+            h[-1] += int(miss.sum())
+            h[:-1] += np.bincount(np.searchsorted(NUMERIC[f], x[~miss], side="right"),
+                                  minlength=len(h) - 1)
+        for f, values in cat.items():
+            counts = self.levels[f]
+            for v in values:
+                if v is not None:
+                    k = _level(counts, v)
+                    counts[k] = counts.get(k, 0) + 1
+
+    def merge(self, other: "Sketch") -> "Sketch":
+        self.cal += other.cal
+        self.loss += other.loss
+        for f, h in other.hist.items():
+            self.hist[f] += h
+        for f, counts in other.levels.items():
+            mine = self.levels[f]
+            for v, c in counts.items():
+                k = _level(mine, v)
+                mine[k] = mine.get(k, 0) + c
+        return self
+
+    # -----------------------------------------------------------------
+    # Read-out
+    # -----------------------------------------------------------------
+    def metrics(self) -> dict:
+        n, sp, sy = self.cal
+        total = n.sum()
+        if not total:
+            return {"n": 0}
+        pos, neg = sy, n - sy
+        below = np.cumsum(neg) - neg
+        P, N = pos.sum(), neg.sum()
+        gap = np.abs(np.bincount(_ECE_OF_BIN, sy, ECE_BINS) - np.bincount(_ECE_OF_BIN, sp, ECE_BINS))
+        return {
+            "n": int(total),
+            "hr_rate": float(sy.sum() / total),
+            "mean_p": float(sp.sum() / total),
+            "logloss": float(self.loss[0] / total),
+            "brier": float(self.loss[1] / total),
+            "ece": float(gap.sum() / total),
+            # ties inside a bin count half, like tied scores in the exact AUC
+            "auc": float((pos * (below + 0.5 * neg)).sum() / (P * N)) if P and N else None,
+        }
+
+    def curve(self) -> List[dict]:
+        """Reliability curve on the ``ECE_BINS`` equal-width bins."""
+        n, sp, sy = (np.bincount(_ECE_OF_BIN, row, ECE_BINS) for row in self.cal)
+        return [{"bin": f"{i / ECE_BINS:.2f}-{(i + 1) / ECE_BINS:.2f}", "n": int(n[i]),
+                 "mean_p": float(sp[i] / n[i]), "hr_rate": float(sy[i] / n[i])}
+                for i in range(ECE_BINS) if n[i]]
+
+    def quantile(self, field: str, q: float) -> Optional[float]:
+        """Interpolated quantile of a numeric input (error at most one bin width)."""
+        edges, h = NUMERIC[field], self.hist[field][:-1]
+        total = h.sum()
+        if not total:
+            return None
+        cum = np.cumsum(h)
+        i = int(np.searchsorted(cum, q * total))
+        if i == 0:
+            return float(edges[0])
+        if i >= len(edges):
+            return float(edges[-1])
+        lo, hi = edges[i - 1], edges[i]
+        prev = cum[i - 1]
+        return float(lo + (hi - lo) * (q * total - prev) / h[i])
+
+    def distribution(self, field: str) -> Tuple[list, np.ndarray]:
+        """``(labels, counts)`` of one input; ``hr_probability`` is the prediction itself."""
+        if field == "hr_probability":
+            return list(range(N_CAL)), self.cal[0]
+        if field in NUMERIC:
+            return list(range(len(self.hist[field]))), self.hist[field].astype(np.float64)
+        counts = self.levels[field]
+        return list(counts), np.array(list(counts.values()), dtype=np.float64)
+
+
+def psi(live: Sketch, ref: Sketch, field: str) -> Optional[float]:
+    """Population stability index of ``field``, live against reference."""
+    a_lab, a = live.distribution(field)
+    e_lab, e = ref.distribution(field)
+    if field in CATEGORICAL:                    # align levels by name
+        labels = sorted(set(a_lab) | set(e_lab))
+        a = np.array([dict(zip(a_lab, a)).get(k, 0.0) for k in labels])
+        e = np.array([dict(zip(e_lab, e)).get(k, 0.0) for k in labels])
+    if not a.sum() or not e.sum():
+        return None
+    a = np.maximum(a / a.sum(), PSI_FLOOR)
+    e = np.maximum(e / e.sum(), PSI_FLOOR)
+    return float(((a - e) * np.log(a / e)).sum())
+
+
+# ---------------------------------------------------------------------
+# Sliced, windowed monitor
+# ---------------------------------------------------------------------
+Slices = Dict[Tuple[str, str], Sketch]          # ("all", "all"), ("home_team", "NYY"), ...
+ALL = ("all", "all")
+
+
+def _merge_slices(into: Slices, other: Slices) -> Slices:
+    for key, s in other.items():
+        into.setdefault(key, Sketch()).merge(s)
+    return into
+
+
+class Monitor:
+    """Season and last-``window_days`` sketches, overall and per slice value."""
+
+    def __init__(self, window_days: int = WINDOW_DAYS):
+        self.window_days = window_days
+        self.season: Slices = {}
+        self.days: "OrderedDict[str, Slices]" = OrderedDict()
+        self.model_versions: Dict[str, int] = {}
+        self.updated = 0.0
+        self._lock = threading.Lock()
+
+    def _slot(self, sketches: Slices, key: Tuple[str, str]) -> Sketch:
+        if key not in sketches:
+            values = [v for f, v in sketches if f == key[0]]
+            if len(values) >= MAX_LEVELS:
+                key = (key[0], OTHER)
+        return sketches.setdefault(key, Sketch())
+
+    def observe(self, rows: Sequence[Mapping]) -> int:
+        """
+        Add resolved PAs.  Each row needs ``hr_probability`` and ``is_hr``
+        (or ``events``); ``game_date`` defaults to today, ``month`` to the
+        date's month; slice fields and raw inputs may be missing.
+        """
+        if not rows:
+            return 0
+        today = dt.date.today().isoformat()
+        p = np.array([r["hr_probability"] for r in rows], dtype=np.float64)
+        y = np.array([r["is_hr"] if r.get("is_hr") is not None else r.get("events") == "home_run"
+                      for r in rows], dtype=np.float64)
+        days = [str(r.get("game_date") or today)[:10] for r in rows]
+        num = {f: np.array([r.get(f) for r in rows], dtype=np.float64) for f in NUMERIC}
+        cat = {f: [r.get(f) for r in rows] for f in CATEGORICAL}
+        keys = {
+            "home_team": [r.get("home_team") for r in rows],
+            "month": [r.get("month") or int(d[5:7]) for r, d in zip(rows, days)],
+            "pitch_type": cat["pitch_type"],
+        }
+
+        groups: Dict[Tuple[str, Tuple[str, str]], List[int]] = {}
+        for i, day in enumerate(days):
+            groups.setdefault((day, ALL), []).append(i)
+            for f in SLICE_FIELDS:
+                v = keys[f][i]
+                if v is not None:
+                    groups.setdefault((day, (f, str(v))), []).append(i)
+
+        with self._lock:
+            for (day, key), idx in groups.items():
+                ix = np.asarray(idx)
+                sub_num = {f: x[ix] for f, x in num.items()}
+                sub_cat = {f: [v[i] for i in idx] for f, v in cat.items()}
+                self._slot(self.season, key).add(p[ix], y[ix], sub_num, sub_cat)
+                if self.days and day < next(iter(self.days)) and len(self.days) >= self.window_days:
+                    continue                    # older than the window: season only
+                if day not in self.days:
+                    self.days[day] = {}
+                    self.days = OrderedDict(sorted(self.days.items()))
+                    while len(self.days) > self.window_days:
+                        self.days.popitem(last=False)
+                if day in self.days:
+                    self._slot(self.days[day], key).add(p[ix], y[ix], sub_num, sub_cat)
+            for r in rows:
+                v = r.get("model_version")
+                if v is not None:
+                    k = _level(self.model_versions, v)
+                    self.model_versions[k] = self.model_versions.get(k, 0) + 1
+            self.updated = time.time()
+        return len(rows)
+
+    def merge(self, other: "Monitor") -> "Monitor":
+        with self._lock:
+            _merge_slices(self.season, other.season)
+            for day, sk in other.days.items():
+                _merge_slices(self.days.setdefault(day, {}), sk)
+            self.days = OrderedDict(sorted(self.days.items())[-self.window_days:])
+            for v, c in other.model_versions.items():
+                k = _level(self.model_versions, v)
+                self.model_versions[k] = self.model_versions.get(k, 0) + c
+            self.updated = max(self.updated, other.updated)
+        return self
+
+    def window(self, name: str = "season") -> Slices:
+        """``season`` or ``recent`` (the merged day buckets), as a new dict."""
+        if name == "season":
+            return _merge_slices({}, self.season)
+        if name == "recent":
+            out: Slices = {}
+            for sk in self.days.values():
+                _merge_slices(out, sk)
+            return out
+        raise ValueError(f"unknown window '{name}' (season or recent)")
+
+    # -----------------------------------------------------------------
+    # Report
+    # -----------------------------------------------------------------
+    def report(self, window: str = "season", slice_key: Optional[Tuple[str, str]] = None,
+               reference: Optional[Slices] = None) -> dict:
+        with self._lock:
+            sketches = self.window(window)
+            days = list(self.days)
+            versions = dict(self.model_versions)
+        key = slice_key or ALL
+        s = sketches.get(key, Sketch())
+        out = {
+            "window": window,
+            "days": days if window == "recent" else None,
+            "slice": None if slice_key is None else f"{key[0]}:{key[1]}",
+            "model_versions": versions,
+            "overall": {**s.metrics(), "calibration": s.curve()},
+        }
+        if slice_key is None:
+            out["slices"] = {
+                f: {v: sk.metrics() for (g, v), sk in sorted(sketches.items()) if g == f}
+                for f in SLICE_FIELDS
+            }
+        ref = None
+        if reference is not None:
+            ref = reference.get(key, reference.get(ALL))
+        out["drift"] = drift(s, ref)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = sum(len(sk) for sk in self.days.values()) + len(self.season)
+            return {
+                "rows": self.season[ALL].n if ALL in self.season else 0,
+                "days": list(self.days),
+                "sketches": n,
+                "bytes": n * sketch_bytes(),
+                "updated": self.updated,
+            }
+
+    # -----------------------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------------------
+    def save(self, path: str) -> None:
+        p = pathlib.Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+
+    @classmethod
+    def load(cls, path: str) -> "Monitor":
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
+
+    def __getstate__(self):
+        with self._lock:
+            return {k: v for k, v in self.__dict__.items() if k != "_lock"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def sketch_bytes() -> int:
+    """Array memory of one ``Sketch`` (level dicts excluded)."""
+    s = Sketch()
+    return s.cal.nbytes + s.loss.nbytes + sum(h.nbytes for h in s.hist.values())
+
+
+def drift(live: Sketch, ref: Optional[Sketch]) -> dict:
+    """Per input: live quantiles / missing rate and, with a reference, PSI."""
+    out = {"hr_probability": {"psi": psi(live, ref, "hr_probability") if ref else None}}
+    for f in NUMERIC:
+        h = live.hist[f]
+        d = {f"p{round(q * 100):02d}": live.quantile(f, q) for q in QUANTILES}
+        d["missing_rate"] = float(h[-1] / h.sum()) if h.sum() else None
+        if ref is not None:
+            d["ref_p50"] = ref.quantile(f, 0.5)
+            d["psi"] = psi(live, ref, f)
+        out[f] = d
+    for f in CATEGORICAL:
+        counts = live.levels[f]
+        total = sum(counts.values())
+        top = sorted(counts.items(), key=lambda kv: -kv[1])[:5]
+        out[f] = {"top": {k: c / total for k, c in top} if total else {},
+                  "psi": psi(live, ref, f) if ref is not None else None}
+    return out
+
+
+# ---------------------------------------------------------------------
+# Per-worker snapshots for the API
+# ---------------------------------------------------------------------
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MonitorStore:
+    """
+    This worker's ``Monitor`` plus its siblings' snapshots in ``state_dir``.
+    ``observe`` writes through to ``worker-<pid>.pkl`` at most every
+    ``snapshot_secs``; ``merged`` is what ``/monitor`` reports.
+    """
+
+    def __init__(self, state_dir: str = STATE_DIR, window_days: int = WINDOW_DAYS,
+                 snapshot_secs: float = 60.0, reference_path: Optional[str] = REFERENCE_PATH):
+        self.state_dir = pathlib.Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.state_dir / f"worker-{os.getpid()}.pkl"
+        self.snapshot_secs = snapshot_secs
+        self.live = Monitor(window_days)
+        self.reference = self._reference(reference_path)
+        self.adopted = self._adopt()
+        self._saved = time.monotonic()
+        self._dirty = False
+        self._save_lock = threading.Lock()
+
+    @staticmethod
+    def _reference(path: Optional[str]) -> Optional[Slices]:
+        if not path or not os.path.exists(path):
+            return None
+        return Monitor.load(path).season
+
+    def _adopt(self) -> int:
+        """Fold the snapshots of dead workers into this one, then drop their files."""
+        n = 0
+        with open(self.state_dir / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)      # two workers never adopt the same file
+            for f in glob.glob(str(self.state_dir / "worker-*.pkl")):
+                pid = int(pathlib.Path(f).stem.split("-", 1)[1])
+                if pid == os.getpid() or _alive(pid):
+                    continue
+                self.live.merge(Monitor.load(f))
+                n += 1
+                self.live.save(str(self.path))     # adopted rows are on disk before the file goes
+                os.unlink(f)
+        return n
+
+    def observe(self, rows: Sequence[Mapping]) -> int:
+        n = self.live.observe(rows)
+        self._dirty = True
+        if time.monotonic() - self._saved >= self.snapshot_secs:
+            self.save()
+        return n
+
+    def save(self) -> None:
+        with self._save_lock:
+            if self._dirty:
+                self._dirty = False
+                self.live.save(str(self.path))
+            self._saved = time.monotonic()
+
+    def merged(self) -> Monitor:
+        """Live state of this worker + the latest snapshot of every other worker."""
+        out = Monitor(self.live.window_days).merge(self.live)
+        for f in glob.glob(str(self.state_dir / "worker-*.pkl")):
+            if pathlib.Path(f) != self.path:
+                try:
+                    out.merge(Monitor.load(f))
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    continue                        # a sibling mid-replace
+        return out
+
+    def report(self, window: str = "season", slice_key: Optional[Tuple[str, str]] = None) -> dict:
+        return self.merged().report(window, slice_key, self.reference)
+
+    def stats(self) -> dict:
+        return {**self.live.stats(), "snapshot": str(self.path), "adopted": self.adopted,
+                "reference": self.reference is not None}
+
+
+# ---------------------------------------------------------------------
+# Reference + replay check from a features file
+# ---------------------------------------------------------------------
+def frame_rows(df, p: np.ndarray, y: np.ndarray) -> List[dict]:
+    """Monitor rows from a feature frame (one-hot or categorical layout)."""
+    from models.eval_engine import field_codes
+    cols = {"hr_probability": p, "is_hr": y.astype(bool)}
+    for f in NUMERIC:
+        if f in df:
+            cols[f] = df[f].to_numpy(np.float64, na_value=np.nan)
+    for f in set(CATEGORICAL) | set(SLICE_FIELDS):
+        try:
+            codes, labels = field_codes(df, f)
+        except KeyError:
+            continue
+        lab = np.array(labels + [None], dtype=object)
+        cols[f] = lab[np.where(codes >= 0, codes, len(labels))]
+    if "inning" not in df:                      # one-hot layout: inning_<n> group
+        try:
+            codes, labels = field_codes(df, "inning")
+            cols["inning"] = np.where(codes >= 0, np.array(labels, dtype=np.float64)[codes], np.nan)
+        except KeyError:
+            pass
+    if "game_date" in df:
+        cols["game_date"] = df["game_date"].astype(str).to_numpy()
+    keys = list(cols)
+    return [dict(zip(keys, vals)) for vals in zip(*cols.values())]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("features_parquet")
+    ap.add_argument("model_path")
+    ap.add_argument("--reference", default=REFERENCE_PATH, help="where to write the drift reference")
+    ap.add_argument("--all-pitches", action="store_true",
+                    help="reference over every pitch, not only batted balls (what live_alerts scores)")
+    ap.add_argument("--check", action="store_true",
+                    help="replay through observe() and compare with eval_engine")
+    ap.add_argument("--chunk-rows", type=int, default=10_000)
+    args = ap.parse_args()
+
+    import joblib, pandas as pd
+    from models.eval_engine import grouped_metrics
+    from utils.request_helper import FeatureEncoder
+    from utils.scoring import make_backend
+    # the importable classes, not __main__'s, so the API can unpickle the reference
+    from serve.monitor import Monitor, frame_rows
+
+    df = pd.read_parquet(args.features_parquet)
+    if not args.all_pitches and "launch_speed" in df:
+        df = df[df["launch_speed"].notna()].reset_index(drop=True)
+    y = df.pop("is_hr").to_numpy()
+    model = joblib.load(args.model_path)
+    p = make_backend("inplace", model).predict(FeatureEncoder.from_model(model).encode_frame(df))
+    p = p.astype(np.float64)
+
+    t0 = time.perf_counter()
+    rows = frame_rows(df, p, y)
+    mon = Monitor(window_days=1)
+    for i in range(0, len(rows), args.chunk_rows):
+        mon.observe([{**r, "game_date": r.get("game_date", "2024-01-01")}
+                     for r in rows[i:i + args.chunk_rows]])
+    secs = time.perf_counter() - t0
+    mon.days.clear()                            # a reference is one season-long sketch set
+    mon.save(args.reference)
+    print(f"✅ wrote {args.reference} ({len(rows):,} rows, {len(mon.season)} slices, "
+          f"{secs:.1f}s, {len(rows) / secs:,.0f} rows/s)")
+
+    if args.check:
+        got = mon.season[ALL].metrics()
+        exact = grouped_metrics(np.zeros(len(p), np.int64), p, y.astype(np.float64), 1)
+        worst = 0.0
+        for m in ("hr_rate", "mean_p", "logloss", "brier", "ece", "auc"):
+            diff = abs(got[m] - float(exact[m][0]))
+            tol = 5e-3 if m == "auc" else 1e-9
+            worst = max(worst, diff if m != "auc" else 0.0)
+            print(f"  {m:<8} stream {got[m]:.8f}  exact {float(exact[m][0]):.8f}  "
+                  f"{'ok' if diff <= tol else '❗'}")
+        if worst > 1e-9:
+            raise SystemExit("❗ streaming metrics differ from eval_engine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Result cache for the inference API, keyed on the raw PA inputs.
+
+``RawPA`` has nine fields and seven of them take a handful of values, so
+re-polls and dashboards send the same PA over and over.  The cache maps
+the validated PA, as sorted ``(field, value)`` pairs, to its probability,
+or to the ``/explain`` payload, with LRU eviction and a TTL.  Off unless
+``"result_cache": {"enabled": true}``.
+
+Optional quantization (``{"launch_speed": 0.1, "launch_angle": 1.0}``)
+snaps those fields to a grid *before scoring*, so every PA in a grid cell
+gets the same, deterministic answer and shares one entry.
+
+One cache lives in each ``ModelBundle``, so a new ``model_version``
+starts with an empty cache and no stale result can outlive its model.
+"""
+import threading, time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Mapping, Optional, Sequence
+
+
+class ResultCache:
+    """
+    Parameters
+    ----------
+    max_size : int
+        Max entries (LRU beyond that); 0 disables the cache.
+    ttl_secs : float
+        Entries older than this are misses; 0 = no expiry.
+    quantize : mapping of str to float, optional
+        Grid step per numeric field.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl_secs: float = 300.0,
+                 quantize: Optional[Mapping[str, float]] = None):
+        self.max_size = max_size
+        self.ttl = ttl_secs
+        self.quantize = dict(quantize or {})
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()       # sync routes run in a threadpool
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    # -----------------------------------------------------------------
+    def normalize(self, pa: dict) -> dict:
+        """``pa`` with quantized fields snapped to their grid (a copy)."""
+        if not self.quantize:
+            return pa
+        pa = dict(pa)
+        for f, step in self.quantize.items():
+            v = pa.get(f)
+            if v is not None:
+                pa[f] = round(round(v / step) * step, 10)
+        return pa
+
+    def key(self, pa: dict, *extra) -> tuple:
+        """Key of an already normalized PA (plus e.g. ``top_n``): names and
+        values, so neither field order nor a missing field can alias two PAs."""
+        return tuple(sorted(pa.items())) + extra
+
+    # -----------------------------------------------------------------
+    def get_many(self, keys: Sequence[Hashable]) -> List[Optional[Any]]:
+        """Cached value per key, ``None`` for misses (counted)."""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is not None and self.ttl and now - entry[0] > self.ttl:
+                    del self._cache[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self._cache.move_to_end(key)
+                self.hits += 1
+                out.append(entry[1])
+        return out
+
+    def put_many(self, keys: Sequence[Hashable], values: Sequence[Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._cache[key] = (now, value)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self.get_many([key])[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.put_many([key], [value])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "ttl_secs": self.ttl,
+            "quantize": self.quantize,
+        }
@@ -0,0 +1,35 @@
+"""
+Run the HR API with N worker processes.
+
+Usage:
+    python -m serve.run --workers 4 --port 10000
+
+Export the model once with ``python -m models.export_artifact`` and set
+``"scoring_backend": "compiled"`` to have every worker memory-map the same
+read-only tree arrays instead of each unpickling its own copy.  A later
+export with a new version is picked up by all workers on their next
+config poll; no restart and no dropped requests.
+"""
+import argparse, os, uvicorn
+from serve.model_store import read_config
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", 10000)))
+    ap.add_argument("--workers", type=int,
+                    default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    ap.add_argument("--config", default=os.getenv("HR_CONFIG", "serve/config.json"))
+    args = ap.parse_args()
+
+    cfg = read_config(args.config)
+    if not cfg.get("artifact_dir"):
+        print("[warn] no artifact_dir in config: each worker will unpickle "
+              f"{cfg['model_path']} privately (run models.export_artifact)")
+    os.environ["HR_CONFIG"] = args.config          # inherited by the workers
+    uvicorn.run("serve.inference_api:app", host=args.host, port=args.port,
+                workers=args.workers,
+                timeout_worker_healthcheck=60)   # a pickled model can outlast the 5 s default
+
+if __name__ == "__main__":
+    main()
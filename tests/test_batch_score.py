@@ -0,0 +1,72 @@
+"""
+``--in-process`` batch scoring agrees with ``predict_proba`` on CSV chunks
+whatever dtype pandas inferred for them, and rejects null rows the way
+``/predict_batch`` does.
+
+    python -m pytest tests/test_batch_score.py -q
+"""
+import numpy as np, pandas as pd, pytest
+
+from utils.batch_score import FIELDS, MODEL, LocalScorer, read_chunks, score_file
+from utils.request_helper import FeatureEncoder
+from utils.scoring import make_backend
+
+N_ROWS = 100                                     # pa_samples.csv
+TOL = 1e-6                                       # inplace vs predict_proba
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    return LocalScorer(MODEL, "inplace")
+
+
+@pytest.fixture(scope="module")
+def raw() -> pd.DataFrame:
+    return pd.read_csv("pa_samples.csv")
+
+
+@pytest.fixture(scope="module")
+def expected(raw) -> np.ndarray:
+    import joblib
+    model = joblib.load(MODEL)
+    X = FeatureEncoder.from_model(model).encode(raw[FIELDS].to_dict("records"))
+    return make_backend("sklearn", model).predict(X)
+
+
+def test_chunk_with_null_is_rejected(scorer, raw):
+    chunk = raw.copy()
+    chunk.loc[5, "inning"] = np.nan              # what read_csv yields for an empty cell
+    with pytest.raises(ValueError, match=r"rows \[5\] have no 'inning'"):
+        scorer(chunk)
+
+
+def test_float_chunk_matches_predict_proba(scorer, raw, expected):
+    """The rest of a chunk that held a null is float64; it must score as ints."""
+    chunk = raw.copy()
+    for f in ("inning", "month", "balls", "strikes"):
+        chunk[f] = chunk[f].astype("float64")
+    got = scorer(chunk)
+    assert np.abs(got - expected).max() <= TOL
+    assert np.abs(scorer(raw) - expected).max() <= TOL
+
+
+def test_fractional_int_is_rejected(scorer, raw):
+    chunk = raw.astype({"balls": "float64"})
+    chunk.loc[3, "balls"] = 1.5
+    with pytest.raises(ValueError, match="'balls' is not an integer"):
+        scorer(chunk)
+
+
+def test_csv_with_null_fails_like_http(scorer, raw, expected, tmp_path):
+    src, out = tmp_path / "pa.csv", tmp_path / "scored.csv"
+    with_null = raw.copy()
+    with_null.loc[70, "month"] = np.nan
+    with_null.to_csv(src, index=False)
+    assert next(read_chunks(str(src), 25, skip=50))["month"].dtype == np.float64
+    with pytest.raises(ValueError, match=r"rows \[70\] have no 'month'"):
+        score_file(str(src), str(out), scorer, chunk_rows=25)
+
+    raw.drop(index=70).to_csv(src, index=False)
+    assert score_file(str(src), str(out), scorer, chunk_rows=25, restart=True) == N_ROWS - 1
+    got = pd.read_csv(out)["hr_probability"].to_numpy()
+    assert np.abs(got - np.delete(expected, 70)).max() <= 1e-6
@@ -0,0 +1,95 @@
+"""
+``processing.feature_store.refresh`` keeps exactly one copy of every raw
+game: a rescheduled game leaves its old date file, a game dropped from
+raw leaves the store.
+
+    python -m pytest tests/test_feature_store.py -q
+"""
+import numpy as np, pandas as pd, pytest
+
+import processing.feature_store as fs
+from benchmarks.synth import synth_statcast, synth_weather
+from processing.feature_engineering import build_vocab, open_dataset
+
+N_PITCHES = 3_000                                # ~10 games
+
+
+@pytest.fixture
+def season(tmp_path, monkeypatch):
+    raw = synth_statcast(N_PITCHES, seed=1)
+    wx = tmp_path / "weather.parquet"
+    synth_weather(raw["game_pk"], seed=1).to_parquet(wx, index=False)
+    monkeypatch.setattr(fs, "WEATHER_PATH", str(wx))
+    return raw
+
+
+@pytest.fixture
+def vocab(season, tmp_path) -> dict:
+    """Built once, like data/feature_vocab.json (a new level re-encodes everything)."""
+    season.to_parquet(tmp_path / "vocab-src.parquet", index=False)
+    return build_vocab(open_dataset(str(tmp_path / "vocab-src.parquet")))
+
+
+def run(raw: pd.DataFrame, vocab: dict, tmp_path, since: str = None) -> tuple:
+    src = tmp_path / "raw.parquet"
+    raw.to_parquet(src, index=False)
+    store = fs.FeatureStore(str(tmp_path / "store"))
+    stats = fs.refresh(str(src), store, vocab, since)
+    stored = pd.read_parquet(store.features)
+    stored["game_date"] = stored["game_date"].astype(str)
+    return stats, stored
+
+
+def games(stored: pd.DataFrame) -> dict:
+    """{game_pk: (sorted dates, rows)} as the store holds them."""
+    g = stored.groupby("game_pk")["game_date"]
+    return {pk: (sorted(set(d)), len(d)) for pk, d in g}
+
+
+def expected(raw: pd.DataFrame) -> dict:
+    g = raw.groupby("game_pk")["game_date"]
+    return {pk: (sorted(set(d)), len(d)) for pk, d in g}
+
+
+def test_rescheduled_game_leaves_its_old_date(season, vocab, tmp_path):
+    stats, stored = run(season, vocab, tmp_path)
+    assert games(stored) == expected(season)
+
+    pk = season["game_pk"].min()
+    moved = season.copy()
+    later = season["game_date"].max()
+    assert later != season.loc[season["game_pk"] == pk, "game_date"].iloc[0]
+    moved.loc[moved["game_pk"] == pk, "game_date"] = later          # postponed
+    stats, stored = run(moved, vocab, tmp_path)
+    assert stats["games_recomputed"] == 1 and stats["games_removed"] == 0
+    assert games(stored) == expected(moved)
+    assert len(stored) == len(season)
+
+
+def test_removed_game_leaves_the_store(season, vocab, tmp_path):
+    run(season, vocab, tmp_path)
+    first, last = np.sort(season["game_pk"].unique())[[0, -1]]
+    since = season.loc[season["game_pk"] == last, "game_date"].iloc[0]
+
+    # outside the --since window: not scanned, so kept
+    kept = season[season["game_pk"] != first]
+    stats, stored = run(kept, vocab, tmp_path, since=since)
+    assert stats["games_removed"] == 0 and first in stored["game_pk"].values
+
+    dropped = kept[kept["game_pk"] != last]
+    stats, stored = run(dropped, vocab, tmp_path)
+    assert stats["games_removed"] == 2
+    assert games(stored) == expected(dropped)
+    fp = pd.read_parquet(tmp_path / "store" / "fingerprints.parquet")
+    assert set(fp["game_pk"]) == set(dropped["game_pk"])
+
+
+def test_fingerprints_without_dates_are_backfilled(season, vocab, tmp_path):
+    run(season, vocab, tmp_path)
+    fp_path = tmp_path / "store" / "fingerprints.parquet"
+    pd.read_parquet(fp_path).drop(columns=fs.DATES).to_parquet(fp_path, index=False)
+
+    stats, stored = run(season, vocab, tmp_path)
+    assert stats["games_recomputed"] == 0
+    assert pd.read_parquet(fp_path)[fs.DATES].notna().all()
+    assert games(stored) == expected(season)
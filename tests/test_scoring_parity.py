@@ -0,0 +1,68 @@
+"""
+Scoring backends agree with ``XGBClassifier.predict_proba`` on the
+served model (``models/hr_model.pkl``) and the 2024 features.
+
+    python -m pytest tests/test_scoring_parity.py -q
+"""
+import joblib, numpy as np, pandas as pd, pytest
+
+from benchmarks.bench_scoring import load_matrix
+from utils.request_helper import FeatureEncoder
+from utils.scoring import CompiledTreeBackend, make_backend
+
+MODEL_PATH = "models/hr_model.pkl"
+FEATURES = "data/features_2024.parquet"
+N_ROWS = 5_000
+# float32 tree walk + float64 leaf sums vs XGBoost's own; 4.8e-07 measured
+TOL = {"sklearn": 0.0, "inplace": 1e-6, "compiled": 1e-5}
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def frame(model) -> pd.DataFrame:
+    return load_matrix(FEATURES, model, N_ROWS)
+
+
+@pytest.fixture(scope="module")
+def reference(model, frame) -> np.ndarray:
+    return model.predict_proba(frame)[:, 1]
+
+
+@pytest.mark.parametrize("name", sorted(TOL))
+def test_backend_matches_predict_proba(name, model, frame, reference):
+    X = FeatureEncoder.from_model(model).encode_frame(frame)
+    got = make_backend(name, model).predict(X)
+    assert got.dtype == np.float32 and got.shape == reference.shape
+    assert np.abs(got - reference).max() <= TOL[name]
+
+
+def test_missing_values_follow_default_direction(model):
+    """All-NaN rows exercise every ``default_left`` branch."""
+    X = np.full((4, len(FeatureEncoder.from_model(model).feature_names)), np.nan, np.float32)
+    ref = make_backend("inplace", model).predict(X)
+    assert np.abs(make_backend("compiled", model).predict(X) - ref).max() <= TOL["compiled"]
+
+
+def test_compiled_arrays_round_trip(model, frame, reference, tmp_path):
+    """Saved + mmapped trees (what workers serve from an artifact) score the same."""
+    CompiledTreeBackend(model).save(tmp_path)
+    loaded = CompiledTreeBackend.load(tmp_path)
+    X = FeatureEncoder.from_model(model).encode_frame(frame)
+    assert np.abs(loaded.predict(X) - reference).max() <= TOL["compiled"]
+
+
+def test_one_row_path_matches_batch(model):
+    """Raw PAs through ``encode`` (the API's path) score like the batch."""
+    raw = pd.read_csv("pa_samples.csv").head(200)
+    records = raw[["launch_speed", "launch_angle", "balls", "strikes", "stand", "p_throws",
+                   "pitch_type", "inning", "month"]].to_dict("records")
+    enc = FeatureEncoder.from_model(model)
+    batch = make_backend("compiled", model).predict(enc.encode(records))
+    ref = make_backend("sklearn", model).predict(enc.encode(records))
+    assert np.abs(batch - ref).max() <= TOL["compiled"]
+    one = np.array([make_backend("inplace", model).predict(enc.encode_one(r))[0] for r in records[:20]])
+    assert np.abs(one - ref[:20]).max() <= TOL["inplace"]
@@ -0,0 +1,117 @@
+"""
+Version-stamped model artifacts and atomic config updates.
+
+An artifact directory holds everything a serving worker needs:
+
+    models/artifacts/<version>/
+        meta.json        version, model key, feature names/types/categories,
+                         source, sha256 or training rows (enough to serve
+                         compiled trees)
+        model.ubj        XGBClassifier in UBJSON (no pickle / joblib)
+        compiled/        flattened tree arrays (.npy), memory-mapped read-only
+
+Directories are written under a temp name and renamed into place, and
+``update_config`` swaps ``serve/config.json`` with ``os.replace`` so a
+reader sees either the old file or the new one, never a partial write.
+"""
+import hashlib, json, os, pathlib, shutil, stat, tempfile, time
+from typing import TYPE_CHECKING, Optional
+
+from utils.scoring import CompiledTreeBackend
+
+if TYPE_CHECKING:
+    from xgboost import XGBClassifier
+
+ARTIFACT_ROOT = "models/artifacts"
+
+
+def _sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def model_key(model) -> str:
+    """Content hash of the booster (16 hex chars); identical trees -> identical key."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return hashlib.sha256(bytes(booster.save_raw("ubj"))).hexdigest()[:16]
+
+
+def export_artifact(model, version: str, root: str = ARTIFACT_ROOT,
+                    source: Optional[str] = None, training: Optional[dict] = None) -> pathlib.Path:
+    """
+    Write ``model`` as ``<root>/<version>/`` and return the directory.
+    ``source`` is the file ``model`` was loaded from (hashed into meta);
+    a model fit in memory has none and records ``training`` instead.
+    """
+    out = pathlib.Path(root) / version
+    if out.exists():
+        raise FileExistsError(f"{out} already exists; pick a new version")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{version}.", dir=out.parent))
+    try:
+        model.save_model(tmp / "model.ubj")
+        try:
+            CompiledTreeBackend(model).save(tmp / "compiled")
+            compiled = True
+        except NotImplementedError:              # e.g. categorical splits
+            compiled = False
+
+        booster = model.get_booster()
+        vocab = booster.attr("category_vocab")
+        meta = {
+            "model_version": version,
+            "model_key": model_key(model),
+            "feature_names": booster.feature_names,
+            "feature_types": booster.feature_types,
+            "category_vocab": json.loads(vocab) if vocab else None,
+            "compiled": compiled,
+            "source": source,
+            "source_sha256": _sha256(source) if source else None,
+            "training": training,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(tmp / "meta.json", "w") as fh:
+            json.dump(meta, fh, indent=2)
+        os.replace(tmp, out)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return out
+
+
+def read_meta(artifact_dir) -> dict:
+    with open(pathlib.Path(artifact_dir) / "meta.json") as fh:
+        return json.load(fh)
+
+
+def load_model(artifact_dir) -> "XGBClassifier":
+    """Rebuild the sklearn-wrapped model from the artifact's UBJSON file."""
+    from xgboost import XGBClassifier           # not needed to serve compiled trees
+    model = XGBClassifier()
+    model.load_model(pathlib.Path(artifact_dir) / "model.ubj")
+    return model
+
+
+def update_config(config_path: str, **changes) -> dict:
+    """Merge ``changes`` into the JSON config and swap it in atomically."""
+    path = pathlib.Path(config_path)
+    with open(path, encoding="utf-8") as fh:
+        cfg = json.load(fh)
+    cfg.update(changes)
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(cfg, fh, indent=2)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))  # mkstemp files are 0600
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return cfg
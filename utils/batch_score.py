@@ -1,28 +1,223 @@
-import argparse, requests, pandas as pd
+"""
+Batch-score a CSV or parquet of plate appearances.
+
+Usage
+-----
+python -m utils.batch_score pa.csv scored.csv [--api http://127.0.0.1:8000]
+                            [--chunk-rows 5000] [--concurrency 4]
+python -m utils.batch_score pa.parquet scored.csv --in-process [--backend inplace]
+
+The input is read ``--chunk-rows`` rows at a time.  Over HTTP every chunk is
+one ``/predict_batch`` call on a pooled keep-alive session, with up to
+``--concurrency`` calls in flight.  With ``--in-process`` the model is
+loaded locally and each chunk is encoded and scored as one matrix; a
+chunk with a null (or a fractional int) fails in both modes, as the API
+answers it with a 422.
+
+Results are appended to the output chunk by chunk, in input order.
+``<csv_out>.progress`` records the rows and bytes written, so rerunning an
+interrupted job skips what is already scored (``--restart`` starts over).
+"""
+import argparse, json, os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import numpy as np, pandas as pd, pyarrow.parquet as pq, requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
- 
+from urllib3.util.retry import Retry
 
-API   = "http://127.0.0.1:8000/predict"
+API   = "http://127.0.0.1:8000"
 MODEL = "models/hr_model.pkl"
+FIELDS = ["launch_speed", "launch_angle", "balls", "strikes", "stand",
+          "p_throws", "pitch_type", "inning", "month"]      # RawPA
+INT_FIELDS = {"balls", "strikes", "inning", "month"}        # RawPA ints
+OPTIONAL = {"balls", "strikes"}                             # RawPA defaults (0)
+
+# ---------------------------------------------------------------------
+# Input: chunks of raw rows
+# ---------------------------------------------------------------------
+def read_chunks(path: str, chunk_rows: int, skip: int = 0) -> Iterator[pd.DataFrame]:
+    """Yield ``chunk_rows``-row frames of ``path`` (CSV or parquet), minus the first ``skip``."""
+    if path.endswith(".parquet"):
+        chunks = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows))
+    else:
+        chunks = pd.read_csv(path, chunksize=chunk_rows)
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield chunk.iloc[skip:]
+        skip = 0
+
+def count_rows(path: str) -> Optional[int]:
+    if path.endswith(".parquet"):
+        return pq.ParquetFile(path).metadata.num_rows
+    return None                                 # not worth a pass over the CSV
+
+# ---------------------------------------------------------------------
+# Scorers: chunk -> probabilities
+# ---------------------------------------------------------------------
+class HttpScorer:
+    """POST chunks to ``/predict_batch`` over one pooled keep-alive session."""
+
+    def __init__(self, api: str, concurrency: int, timeout: float):
+        self.url = api.rstrip("/") + "/predict_batch"
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                      allowed_methods=["POST"])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __call__(self, chunk: pd.DataFrame) -> np.ndarray:
+        # pandas writes the JSON body directly (NaN -> null)
+        body = '{"data":' + chunk[FIELDS].to_json(orient="records") + "}"
+        r = self.session.post(self.url, data=body.encode(), timeout=self.timeout,
+                              headers={"Content-Type": "application/json"})
+        if r.status_code == 422:
+            raise ValueError(f"/predict_batch rejected rows: {r.text[:500]}")
+        r.raise_for_status()
+        return np.asarray(r.json()["hr_probability"], dtype=np.float32)
+
+class LocalScorer:
+    """Encode + score chunks with the model in this process; no HTTP."""
+
+    def __init__(self, model_path: str, backend: str):
+        import joblib
+        from utils.request_helper import FeatureEncoder
+        from utils.scoring import make_backend
+        model = joblib.load(model_path)
+        self.encoder = FeatureEncoder.from_model(model)
+        try:
+            self.backend = make_backend(backend, model)
+        except NotImplementedError as e:
+            print(f"[warn] {backend} backend unavailable ({e}); using inplace")
+            self.backend = make_backend("inplace", model)
+
+    def __call__(self, chunk: pd.DataFrame) -> np.ndarray:
+        cols = {}
+        for f in FIELDS:
+            if f not in chunk:
+                if f in OPTIONAL:
+                    continue
+                raise ValueError(f"input has no '{f}' column")
+            cols[f] = raw_column(chunk[f], f)
+        return self.backend.predict(self.encoder.encode_columns(cols))
+
+def raw_column(col: pd.Series, field: str) -> np.ndarray:
+    """
+    ``col`` as the array ``encode_columns`` expects, validated like RawPA:
+    a null, or a fraction in an int field, raises ``ValueError`` (the
+    chunk ``/predict_batch`` would answer with a 422).  pandas reads a CSV
+    int column with one null as float64; it is cast back so inning=7 hits
+    the "inning_7" slot, not "7.0".
+    """
+    bad = col.isna()
+    if bad.any():
+        raise ValueError(f"rows {list(col.index[bad][:10])} have no '{field}'")
+    if field in INT_FIELDS:
+        values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64)
+        frac = np.isnan(values) | (values != np.round(values))
+        if frac.any():
+            raise ValueError(f"rows {list(col.index[frac][:10])}: '{field}' is not an integer")
+        return values.astype(np.int64)
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy()
+    return col.astype(str).to_numpy()
+
+# ---------------------------------------------------------------------
+# Output: append + progress marker
+# ---------------------------------------------------------------------
+class ResumableCsv:
+    """Append scored chunks to ``path``; ``path.progress`` marks what is durable."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path, self.marker = path, path + ".progress"
+        self.rows, self.bytes = 0, 0
+        if not restart and os.path.exists(self.marker) and os.path.exists(path):
+            with open(self.marker) as fh:
+                done = json.load(fh)
+            self.rows, self.bytes = done["rows"], done["bytes"]
+        self.fh = open(path, "r+b" if self.bytes else "wb")
+        self.fh.truncate(self.bytes)            # drop a chunk cut off mid-write
+        self.fh.seek(self.bytes)
+
+    def append(self, chunk: pd.DataFrame) -> None:
+        self.fh.write(chunk.to_csv(index=False, header=self.bytes == 0).encode())
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        self.rows += len(chunk)
+        self.bytes = self.fh.tell()
+        tmp = self.marker + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"rows": self.rows, "bytes": self.bytes}, fh)
+        os.replace(tmp, self.marker)
+
+    def close(self) -> None:
+        self.fh.close()
+
+# ---------------------------------------------------------------------
+def score_file(in_path: str, out_path: str, score, concurrency: int = 1,
+               chunk_rows: int = 5_000, restart: bool = False) -> int:
+    """
+    Score ``in_path`` into ``out_path`` with ``score(chunk) -> probs``.
+    Up to ``concurrency`` chunks are scored at once; they are written in
+    input order.  Returns the number of rows in the finished output.
+    """
+    out = ResumableCsv(out_path, restart)
+    if out.rows:
+        print(f"resuming {out_path}: {out.rows:,} rows already scored")
+    total = count_rows(in_path)
+    bar = tqdm(total=total, initial=out.rows, unit="PA", desc="Scoring")
+
+    def scored(chunk):
+        chunk = chunk.copy()
+        chunk["hr_probability"] = score(chunk)
+        return chunk
+
+    try:
+        with ThreadPoolExecutor(concurrency) as pool:
+            pending = deque()
+            for chunk in read_chunks(in_path, chunk_rows, skip=out.rows):
+                pending.append(pool.submit(scored, chunk))
+                if len(pending) >= 2 * concurrency:       # bounded read-ahead
+                    done = pending.popleft().result()
+                    out.append(done); bar.update(len(done))
+            while pending:
+                done = pending.popleft().result()
+                out.append(done); bar.update(len(done))
+    finally:
+        bar.close()
+        out.close()
+    if os.path.exists(out.marker):
+        os.remove(out.marker)
+    return out.rows
 
 def main():
-    ap = argparse.ArgumentParser(description="Batch-score a CSV of plate appearances")
-    ap.add_argument("csv_in",  help="Input CSV with raw PA columns")
+    ap = argparse.ArgumentParser(description="Batch-score a CSV or parquet of plate appearances")
+    ap.add_argument("csv_in",  help="Input CSV/parquet with raw PA columns")
     ap.add_argument("csv_out", help="Output CSV with hr_probability column")
+    ap.add_argument("--api", default=API, help="base URL of the scoring API")
+    ap.add_argument("--chunk-rows", type=int, default=5_000)
+    ap.add_argument("--concurrency", type=int, default=4, help="HTTP requests in flight")
+    ap.add_argument("--timeout", type=float, default=30.0, help="seconds per chunk request")
+    ap.add_argument("--in-process", action="store_true", help="score locally, no HTTP")
+    ap.add_argument("--model", default=MODEL, help="model for --in-process")
+    ap.add_argument("--backend", default="inplace", help="scoring backend for --in-process")
+    ap.add_argument("--restart", action="store_true", help="ignore earlier partial output")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv_in)
-    probs = []
-
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Scoring"):
-        payload = row.to_dict()
-        r = requests.post(API, json=payload, timeout=3)
-        r.raise_for_status()
-        probs.append(r.json()["hr_probability"])
+    if args.in_process:
+        # one thread: the backend already uses every core per chunk
+        score, concurrency = LocalScorer(args.model, args.backend), 1
+    else:
+        score, concurrency = HttpScorer(args.api, args.concurrency, args.timeout), args.concurrency
 
-    df["hr_probability"] = probs
-    df.to_csv(args.csv_out, index=False)
-    print(f"✅ Saved {args.csv_out} with {len(df)} rows")
+    n = score_file(args.csv_in, args.csv_out, score, concurrency, args.chunk_rows, args.restart)
+    print(f"✅ Saved {args.csv_out} with {n} rows")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
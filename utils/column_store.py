@@ -0,0 +1,225 @@
+"""
+Memory-mapped column store for training data.
+
+A features parquet (single file or the partitioned feature store) is
+streamed once, batch by batch, straight from Arrow into
+
+    <root>/
+        meta.json       feature names/types, category vocabulary, source
+        X.npy           float32 (rows, features), row-major
+        y.npy           int8 labels
+        game_date.npy   datetime64[D] per row (when the input has dates)
+
+without a pandas frame in between.  ``ColumnStore`` opens the arrays
+read-only with ``mmap_mode="r"``; train/validation splits are index
+arrays and ``ColumnIter`` feeds XGBoost one slice at a time, so neither
+the split nor the DMatrix construction copies the full matrix.
+
+Categorical columns (``CAT_COLS``) are stored as codes into the vocabulary,
+the same codes ``FeatureEncoder`` produces from ``category_vocab``.
+"""
+import json, os, pathlib, shutil, tempfile, time
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa, pyarrow.compute as pc, pyarrow.dataset as ds
+import xgboost as xgb
+
+from processing.feature_engineering import CAT_COLS, META_COLS, open_dataset
+
+STORE_PATH = "data/column_store"
+LABEL = "is_hr"
+
+
+def _feature_type(name: str, t: pa.DataType) -> str:
+    # integer categoricals (inning, month) come back from parquet as plain ints
+    if pa.types.is_dictionary(t) or name in CAT_COLS:
+        return "c"
+    if pa.types.is_boolean(t):
+        return "i"                              # one-hot indicator
+    if pa.types.is_integer(t):
+        return "int"
+    return "float"
+
+def _dictionary(arr: pa.Array) -> pa.DictionaryArray:
+    return arr if pa.types.is_dictionary(arr.type) else pc.dictionary_encode(arr)
+
+def _scan_levels(dataset: ds.Dataset, cols: list) -> dict:
+    """Sorted distinct values of each categorical column (reads only those)."""
+    levels = {c: set() for c in cols}
+    for batch in dataset.to_batches(columns=cols):
+        for c in cols:
+            levels[c].update(v for v in _dictionary(batch.column(c)).dictionary.to_pylist()
+                             if v is not None)
+    return {c: sorted(v) for c, v in levels.items()}
+
+def _to_float32(arr: pa.Array, codes: Optional[dict] = None) -> np.ndarray:
+    """One Arrow column -> float32 NumPy; nulls and unknown levels -> NaN."""
+    if codes is not None:
+        arr = _dictionary(arr)
+        lut = np.array([codes.get(str(v), np.nan) for v in arr.dictionary.to_pylist()] + [np.nan],
+                       dtype=np.float32)
+        return lut[pc.fill_null(arr.indices, -1).to_numpy()]   # -1 -> trailing NaN
+    if pa.types.is_boolean(arr.type):
+        return arr.to_numpy(zero_copy_only=False).astype(np.float32)
+    return pc.cast(arr, pa.float32()).to_numpy(zero_copy_only=False)
+
+
+def source_mtime(in_path: str) -> float:
+    """Newest mtime of the parquet files behind ``in_path``."""
+    return max(os.stat(f).st_mtime for f in open_dataset(in_path).files)
+
+
+def build_column_store(in_path: str, root: str = STORE_PATH, vocab: Optional[dict] = None,
+                       batch_rows: int = 250_000) -> pathlib.Path:
+    """
+    Stream ``in_path`` into a column store at ``root`` (replaced atomically).
+
+    ``vocab`` ({col: [levels]}) fixes the codes of categorical columns; by
+    default their levels are scanned from the data and sorted.
+    """
+    dataset = open_dataset(in_path)
+    schema = dataset.schema
+    features = [f.name for f in schema if f.name != LABEL and f.name not in META_COLS]
+    types = [_feature_type(c, schema.field(c).type) for c in features]
+    cat_cols = [c for c, t in zip(features, types) if t == "c"]
+    if cat_cols:
+        vocab = {c: list(vocab[c]) for c in cat_cols} if vocab else _scan_levels(dataset, cat_cols)
+    codes = {c: {str(v): k for k, v in enumerate(vocab[c])} for c in cat_cols}
+    has_dates = "game_date" in schema.names
+    n = dataset.count_rows()
+
+    out = pathlib.Path(root)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{out.name}.", dir=out.parent))
+    try:
+        X = np.lib.format.open_memmap(tmp / "X.npy", mode="w+", dtype=np.float32,
+                                      shape=(n, len(features)))
+        y = np.lib.format.open_memmap(tmp / "y.npy", mode="w+", dtype=np.int8, shape=(n,))
+        dates = np.lib.format.open_memmap(tmp / "game_date.npy", mode="w+",
+                                          dtype="datetime64[D]", shape=(n,)) if has_dates else None
+
+        cols = features + [LABEL] + (["game_date"] if has_dates else [])
+        off = 0
+        for batch in dataset.to_batches(columns=cols, batch_size=batch_rows):
+            m = batch.num_rows
+            for j, c in enumerate(features):
+                X[off:off + m, j] = _to_float32(batch.column(c), codes.get(c))
+            y[off:off + m] = pc.cast(batch.column(LABEL), pa.int8()).to_numpy(zero_copy_only=False)
+            if has_dates:
+                d = batch.column("game_date").to_numpy(zero_copy_only=False)
+                dates[off:off + m] = np.asarray(d, dtype="datetime64[D]")
+            off += m
+        X.flush(); y.flush()
+        if has_dates:
+            dates.flush()
+        del X, y, dates
+
+        meta = {
+            "feature_names": features,
+            "feature_types": types,
+            "category_vocab": vocab if cat_cols else None,
+            "rows": n,
+            "has_dates": has_dates,
+            "source": str(in_path),
+            "source_mtime": source_mtime(in_path),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(tmp / "meta.json", "w") as fh:
+            json.dump(meta, fh, indent=2)
+        if out.exists():
+            shutil.rmtree(out)
+        os.replace(tmp, out)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return out
+
+
+class ColumnStore:
+    """Read-only, memory-mapped view of a store written by ``build_column_store``."""
+
+    def __init__(self, root: str = STORE_PATH):
+        self.root = pathlib.Path(root)
+        with open(self.root / "meta.json") as fh:
+            self.meta = json.load(fh)
+        self.feature_names = self.meta["feature_names"]
+        self.feature_types = self.meta["feature_types"]
+        self.category_vocab = self.meta["category_vocab"]
+        self.X = np.load(self.root / "X.npy", mmap_mode="r")
+        self.y = np.load(self.root / "y.npy", mmap_mode="r")
+        self.game_date = (np.load(self.root / "game_date.npy", mmap_mode="r")
+                          if self.meta["has_dates"] else None)
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def is_stale(self, in_path: str) -> bool:
+        """True if ``in_path`` changed since the store was built from it."""
+        return (self.meta["source"] != str(in_path)
+                or source_mtime(in_path) != self.meta["source_mtime"])
+
+    def time_split(self, valid_frac: float = 0.2,
+                   valid_from: Optional[str] = None) -> tuple:
+        """
+        ``(train_idx, valid_idx)``: every row dated on/after the cutoff is
+        validation.  The cutoff is ``valid_from`` or the date that leaves
+        about ``valid_frac`` of rows for validation, so no game is split.
+        Without dates the last ``valid_frac`` of rows (file order) is used.
+        """
+        n = len(self)
+        if self.game_date is None:
+            print("[warn] column store has no game_date; validating on the last rows")
+            cut = int(n * (1 - valid_frac))
+            return np.arange(cut), np.arange(cut, n)
+        dates = np.asarray(self.game_date)
+        if valid_from is not None:
+            cutoff = np.datetime64(valid_from, "D")
+        else:
+            cutoff = np.sort(dates)[min(n - 1, int(n * (1 - valid_frac)))]
+        valid = dates >= cutoff
+        return np.flatnonzero(~valid), np.flatnonzero(valid)
+
+    def iterator(self, idx: np.ndarray, batch_rows: int = 100_000,
+                 cache_prefix: Optional[str] = None) -> "ColumnIter":
+        return ColumnIter(self, idx, batch_rows, cache_prefix)
+
+
+class ColumnIter(xgb.DataIter):
+    """
+    Feed ``store`` rows ``idx`` to XGBoost ``batch_rows`` at a time.
+
+    Runs of consecutive indices are passed as mmap slices (no copy); other
+    chunks are gathered, so at most one chunk is materialised at once.
+    With ``cache_prefix`` XGBoost keeps its quantised pages on disk
+    (external memory) instead of in RAM.
+    """
+
+    def __init__(self, store: ColumnStore, idx: np.ndarray, batch_rows: int = 100_000,
+                 cache_prefix: Optional[str] = None):
+        self.store = store
+        self.idx = np.asarray(idx, dtype=np.int64)
+        self.batch_rows = batch_rows
+        self._pos = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def _rows(self, chunk: np.ndarray):
+        if len(chunk) and chunk[-1] - chunk[0] + 1 == len(chunk):
+            return slice(int(chunk[0]), int(chunk[-1]) + 1)
+        return chunk
+
+    def next(self, input_data) -> bool:
+        if self._pos >= len(self.idx):
+            return False
+        rows = self._rows(self.idx[self._pos:self._pos + self.batch_rows])
+        input_data(
+            data=self.store.X[rows],
+            label=self.store.y[rows],
+            feature_names=self.store.feature_names,
+            feature_types=self.store.feature_types,
+        )
+        self._pos += self.batch_rows
+        return True
+
+    def reset(self) -> None:
+        self._pos = 0
@@ -0,0 +1,72 @@
+"""
+Persistent, bounded "already alerted" set for live_alerts.py.
+
+Play IDs are stored per day in SQLite:
+
+    seen(day TEXT, play_id TEXT, PRIMARY KEY (day, play_id)) WITHOUT ROWID
+
+``claim`` inserts with ``INSERT OR IGNORE`` and returns only the IDs that
+were not there yet, committed before the caller acts on them.  After a
+crash or restart those plays are never claimed again, so nothing is
+alerted twice (at-most-once; a crash between claim and send drops that
+alert rather than repeating it).  A caller that could not act on its
+claims (scoring failed) hands them back with ``release`` and claims
+them again on its retry.  Nothing is held in Python memory, and
+opening the file is instant.  Days older than ``retention_days`` are
+deleted when a new day is first seen, so the file stays at a couple of
+days of plays (~40k rows).
+"""
+import datetime as dt, pathlib, sqlite3
+from typing import Iterable, Optional
+
+DEDUP_PATH = "data/live_alerts_seen.sqlite"
+
+
+class SeenStore:
+    def __init__(self, path: str = DEDUP_PATH, retention_days: int = 2):
+        if path != ":memory:":
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")     # WAL: survives process crashes
+        self.db.execute("""CREATE TABLE IF NOT EXISTS seen (
+                               day TEXT NOT NULL, play_id TEXT NOT NULL,
+                               PRIMARY KEY (day, play_id)) WITHOUT ROWID""")
+        self.retention_days = retention_days
+        self.current_day: Optional[str] = None
+
+    def claim(self, day: str, play_ids: Iterable[str]) -> set:
+        """Record ``play_ids`` under ``day``; return the ones not seen before."""
+        if self.current_day is None or day > self.current_day:
+            self.rollover(day)
+        new = set()
+        cur = self.db.cursor()
+        cur.execute("BEGIN")
+        try:
+            for pid in play_ids:
+                cur.execute("INSERT OR IGNORE INTO seen VALUES (?, ?)", (day, str(pid)))
+                if cur.rowcount:
+                    new.add(pid)
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        return new
+
+    def release(self, day: str, play_ids: Iterable[str]) -> None:
+        """Forget claims that were not acted on, so they can be claimed again."""
+        self.db.executemany("DELETE FROM seen WHERE day = ? AND play_id = ?",
+                            [(day, str(pid)) for pid in play_ids])
+
+    def rollover(self, day: str) -> int:
+        """Move to ``day`` and drop days older than the retention window."""
+        self.current_day = max(day, self.current_day or day)
+        cutoff = (dt.date.fromisoformat(self.current_day)
+                  - dt.timedelta(days=self.retention_days)).isoformat()
+        return self.db.execute("DELETE FROM seen WHERE day < ?", (cutoff,)).rowcount
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the Statcast live feed, for running live_alerts.py offline.
+
+Usage
+-----
+python -m utils.fake_feed [--games 15] [--rate 0.2] [--port 8765]
+
+Every game appends a synthetic batted ball about every ``1/rate`` seconds.
+Feeds are served in the same shape as Savant's ``gf`` endpoint, a JSON
+list of row strings:
+
+    GET /gf?game_pk=<pk>      one game
+    GET /gf?date=<yyyy-mm-dd> every game
+
+Responses carry an ETag and honour ``If-None-Match`` with a 304, the way
+live_alerts polls.  Then:
+
+    python live_alerts.py --feed-url "http://127.0.0.1:8765/gf?game_pk={game_pk}" \\
+        --games $(seq 1 15) --console
+"""
+import argparse, asyncio, json, uuid
+import numpy as np, pandas as pd
+from aiohttp import web
+
+TEAMS = ["ARI", "ATL", "BAL", "BOS", "CHC", "CIN", "COL", "DET", "HOU", "LAD",
+         "NYY", "NYM", "PHI", "SEA", "SF", "TEX"]
+PITCH_TYPES = ["FF", "SI", "SL", "CH", "CU", "FC", "ST"]
+EVENTS, EVENT_P = ["field_out", "single", "double", "home_run"], [0.66, 0.2, 0.1, 0.04]
+
+
+class FakeFeed:
+    def __init__(self, n_games: int, rate: float, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.rate = rate
+        self.date = pd.Timestamp.now("America/New_York").strftime("%Y-%m-%d")
+        self.games = {}
+        for pk in range(1, n_games + 1):
+            away, home = self.rng.choice(TEAMS, 2, replace=False)
+            self.games[str(pk)] = {"away": str(away), "home": str(home), "rows": []}
+
+    def pitch(self, pk: str) -> str:
+        g, rng = self.games[pk], self.rng
+        batter, pitcher = int(rng.integers(1, 400)), int(rng.integers(1, 300))
+        return json.dumps({
+            "play_id": str(uuid.uuid4()),
+            "game_pk": int(pk),
+            "game_date": self.date,
+            "away_team": g["away"],
+            "home_team": g["home"],
+            "inning": min(9, 1 + len(g["rows"]) // 8),
+            "batter": batter,
+            "pitcher": pitcher,
+            "player_name": f"Batter {batter}",
+            "pitcher_name": f"Pitcher {pitcher}",
+            "stand": str(rng.choice(["R", "L"])),
+            "p_throws": str(rng.choice(["R", "L"])),
+            "pitch_type": str(rng.choice(PITCH_TYPES)),
+            "balls": int(rng.integers(0, 4)),
+            "strikes": int(rng.integers(0, 3)),
+            "launch_speed": round(float(rng.normal(90, 12)), 1),
+            "launch_angle": round(float(rng.normal(14, 22)), 1),
+            "events": str(rng.choice(EVENTS, p=EVENT_P)),
+        })
+
+    async def run(self):
+        """Append a pitch to a random game at ``rate`` × games per second overall."""
+        keys = list(self.games)
+        while True:
+            await asyncio.sleep(self.rng.exponential(1 / (self.rate * len(keys))))
+            pk = keys[self.rng.integers(len(keys))]
+            self.games[pk]["rows"].append(self.pitch(pk))
+
+    async def gf(self, request: web.Request) -> web.Response:
+        pk = request.query.get("game_pk")
+        if pk is not None:
+            if pk not in self.games:
+                raise web.HTTPNotFound()
+            rows = self.games[pk]["rows"]
+            etag = f'"{pk}-{len(rows)}"'
+        else:
+            rows = [r for g in self.games.values() for r in g["rows"]]
+            etag = '"all-' + "-".join(str(len(g["rows"])) for g in self.games.values()) + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(rows, headers={"ETag": etag})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--games", type=int, default=15)
+    ap.add_argument("--rate", type=float, default=0.2, help="pitches per second per game")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    feed = FakeFeed(args.games, args.rate, args.seed)
+    app = web.Application()
+    app.router.add_get("/gf", feed.gf)
+
+    async def start_feed(app):
+        task = asyncio.create_task(feed.run())
+        yield
+        task.cancel()
+    app.cleanup_ctx.append(start_feed)
+    print(f"fake feed: {args.games} games, {args.rate}/s each, on :{args.port}")
+    web.run_app(app, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Local stand-in for the Visual Crossing timeline API, for running
+data/get_weather.py offline.
+
+Usage
+-----
+python -m utils.fake_weather [--port 8081] [--fail-rate 0.1] [--seed 0]
+
+    GET /timeline/<lat>,<lon>/<yyyy-mm-dd>?unitGroup=us&include=hours
+
+answers with one day of 24 hourly readings (``temp``, ``windspeed``,
+``winddir``), the fields ``parse_hour19`` reads.  Readings are a
+deterministic function of the location and date, so reruns and cache
+hits can be compared.  A ``--fail-rate`` share of requests gets a 429
+(with ``Retry-After: 0``) or a 503 instead, to exercise the fetcher's
+retries and backoff.  Then:
+
+    python data/get_weather.py --base-url http://127.0.0.1:8081/timeline
+"""
+import argparse, hashlib, numpy as np
+from aiohttp import web
+
+
+def reading(lat: float, lon: float, date: str) -> dict:
+    """One day of hourly weather, seeded by ``(lat, lon, date)``."""
+    seed = int.from_bytes(hashlib.sha256(f"{lat},{lon},{date}".encode()).digest()[:8], "little")
+    rng = np.random.default_rng(seed)
+    base, wind, wdir = rng.normal(72, 10), rng.gamma(2.2, 3.5), rng.uniform(0, 360)
+    hours = [{
+        "datetime": f"{h:02d}:00:00",
+        "temp": round(float(base + 8 * np.sin((h - 9) / 24 * 2 * np.pi)), 1),
+        "windspeed": round(float(max(0.0, wind + rng.normal(0, 1))), 1),
+        "winddir": round(float((wdir + rng.normal(0, 10)) % 360), 0),
+    } for h in range(24)]
+    return {"latitude": lat, "longitude": lon, "days": [{"datetime": date, "hours": hours}]}
+
+
+class FakeWeather:
+    def __init__(self, fail_rate: float, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.fail_rate = fail_rate
+        self.requests = self.failures = 0
+
+    async def timeline(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        try:
+            lat, lon = (float(v) for v in request.match_info["loc"].split(","))
+        except ValueError:
+            raise web.HTTPBadRequest(text="location must be <lat>,<lon>")
+        if self.rng.random() < self.fail_rate:
+            self.failures += 1
+            if self.rng.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": "0"})
+            return web.Response(status=503)
+        return web.json_response(reading(lat, lon, request.match_info["date"]))
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": self.requests, "failures": self.failures})
+
+
+def make_app(fail_rate: float = 0.0, seed: int = 0) -> web.Application:
+    fake = FakeWeather(fail_rate, seed)
+    app = web.Application()
+    app.router.add_get("/timeline/{loc}/{date}", fake.timeline)
+    app.router.add_get("/stats", fake.stats)
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 429/503")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    print(f"fake weather on :{args.port}, {args.fail_rate:.0%} transient failures")
+    web.run_app(make_app(args.fail_rate, args.seed), port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Precomputed P(HR) lookup grid over launch speed × launch angle.
+
+Usage
+-----
+python -m utils.prob_grid models/hr_model.pkl data/features_2024.parquet
+                          [--out models/grid] [--coverage 1.0]
+
+A served PA is nine raw fields.  Fix the seven discrete ones (the
+*context*: count, handedness, pitch type, inning, month) and the model is
+a function of speed and angle alone, and a tree ensemble makes that
+function piecewise constant: it only changes at the model's own split
+thresholds on those two features (93 × 45 for the production model).
+So the lattice is those thresholds, every cell holds the model's exact
+probability, and "interpolation" is one ``searchsorted`` per axis plus an
+array read – no approximation error beyond float rounding.
+
+The table is built for every context seen in the training features
+(optionally only the most frequent ones covering ``--coverage`` of the
+rows).  Trees are evaluated symbolically: each tree is walked once per
+chunk of contexts, context splits partition the contexts, speed/angle
+splits narrow a cell rectangle, and every leaf adds its value to its
+rectangle through a 2-D difference array.  Models with categorical splits
+fall back to predicting every cell with the booster.
+
+At build time the grid is checked against the booster on random points
+in every context plus real training PAs; the worst error per context is
+stored, and ``ProbGrid`` only answers for contexts within its tolerance.
+
+    <out>/
+        meta.json        model hash, fields, lattice edges, error summary
+        table.npy        float32 (contexts, speed cells, angle cells), mmapped
+        contexts.npy     context values as strings, (contexts, fields)
+        max_error.npy    float32 worst |grid − booster| per context
+"""
+import argparse, bisect, json, os, pathlib, shutil, tempfile, time
+from typing import Callable, Optional, Sequence
+
+import numpy as np, pandas as pd
+
+from utils.artifacts import model_key
+
+GRID_PATH = "models/grid"
+FIELDS = ("balls", "strikes", "stand", "p_throws", "pitch_type", "inning", "month")
+DEFAULTS = {"balls": 0, "strikes": 0}       # RawPA defaults
+
+
+def _key(row: dict) -> tuple:
+    return tuple(str(row.get(f, DEFAULTS.get(f))) for f in FIELDS)
+
+
+# ---------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------
+def _edges(trees, idx: int) -> np.ndarray:
+    inner = trees.left != np.arange(len(trees.left))
+    return np.unique(trees.thresh[inner & (trees.feat == idx)])
+
+def _tables_symbolic(trees, ctx: np.ndarray, s_idx: int, a_idx: int,
+                     s_edges: np.ndarray, a_edges: np.ndarray) -> np.ndarray:
+    """Margins (contexts, S, A) by walking every tree once for all contexts."""
+    S, A = len(s_edges) + 1, len(a_edges) + 1
+    D = np.zeros((len(ctx), S + 1, A + 1))
+    left, right, feat, thresh, dleft = (trees.left, trees.right, trees.feat,
+                                        trees.thresh, trees.default_left)
+    for root in trees.roots:
+        stack = [(int(root), np.arange(len(ctx)), 0, S, 0, A)]
+        while stack:
+            node, rows, s0, s1, a0, a1 = stack.pop()
+            if left[node] == node:                              # leaf
+                v = float(thresh[node])
+                D[rows, s0, a0] += v
+                D[rows, s1, a0] -= v
+                D[rows, s0, a1] -= v
+                D[rows, s1, a1] += v
+                continue
+            f, t = int(feat[node]), thresh[node]
+            l, r = int(left[node]), int(right[node])
+            if f == s_idx or f == a_idx:
+                # x < edges[j]  <=>  cell < j + 1
+                edges = s_edges if f == s_idx else a_edges
+                cut = int(np.searchsorted(edges, t)) + 1
+                lo, hi = (s0, s1) if f == s_idx else (a0, a1)
+                for child, clo, chi in ((l, lo, min(hi, cut)), (r, max(lo, cut), hi)):
+                    if clo < chi:
+                        stack.append((child, rows, clo, chi, a0, a1) if f == s_idx
+                                     else (child, rows, s0, s1, clo, chi))
+                continue
+            x = ctx[rows, f]
+            go_left = np.where(np.isnan(x), dleft[node], x < t)
+            if go_left.any():
+                stack.append((l, rows[go_left], s0, s1, a0, a1))
+            if not go_left.all():
+                stack.append((r, rows[~go_left], s0, s1, a0, a1))
+    return D.cumsum(axis=1).cumsum(axis=2)[:, :S, :A] + trees.base_margin
+
+def _cell_points(edges: np.ndarray) -> np.ndarray:
+    """One value inside every cell: edges[j] lies in cell j + 1."""
+    return np.r_[edges[0] - 1.0, edges].astype(np.float32)
+
+def _tables_booster(backend, ctx: np.ndarray, s_idx: int, a_idx: int,
+                    s_edges: np.ndarray, a_edges: np.ndarray) -> np.ndarray:
+    """Same table by predicting one point per cell (any model, slower)."""
+    sp, ap = np.meshgrid(_cell_points(s_edges), _cell_points(a_edges), indexing="ij")
+    out = np.empty((len(ctx), sp.shape[0], sp.shape[1]), dtype=np.float32)
+    for i, c in enumerate(ctx):
+        X = np.repeat(c[None, :], sp.size, axis=0)
+        X[:, s_idx], X[:, a_idx] = sp.ravel(), ap.ravel()
+        out[i] = backend.predict(X).reshape(sp.shape)
+    return out
+
+def context_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """The ``FIELDS`` of every row of a features frame as strings (NaN if missing)."""
+    from models.eval_engine import field_codes
+    cols = {}
+    for f in FIELDS:
+        if f in df and pd.api.types.is_numeric_dtype(df[f]):
+            cols[f] = df[f].astype("Int64").astype(str).where(df[f].notna())
+        else:                                   # one-hot group or categorical
+            codes, labels = field_codes(df, f)
+            cols[f] = pd.Series(np.asarray(labels, dtype=object)[np.maximum(codes, 0)],
+                                index=df.index).where(codes >= 0)
+    return pd.DataFrame(cols)
+
+def training_contexts(keys: pd.DataFrame, coverage: float = 1.0) -> tuple:
+    """``(contexts (n, fields) str, share of rows covered)``, most frequent first."""
+    counts = keys.value_counts()                # drops rows with a missing field
+    share = counts.cumsum().to_numpy() / len(keys)
+    keep = min(len(counts), int(np.searchsorted(share, coverage * share[-1])) + 1)
+    return np.array(counts.index[:keep].tolist(), dtype=str), float(share[keep - 1])
+
+def build_grid(model, features_path: str, out: str = GRID_PATH, coverage: float = 1.0,
+               chunk: int = 2_000, points: int = 16, check_rows: int = 200_000,
+               seed: int = 0) -> pathlib.Path:
+    """Build, check and write the grid for ``model`` (replaced atomically)."""
+    from utils.request_helper import FeatureEncoder
+    from utils.scoring import CompiledTreeBackend, make_backend
+
+    t0 = time.perf_counter()
+    enc = FeatureEncoder.from_model(model)
+    s_idx, a_idx = enc.numeric["launch_speed"], enc.numeric["launch_angle"]
+    booster = make_backend("inplace", model)
+    df = pd.read_parquet(features_path)
+    keys = context_keys(df)
+    contexts, covered = training_contexts(keys, coverage)
+    ctx = enc.encode([dict(zip(FIELDS, c)) | {"balls": int(c[0]), "strikes": int(c[1]),
+                                              "inning": int(c[5]), "month": int(c[6])}
+                      for c in contexts])
+
+    try:
+        trees = CompiledTreeBackend(model)
+        s_edges, a_edges = _edges(trees, s_idx), _edges(trees, a_idx)
+        def tables(c):
+            m = _tables_symbolic(trees, c, s_idx, a_idx, s_edges, a_edges)
+            return 1.0 / (1.0 + np.exp(-m))
+        method = "symbolic"
+    except NotImplementedError:                  # categorical splits
+        raw = json.loads(booster.booster.save_raw("json"))["learner"]["gradient_booster"]
+        thr = {s_idx: set(), a_idx: set()}
+        for t in raw["model"]["trees"]:
+            for f, c, l in zip(t["split_indices"], t["split_conditions"], t["left_children"]):
+                if l != -1 and f in thr:
+                    thr[f].add(np.float32(c))
+        s_edges, a_edges = (np.array(sorted(thr[i]), dtype=np.float32) for i in (s_idx, a_idx))
+        def tables(c):
+            return _tables_booster(booster, c, s_idx, a_idx, s_edges, a_edges)
+        method = "booster"
+
+    out = pathlib.Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{out.name}.", dir=out.parent))
+    try:
+        shape = (len(ctx), len(s_edges) + 1, len(a_edges) + 1)
+        table = np.lib.format.open_memmap(tmp / "table.npy", mode="w+", dtype=np.float32,
+                                          shape=shape)
+        for lo in range(0, len(ctx), chunk):
+            table[lo:lo + chunk] = tables(ctx[lo:lo + chunk])
+        table.flush()
+        build_secs = time.perf_counter() - t0
+
+        # ---- check against the booster -------------------------------
+        rng = np.random.default_rng(seed)
+        ci = np.repeat(np.arange(len(ctx)), points)
+        sp = rng.uniform(20, 125, len(ci)).astype(np.float32)
+        ap = rng.uniform(-90, 90, len(ci)).astype(np.float32)
+        if check_rows:                         # real PAs of covered contexts
+            real_ci, real_sp, real_ap = _real_points(df, keys, contexts, check_rows, rng)
+            ci, sp, ap = np.r_[ci, real_ci], np.r_[sp, real_sp], np.r_[ap, real_ap]
+        err = np.zeros(len(ctx), dtype=np.float32)
+        for lo in range(0, len(ci), 500_000):
+            c, s, a = ci[lo:lo + 500_000], sp[lo:lo + 500_000], ap[lo:lo + 500_000]
+            X = ctx[c].copy()
+            X[:, s_idx], X[:, a_idx] = s, a
+            truth = booster.predict(X)
+            grid = table[c, np.searchsorted(s_edges, s, side="right"),
+                         np.searchsorted(a_edges, a, side="right")]
+            np.maximum.at(err, c, np.abs(grid - truth))
+        np.save(tmp / "max_error.npy", err)
+        np.save(tmp / "contexts.npy", contexts)
+        del table
+
+        meta = {
+            "model_sha": model_key(model),
+            "fields": list(FIELDS),
+            "speed_edges": s_edges.tolist(),
+            "angle_edges": a_edges.tolist(),
+            "contexts": len(ctx),
+            "coverage": covered,                # share of all training rows
+            "method": method,
+            "check_points": int(len(ci)),
+            "max_error": float(err.max()),
+            "p999_error": float(np.quantile(err, 0.999)),
+            "build_seconds": build_secs,
+            "features": str(features_path),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(tmp / "meta.json", "w") as fh:
+            json.dump(meta, fh, indent=2)
+        if out.exists():
+            shutil.rmtree(out)
+        os.replace(tmp, out)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return out
+
+def _real_points(df: pd.DataFrame, keys: pd.DataFrame, contexts: np.ndarray, n: int, rng) -> tuple:
+    """(context index, speed, angle) of up to ``n`` training PAs in the grid."""
+    ok = np.flatnonzero((df["launch_speed"].notna() & df["launch_angle"].notna()).to_numpy())
+    pick = rng.choice(ok, min(n, len(ok)), replace=False)
+    index = {tuple(c): i for i, c in enumerate(contexts.tolist())}
+    ci = np.array([index.get(k, -1) for k in keys.iloc[pick].itertuples(index=False)],
+                  dtype=np.int64)
+    hit = ci >= 0
+    return (ci[hit], df["launch_speed"].to_numpy(np.float32)[pick][hit],
+            df["launch_angle"].to_numpy(np.float32)[pick][hit])
+
+
+# ---------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------
+class ProbGrid:
+    """
+    Memory-mapped grid; answers only contexts whose build-time error is
+    within ``tolerance`` and leaves the rest to a fallback scorer.
+    """
+
+    def __init__(self, path: str = GRID_PATH, tolerance: float = 1e-4):
+        self.path = pathlib.Path(path)
+        with open(self.path / "meta.json") as fh:
+            self.meta = json.load(fh)
+        self.tolerance = tolerance
+        self.table = np.load(self.path / "table.npy", mmap_mode="r")
+        self.s_edges = np.asarray(self.meta["speed_edges"], dtype=np.float32)
+        self.a_edges = np.asarray(self.meta["angle_edges"], dtype=np.float32)
+        self._s, self._a = self.s_edges.tolist(), self.a_edges.tolist()
+        err = np.load(self.path / "max_error.npy")
+        contexts = np.load(self.path / "contexts.npy")
+        self.index = {tuple(c): i for i, (c, e) in enumerate(zip(contexts.tolist(), err))
+                      if e <= tolerance}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def lookup_one(self, row: dict) -> Optional[float]:
+        """Scalar path for a single PA (no array set-up); ``None`` = fall back."""
+        ci = self.index.get(_key(row))
+        s, a = float(np.float32(row["launch_speed"])), float(np.float32(row["launch_angle"]))
+        if ci is None or s != s or a != a:     # unknown context or NaN input
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return float(self.table[ci, bisect.bisect_right(self._s, s), bisect.bisect_right(self._a, a)])
+
+    def lookup(self, rows: Sequence[dict]) -> np.ndarray:
+        """float32 probability per row; NaN where the grid cannot answer."""
+        n = len(rows)
+        ci = np.fromiter((self.index.get(_key(r), -1) for r in rows), dtype=np.int64, count=n)
+        out = np.full(n, np.nan, dtype=np.float32)
+        hit = ci >= 0
+        if hit.any():
+            sp = np.array([r["launch_speed"] for r, h in zip(rows, hit) if h], dtype=np.float32)
+            ap = np.array([r["launch_angle"] for r, h in zip(rows, hit) if h], dtype=np.float32)
+            out[hit] = self.table[ci[hit], np.searchsorted(self.s_edges, sp, side="right"),
+                                  np.searchsorted(self.a_edges, ap, side="right")]
+            out[hit & np.isnan(out)] = np.nan            # NaN inputs: not in any cell
+        nh = int(np.count_nonzero(~np.isnan(out)))
+        self.hits += nh
+        self.fallbacks += n - nh
+        return out
+
+    def predict(self, rows: Sequence[dict],
+                fallback: Callable[[list], np.ndarray]) -> np.ndarray:
+        """Grid where it can answer, ``fallback(rows)`` for the rest."""
+        out = self.lookup(rows)
+        miss = np.flatnonzero(np.isnan(out))
+        if len(miss):
+            out[miss] = fallback([rows[i] for i in miss])
+        return out
+
+    def stats(self) -> dict:
+        total = self.hits + self.fallbacks
+        return {
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hits / total if total else 0.0,
+            "contexts": len(self.index),
+            "tolerance": self.tolerance,
+            "max_error": self.meta["max_error"],
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("model_path")
+    ap.add_argument("features_parquet", help="training features: contexts + check PAs")
+    ap.add_argument("--out", default=GRID_PATH)
+    ap.add_argument("--coverage", type=float, default=1.0,
+                    help="keep the most frequent contexts covering this share of PAs")
+    ap.add_argument("--points", type=int, default=16, help="random check points per context")
+    ap.add_argument("--check-rows", type=int, default=200_000, help="real PAs checked")
+    args = ap.parse_args()
+
+    import joblib
+    model = joblib.load(args.model_path)
+    out = build_grid(model, args.features_parquet, args.out, args.coverage,
+                     points=args.points, check_rows=args.check_rows)
+    meta = ProbGrid(out).meta
+    mb = os.path.getsize(out / "table.npy") / 2**20
+    print(f"{meta['contexts']:,} contexts × {len(meta['speed_edges']) + 1} speed × "
+          f"{len(meta['angle_edges']) + 1} angle cells ({mb:.0f} MB, {meta['method']}, "
+          f"{meta['build_seconds']:.1f}s)")
+    print(f"max |grid − booster| {meta['max_error']:.2e} (p99.9 {meta['p999_error']:.2e}) "
+          f"over {meta['check_points']:,} points")
+    print(f"✅ wrote {out}")
+
+if __name__ == "__main__":
+    main()
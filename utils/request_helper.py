@@ -1,4 +1,186 @@
-import json, joblib, pandas as pd, argparse
+import json, joblib, numpy as np, pandas as pd, argparse
+from functools import lru_cache
+from typing import Iterable, Mapping, Optional, Sequence
+
+# ---------------------------------------------------------------------
+# Reusable encoder: raw PA dicts -> dense feature matrix
+# ---------------------------------------------------------------------
+class FeatureEncoder:
+    """
+    Expand raw baseball fields into the model's feature layout.
+
+    Built once from the booster's ``feature_names`` (and ``feature_types``
+    when present).  Numeric columns are looked up by name; one-hot
+    columns are looked up by their ``(field, value)`` slot, e.g.
+    ``("pitch_type", "FF") -> index of "pitch_type_FF"``; categorical
+    columns (categorical layout) hold the value's code in ``categories``.
+
+    Parameters
+    ----------
+    feature_names : sequence of str
+        Column order the model was trained on.
+    feature_types : sequence of str, optional
+        XGBoost feature types; ``"i"`` marks a one-hot indicator column,
+        ``"c"`` a native categorical.  If omitted every column is treated
+        as both numeric and one-hot.
+    categories : mapping of str to list, optional
+        Levels of every ``"c"`` column in code order (the booster's
+        ``category_vocab`` attribute).
+    """
+
+    def __init__(self, feature_names: Sequence[str],
+                 feature_types: Optional[Sequence[str]] = None,
+                 categories: Optional[Mapping[str, list]] = None):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        types = list(feature_types) if feature_types else [None] * self.n_features
+
+        self.numeric: dict[str, int] = {}
+        self.slots: dict[tuple[str, str], int] = {}
+        self.categorical: dict[str, tuple[int, dict[str, int]]] = {}
+        for i, (name, ftype) in enumerate(zip(self.feature_names, types)):
+            if ftype == "c":
+                if not categories or name not in categories:
+                    raise ValueError(f"no category levels for categorical feature '{name}'")
+                codes = {str(v): k for k, v in enumerate(categories[name])}
+                self.categorical[name] = (i, codes)
+                continue
+            if ftype != "i":
+                self.numeric[name] = i
+            if ftype in ("i", None):
+                field, _, value = name.rpartition("_")
+                if field:
+                    self.slots[(field, value)] = i
+        # categorical columns default to missing (code 0 is a real level)
+        self._cat_idx = np.array([i for i, _ in self.categorical.values()], dtype=np.int64)
+
+    @classmethod
+    def from_model(cls, model) -> "FeatureEncoder":
+        """Build from an ``XGBClassifier`` or a raw ``xgboost.Booster``."""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        vocab = booster.attr("category_vocab")
+        return cls(booster.feature_names, booster.feature_types,
+                   json.loads(vocab) if vocab else None)
+
+    @classmethod
+    def from_path(cls, model_path: str) -> "FeatureEncoder":
+        return cls.from_model(joblib.load(model_path))
+
+    def encode(self, rows: Iterable[Mapping], dtype=np.float32) -> np.ndarray:
+        """
+        Encode raw PA dicts into one preallocated ``(n_rows, n_features)``
+        matrix.  Unmatched columns stay 0.0, exactly like ``build_payload``;
+        categorical columns stay missing (NaN).
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        X = self._empty(len(rows), dtype)
+        numeric, slots, categorical = self.numeric, self.slots, self.categorical
+
+        for r, raw in enumerate(rows):
+            for field, val in raw.items():
+                idx = numeric.get(field)
+                if idx is not None:
+                    X[r, idx] = np.nan if val is None else val
+                    continue
+                cat = categorical.get(field)
+                if cat is not None:
+                    code = cat[1].get(str(val))
+                    if code is not None:
+                        X[r, cat[0]] = code
+                    elif val is not None:
+                        print(f"[warn] '{field}' -> '{val}' not matched; skipped.")
+                    continue
+                idx = slots.get((field, str(val)))
+                if idx is not None:
+                    X[r, idx] = 1
+                else:
+                    print(f"[warn] '{field}' -> '{val}' not matched; skipped.")
+        return X
+
+    def encode_columns(self, columns: Mapping[str, np.ndarray],
+                       dtype=np.float32) -> np.ndarray:
+        """
+        Vectorized ``encode`` for struct-of-arrays input
+        (``{"launch_speed": array, "stand": array, ...}``).
+
+        Numeric columns are copied in one slice assignment; categorical
+        columns are mapped through ``np.unique`` so the slot lookup runs
+        once per distinct value instead of once per row.
+        """
+        n = len(next(iter(columns.values()))) if columns else 0
+        X = self._empty(n, dtype)
+        rows = np.arange(n)
+
+        for field, col in columns.items():
+            col = np.asarray(col)
+            idx = self.numeric.get(field)
+            if idx is not None:
+                X[:, idx] = col
+                continue
+            levels, inverse = np.unique(col, return_inverse=True)
+            cat = self.categorical.get(field)
+            if cat is not None:
+                codes = np.array([cat[1].get(str(v), -1) for v in levels.tolist()],
+                                 dtype=np.int64)
+                for v in levels[codes < 0].tolist():
+                    print(f"[warn] '{field}' -> '{v}' not matched; skipped.")
+                level_code = np.where(codes >= 0, codes, np.nan)
+                X[:, cat[0]] = level_code[inverse.ravel()]
+                continue
+            level_idx = np.array(
+                [self.slots.get((field, str(v)), -1) for v in levels.tolist()],
+                dtype=np.int64,
+            )
+            for v in levels[level_idx < 0].tolist():
+                print(f"[warn] '{field}' -> '{v}' not matched; skipped.")
+            cols_hit = level_idx[inverse.ravel()]
+            hit = cols_hit >= 0
+            X[rows[hit], cols_hit[hit]] = 1
+        return X
+
+    def encode_frame(self, df, dtype=np.float32) -> np.ndarray:
+        """
+        Feature frame in training layout (one-hot or categorical, e.g. a
+        features parquet) -> matrix in the model's column order.
+        Categorical columns are mapped to the model's codes by value, so
+        frames whose categories are ordered differently still line up.
+        """
+        X = self._empty(len(df), dtype)
+        for name, idx in self.numeric.items():
+            if name in df:
+                X[:, idx] = df[name].to_numpy(dtype=dtype, na_value=np.nan)
+        for (field, value), idx in self.slots.items():
+            name = f"{field}_{value}"
+            if name in df and name not in self.numeric:
+                X[:, idx] = df[name].to_numpy(dtype=dtype)
+        for name, (idx, codes) in self.categorical.items():
+            if name in df:
+                col = df[name]
+                if not isinstance(col.dtype, pd.CategoricalDtype):
+                    col = col.astype("category")
+                col = col.cat.rename_categories([str(v) for v in col.cat.categories])
+                c = col.cat.set_categories(sorted(codes, key=codes.get)).cat.codes.to_numpy()
+                X[:, idx] = np.where(c >= 0, c, np.nan)
+        return X
+
+    def _empty(self, n: int, dtype) -> np.ndarray:
+        X = np.zeros((n, self.n_features), dtype=dtype)
+        if len(self._cat_idx):
+            X[:, self._cat_idx] = np.nan
+        return X
+
+    def encode_one(self, raw: Mapping, dtype=np.float32) -> np.ndarray:
+        """Encode a single raw PA into a ``(1, n_features)`` matrix."""
+        return self.encode([raw], dtype=dtype)
+
+    def to_dict(self, row: np.ndarray) -> dict:
+        """Map one encoded row back to ``{feature_name: value}``."""
+        return dict(zip(self.feature_names, row.tolist()))
+
+
+@lru_cache(maxsize=8)
+def _encoder_for(model_path: str) -> FeatureEncoder:
+    return FeatureEncoder.from_path(model_path)
 
 # ---------------------------------------------------------------------
 # Build a 1-row dict whose keys exactly match the model's feature names
@@ -21,23 +203,8 @@ def build_payload(model_path: str, **raw) -> dict:
         Keys match every column seen during training; unmatched columns
         are filled with 0.0 so XGBoost accepts the DataFrame.
     """
-    model = joblib.load(model_path)
-    feat_names = model.get_booster().feature_names
-
-    # start with a row of zeros (float to avoid dtype warnings)
-    X = pd.DataFrame(0.0, index=[0], columns=feat_names)
-
-    for field, val in raw.items():
-        if field in X.columns:
-            X.at[0, field] = val
-        else:
-            one_hot = f"{field}_{val}"
-            if one_hot in X.columns:
-                X.at[0, one_hot] = 1
-            else:
-                print(f"[warn] '{field}' -> '{val}' not matched; skipped.")
-
-    return X.iloc[0].to_dict()
+    encoder = _encoder_for(model_path)       # model is unpickled once per path
+    return encoder.to_dict(encoder.encode_one(raw, dtype=np.float64)[0])
 
 # ---------------------------------------------------------------------
 # Optional CLI:  build a payload and print JSON to stdout
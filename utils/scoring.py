@@ -0,0 +1,203 @@
+"""
+Pluggable scoring backends: encoded float32 matrix -> P(HR).
+
+Backends
+--------
+sklearn   ``XGBClassifier.predict_proba`` (reference, slowest per call)
+inplace   ``Booster.inplace_predict`` on contiguous float32 NumPy
+compiled  trees flattened into NumPy arrays, traversed level by level
+          for every row and tree at once (no xgboost call at all)
+
+Select one with ``make_backend(name, model)``; the API reads the name
+from ``serve/config.json`` ("scoring_backend").
+
+``compiled`` is the fastest only for single rows; per row it stays flat
+while XGBoost amortises its call overhead, so from ~100 rows on it is
+4-6x slower than ``inplace`` (benchmarks/bench_scoring.py, 1 CPU):
+
+    batch     compiled   inplace    (µs/row)
+    1            361        890
+    100          146         44
+    1000         163         30
+    10000        175         28
+
+Its point is cold start (no xgboost import, arrays mmapped and shared by
+workers), not throughput; ``/predict_batch`` and ``/predict_columnar``
+want ``inplace``.  ``tests/test_scoring_parity.py`` keeps every backend
+within 1e-5 of ``predict_proba`` (compiled: 4.8e-07 max on 2024 data).
+"""
+import json, pathlib
+from typing import Dict, Type
+
+import numpy as np
+
+
+def _as_float32(X) -> np.ndarray:
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def _iteration_range(booster) -> tuple:
+    """Trees to use: honour early stopping like ``predict_proba`` does."""
+    best = booster.attr("best_iteration")
+    return (0, int(best) + 1) if best is not None else (0, 0)
+
+
+class ScoringBackend:
+    """Base class.  ``predict`` returns a contiguous float32 1-D array."""
+
+    name = "base"
+
+    def __init__(self, model):
+        self.model = model
+        self.booster = model.get_booster() if hasattr(model, "get_booster") else model
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SklearnBackend(ScoringBackend):
+    name = "sklearn"
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(self.model.predict_proba(X)[:, 1], dtype=np.float32)
+
+
+class InplaceBackend(ScoringBackend):
+    name = "inplace"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.iteration_range = _iteration_range(self.booster)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        probs = self.booster.inplace_predict(
+            _as_float32(X),
+            iteration_range=self.iteration_range,
+            validate_features=False,        # column order is fixed by the encoder
+        )
+        return np.ascontiguousarray(probs, dtype=np.float32)
+
+
+class CompiledTreeBackend(ScoringBackend):
+    """
+    All trees concatenated into flat node arrays.  Leaves point at
+    themselves, so ``max_depth`` rounds of
+
+        node = where(x[feat[node]] < thresh[node], left[node], right[node])
+
+    walk every (row, tree) pair to its leaf; missing values follow
+    ``default_left`` as in XGBoost.  Rows are processed in chunks to bound
+    the ``(rows, trees)`` working set.
+    """
+
+    name = "compiled"
+
+    def __init__(self, model, chunk_rows: int = 8192):
+        super().__init__(model)
+        self.chunk_rows = chunk_rows
+        raw = json.loads(self.booster.save_raw("json"))
+        learner = raw["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise ValueError("compiled backend supports binary:logistic only")
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        start, stop = _iteration_range(self.booster)
+        if stop:
+            trees = trees[start:stop]
+
+        base = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        self.base_margin = float(np.log(base / (1.0 - base)))
+        self._flatten(trees)
+
+    def _flatten(self, trees: list) -> None:
+        left, right, feat, thresh, dleft, roots = [], [], [], [], [], []
+        offset, depth = 0, 0
+        for t in trees:
+            if any(t["split_type"]):
+                raise NotImplementedError("compiled backend has no categorical splits")
+            lc = np.asarray(t["left_children"], dtype=np.int64)
+            rc = np.asarray(t["right_children"], dtype=np.int64)
+            ids = np.arange(len(lc))
+            leaf = lc == -1
+            left.append(np.where(leaf, ids, lc) + offset)
+            right.append(np.where(leaf, ids, rc) + offset)
+            feat.append(np.where(leaf, 0, t["split_indices"]))
+            thresh.append(t["split_conditions"])       # leaf value on leaves
+            dleft.append(t["default_left"])
+            roots.append(offset)
+            depth = max(depth, self._depth(lc, rc))
+            offset += len(lc)
+
+        self.left = np.concatenate(left).astype(np.int32)
+        self.right = np.concatenate(right).astype(np.int32)
+        self.feat = np.concatenate(feat).astype(np.int32)
+        self.thresh = np.concatenate(thresh).astype(np.float32)
+        self.default_left = np.concatenate(dleft).astype(bool)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = depth
+
+    # -----------------------------------------------------------------
+    # On-disk form: one .npy per array, memory-mappable by every worker
+    # -----------------------------------------------------------------
+    ARRAYS = ("left", "right", "feat", "thresh", "default_left", "roots")
+
+    def save(self, directory) -> None:
+        d = pathlib.Path(directory)
+        d.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(d / f"{name}.npy", getattr(self, name))
+        with open(d / "trees.json", "w") as fh:
+            json.dump({"base_margin": self.base_margin, "max_depth": self.max_depth}, fh)
+
+    @classmethod
+    def load(cls, directory, mmap_mode: str = "r", chunk_rows: int = 8192) -> "CompiledTreeBackend":
+        """Open saved arrays read-only; with ``mmap_mode="r"`` the pages are
+        shared through the OS page cache by every process that maps them."""
+        d = pathlib.Path(directory)
+        self = cls.__new__(cls)
+        self.model = self.booster = None
+        self.chunk_rows = chunk_rows
+        for name in cls.ARRAYS:
+            setattr(self, name, np.load(d / f"{name}.npy", mmap_mode=mmap_mode))
+        with open(d / "trees.json") as fh:
+            meta = json.load(fh)
+        self.base_margin = meta["base_margin"]
+        self.max_depth = meta["max_depth"]
+        return self
+
+    @staticmethod
+    def _depth(lc: np.ndarray, rc: np.ndarray) -> int:
+        depth, level = 0, [0]
+        while True:
+            level = [c for n in level for c in (lc[n], rc[n]) if c != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        X = _as_float32(X)
+        out = np.empty(len(X), dtype=np.float64)
+        for lo in range(0, len(X), self.chunk_rows):
+            Xc = X[lo:lo + self.chunk_rows]
+            node = np.broadcast_to(self.roots, (len(Xc), len(self.roots))).copy()
+            for _ in range(self.max_depth):
+                x = np.take_along_axis(Xc, self.feat[node], axis=1)
+                go_left = np.where(np.isnan(x), self.default_left[node], x < self.thresh[node])
+                node = np.where(go_left, self.left[node], self.right[node])
+            out[lo:lo + len(Xc)] = self.thresh[node].sum(axis=1, dtype=np.float64)
+        return out + self.base_margin
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (1.0 / (1.0 + np.exp(-self.margin(X)))).astype(np.float32)
+
+
+BACKENDS: Dict[str, Type[ScoringBackend]] = {
+    cls.name: cls for cls in (SklearnBackend, InplaceBackend, CompiledTreeBackend)
+}
+
+
+def make_backend(name: str, model) -> ScoringBackend:
+    """Instantiate the backend registered under ``name``."""
+    if name not in BACKENDS:
+        raise ValueError(f"unknown scoring backend '{name}'; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](model)
@@ -0,0 +1,137 @@
+"""
+Batch SHAP explanations for the inference API.
+
+The engine wraps a ``shap.TreeExplainer`` and adds three things:
+
+* one ``argpartition`` over the whole SHAP matrix for top-N ranking,
+* the HR probability derived from the SHAP margin (no second model pass),
+* an LRU cache keyed on the encoded feature vector, with hit/miss counters.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class ExplanationEngine:
+    """
+    Parameters
+    ----------
+    explainer : shap.TreeExplainer
+        Explainer built on the binary XGBoost model (raw / log-odds output).
+    feature_names : sequence of str
+        Column order of the encoded matrices passed to ``explain``.
+    cache_size : int
+        Max number of distinct feature vectors kept in the LRU cache;
+        0 disables caching.
+    """
+
+    def __init__(self, explainer, feature_names: Sequence[str], cache_size: int = 4096):
+        self.explainer = explainer
+        self.feature_names = list(feature_names)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()       # sync FastAPI routes run in a threadpool
+
+    @property
+    def baseline(self) -> float:
+        """Expected model margin.  shap fills this in on the first
+        ``shap_values`` call for XGBoost models, so read it lazily."""
+        return float(np.ravel(self.explainer.expected_value)[0])
+
+    # -----------------------------------------------------------------
+    # SHAP matrix with per-row caching
+    # -----------------------------------------------------------------
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """SHAP matrix ``(n_rows, n_features)`` for an encoded batch."""
+        X = np.ascontiguousarray(X)
+        out = np.empty(X.shape, dtype=np.float32)
+        keys = [row.tobytes() for row in X]
+        pending: Dict[bytes, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vals = self._cache.get(key) if self.cache_size else None
+                if vals is None:
+                    pending.setdefault(key, []).append(i)
+                    continue
+                self._cache.move_to_end(key)
+                out[i] = vals
+                self.hits += 1
+            self.misses += len(pending)                 # distinct rows computed
+            self.hits += sum(len(rows) - 1 for rows in pending.values())
+
+        if not pending:
+            return out
+
+        # one explainer call for the distinct uncached rows
+        first = [rows[0] for rows in pending.values()]
+        fresh = np.asarray(self.explainer.shap_values(X[first]), dtype=np.float32)
+        for vals, rows in zip(fresh, pending.values()):
+            out[rows] = vals
+
+        if self.cache_size:
+            with self._lock:
+                for key, vals in zip(pending, fresh):
+                    self._cache[key] = vals
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    # -----------------------------------------------------------------
+    # Vectorized post-processing
+    # -----------------------------------------------------------------
+    def probability(self, shap_vals: np.ndarray) -> np.ndarray:
+        """HR probability from the SHAP margin: sigmoid(baseline + Σ shap)."""
+        margin = self.baseline + shap_vals.sum(axis=1, dtype=np.float64)
+        return 1.0 / (1.0 + np.exp(-margin))
+
+    def top_n(self, shap_vals: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices and |impact| of the ``top_n`` largest-magnitude features per
+        row, sorted descending, for the whole batch at once.
+        """
+        impact = np.abs(shap_vals)
+        k = max(0, min(top_n, impact.shape[1]))
+        if k == 0:
+            empty = np.empty((impact.shape[0], 0))
+            return empty.astype(np.int64), empty
+        if k < impact.shape[1]:
+            idx = np.argpartition(-impact, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(k), impact.shape).copy()
+        top = np.take_along_axis(impact, idx, axis=1)
+        order = np.argsort(-top, axis=1, kind="stable")
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def explain(self, X: np.ndarray, top_n: int = 10) -> Tuple[np.ndarray, List[dict]]:
+        """
+        Returns
+        -------
+        (probs, contributions)
+            ``probs`` is a float array with one HR probability per row;
+            ``contributions`` is a list of ``{feature: |impact|}`` dicts
+            ordered by impact, matching the existing API payload.
+        """
+        shap_vals = self.shap_values(X)
+        idx, top = self.top_n(shap_vals, top_n)
+        names = self.feature_names
+        contribs = [
+            {names[j]: v for j, v in zip(row_idx, row_top)}
+            for row_idx, row_top in zip(idx.tolist(), top.tolist())
+        ]
+        return self.probability(shap_vals), contribs
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+        }
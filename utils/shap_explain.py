@@ -4,6 +4,11 @@ Generate a SHAP force-plot (PNG) for one plate appearance.
 Usage
 -----
 python utils/shap_explain.py pa.json --out pa_force.png
+python -m utils.shap_explain --row 12345 --out pa_force.png
+
+``--row`` takes a row number of the features parquet and reads its
+precomputed values from the model's SHAP store (``utils/shap_store.py``);
+no explainer is built.
 """
 import argparse, json, joblib, pandas as pd, shap, matplotlib.pyplot as plt
 
@@ -11,22 +16,40 @@ MODEL_PATH = "models/hr_model.pkl"
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("pa_json", help="JSON file with the EXACT row you fed /predict")
+    ap.add_argument("pa_json", nargs="?", help="JSON file with the EXACT row you fed /predict")
+    ap.add_argument("--row", type=int, help="features-file row number, read from the SHAP store")
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--store", default="data/shap_store", help="SHAP store root")
     ap.add_argument("--out", default="pa_force.png", help="Output PNG path")
     args = ap.parse_args()
+    if (args.pa_json is None) == (args.row is None):
+        ap.error("give either pa_json or --row")
 
-    # ---------- load model & one-row dataframe ----------
-    model = joblib.load(MODEL_PATH)
-    with open(args.pa_json, encoding="utf-8-sig") as fh:
-        x = pd.Series(json.load(fh)).to_frame().T  # keep column names!
+    if args.row is not None:
+        # ---------- precomputed row ----------
+        from utils.shap_store import ShapStore
+        store = ShapStore.for_model(args.model, args.store)
+        try:
+            i = store.position(args.row)
+        except KeyError as e:
+            ap.error(e.args[0])
+        expected_value = store.expected_value
+        shap_vals = store.values[i:i + 1]
+        x = pd.DataFrame(store.X[i:i + 1], columns=store.feature_names)
+    else:
+        # ---------- load model & one-row dataframe ----------
+        model = joblib.load(args.model)
+        with open(args.pa_json, encoding="utf-8-sig") as fh:
+            x = pd.Series(json.load(fh)).to_frame().T  # keep column names!
 
-    # ---------- SHAP values ----------
-    explainer = shap.TreeExplainer(model)
-    shap_vals = explainer.shap_values(x)
+        # ---------- SHAP values ----------
+        explainer = shap.TreeExplainer(model)
+        shap_vals = explainer.shap_values(x)
+        expected_value = explainer.expected_value
 
     # ---------- force plot ----------
     shap.force_plot(
-        explainer.expected_value,
+        expected_value,
         shap_vals,
         x,
         matplotlib=True,
@@ -38,4 +61,4 @@ def main():
     print(f"✅ wrote {args.out}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
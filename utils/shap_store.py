@@ -0,0 +1,234 @@
+"""
+Persistent SHAP matrix, computed once per model version.
+
+Usage
+-----
+python -m utils.shap_store [--model models/hr_model.pkl]
+                           [--features data/features_2024.parquet]
+                           [--rows 50000 | --rows 0 for all] [--workers 4]
+                           [--shard-rows 2000] [--interaction-rows 200]
+
+Exact TreeSHAP for the 600-tree model runs at roughly 150 rows/s per core
+(interaction values at about 1 row/s), so the job samples ``--rows`` rows
+(all with 0), splits them into shards and lets a process pool fill one
+memory-mapped matrix in place:
+
+    <root>/<model sha256[:16]>/
+        meta.json          model + input fingerprint, expected_value, shard status
+        rows.npy           row numbers in the features file (sorted)
+        X.npy              float32 encoded features of those rows
+        shap.npy           float32 SHAP values, (rows, features)
+        interactions.npy   mean |SHAP interaction|, (features, features)
+
+The directory is keyed by the model's content hash.  A rerun for the same
+model and sampling settings only reads ``meta.json`` and returns.  An
+interrupted run keeps its finished shards and computes only the rest.
+``shap_summary.py`` and ``shap_explain.py`` read from here.
+"""
+import argparse, json, os, pathlib, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import joblib, numpy as np, pandas as pd
+
+from utils.artifacts import model_key
+from utils.column_store import source_mtime
+from utils.request_helper import FeatureEncoder
+
+STORE_ROOT = "data/shap_store"
+MODEL_PATH = "models/hr_model.pkl"
+FEATURE_PATH = "data/features_2024.parquet"
+
+
+def _write_meta(d: pathlib.Path, meta: dict) -> None:
+    tmp = d / "meta.json.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp, d / "meta.json")
+
+
+# ---------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------
+_W = {}
+
+def _init_worker(model_path: str, store_dir: str) -> None:
+    import shap                                 # heavy; only in workers
+    _W["explainer"] = shap.TreeExplainer(joblib.load(model_path))
+    _W["X"] = np.load(f"{store_dir}/X.npy", mmap_mode="r")
+    _W["dir"] = store_dir
+
+def _shap_shard(i: int, start: int, stop: int) -> int:
+    out = np.load(f"{_W['dir']}/shap.npy", mmap_mode="r+")
+    out[start:stop] = _W["explainer"].shap_values(np.asarray(_W["X"][start:stop]))
+    out.flush()
+    return i
+
+def _interaction_shard(start: int, stop: int) -> np.ndarray:
+    iv = _W["explainer"].shap_interaction_values(np.asarray(_W["X"][start:stop]))
+    return np.abs(iv).sum(axis=0)
+
+
+# ---------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------
+def build(model_path: str = MODEL_PATH, features_path: str = FEATURE_PATH,
+          root: str = STORE_ROOT, rows: int = 50_000, seed: int = 42,
+          workers: Optional[int] = None, shard_rows: int = 2_000,
+          interaction_rows: int = 200, version: Optional[str] = None) -> "ShapStore":
+    """Compute (or finish, or reuse) the store for ``model_path``."""
+    model = joblib.load(model_path)
+    key = model_key(model)
+    d = pathlib.Path(root) / key
+    wanted = {
+        "model_sha": key,
+        "features": str(features_path),
+        "features_mtime": source_mtime(features_path),
+        "sample_rows": rows,
+        "seed": seed,
+        "interaction_rows": interaction_rows,
+    }
+
+    meta = None
+    if (d / "meta.json").exists():
+        with open(d / "meta.json") as fh:
+            meta = json.load(fh)
+        if any(meta.get(k) != v for k, v in wanted.items()):
+            meta = None                          # different inputs: start over
+    if meta is not None and meta["complete"]:
+        return ShapStore(d)
+
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    if meta is None:
+        d.mkdir(parents=True, exist_ok=True)
+        # computed last and only when missing: one from the old inputs would survive
+        (d / "interactions.npy").unlink(missing_ok=True)
+        encoder = FeatureEncoder.from_model(model)
+        df = pd.read_parquet(features_path)
+        n_all = len(df)
+        idx = np.arange(n_all)
+        if rows and rows < n_all:
+            idx = np.sort(np.random.default_rng(seed).choice(n_all, rows, replace=False))
+        np.save(d / "rows.npy", idx)
+        np.save(d / "X.npy", encoder.encode_frame(df.iloc[idx]))
+        del df
+        n = len(idx)
+        np.lib.format.open_memmap(d / "shap.npy", mode="w+", dtype=np.float32,
+                                  shape=(n, encoder.n_features)).flush()
+
+        import shap
+        explainer = shap.TreeExplainer(model)
+        explainer.shap_values(np.load(d / "X.npy", mmap_mode="r")[:1])  # sets expected_value
+        meta = {
+            **wanted,
+            "model_version": version,
+            "model_path": str(model_path),
+            "feature_names": encoder.feature_names,
+            "rows": n,
+            "expected_value": float(np.ravel(explainer.expected_value)[0]),
+            "shard_rows": shard_rows,
+            "done_shards": [],
+            "complete": False,
+        }
+        _write_meta(d, meta)
+
+    n, shard_rows = meta["rows"], meta["shard_rows"]
+    shards = [(i, s, min(n, s + shard_rows)) for i, s in enumerate(range(0, n, shard_rows))]
+    todo = [sh for sh in shards if sh[0] not in set(meta["done_shards"])]
+    print(f"SHAP store {d}: {len(shards) - len(todo)}/{len(shards)} shards done, "
+          f"{len(todo)} to go on {workers} workers")
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(str(model_path), str(d))) as pool:
+        futs = [pool.submit(_shap_shard, *sh) for sh in todo]
+        for fut in as_completed(futs):
+            meta["done_shards"].append(fut.result())
+            _write_meta(d, meta)                 # per shard: resumable
+
+        k = min(interaction_rows, n)
+        if k and not (d / "interactions.npy").exists():
+            step = max(1, -(-k // workers))
+            parts = [pool.submit(_interaction_shard, s, min(k, s + step)) for s in range(0, k, step)]
+            np.save(d / "interactions.npy", sum(f.result() for f in parts) / k)
+
+    meta["complete"] = True
+    meta["seconds"] = meta.get("seconds", 0.0) + time.perf_counter() - t0
+    _write_meta(d, meta)
+    return ShapStore(d)
+
+
+# ---------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------
+class ShapStore:
+    """Read-only, memory-mapped view of one model's SHAP matrix."""
+
+    def __init__(self, directory):
+        self.dir = pathlib.Path(directory)
+        with open(self.dir / "meta.json") as fh:
+            self.meta = json.load(fh)
+        self.feature_names = self.meta["feature_names"]
+        self.expected_value = self.meta["expected_value"]
+        self.rows = np.load(self.dir / "rows.npy", mmap_mode="r")
+        self.X = np.load(self.dir / "X.npy", mmap_mode="r")
+        self.values = np.load(self.dir / "shap.npy", mmap_mode="r")
+        p = self.dir / "interactions.npy"
+        self.interactions = np.load(p) if p.exists() else None
+
+    @classmethod
+    def for_model(cls, model_path: str = MODEL_PATH, root: str = STORE_ROOT) -> "ShapStore":
+        d = pathlib.Path(root) / model_key(joblib.load(model_path))
+        if not (d / "meta.json").exists():
+            raise FileNotFoundError(f"no SHAP store for {model_path}; run python -m utils.shap_store")
+        return cls(d)
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def position(self, source_row: int) -> int:
+        """Index in the store of row ``source_row`` of the features file."""
+        i = int(np.searchsorted(self.rows, source_row))
+        if i >= len(self.rows) or self.rows[i] != source_row:
+            raise KeyError(f"row {source_row} is not in the SHAP sample")
+        return i
+
+    def mean_abs(self, chunk_rows: int = 100_000) -> np.ndarray:
+        """Mean |SHAP| per feature over every stored row, read in chunks."""
+        total = np.zeros(len(self.feature_names))
+        for s in range(0, len(self), chunk_rows):
+            total += np.abs(self.values[s:s + chunk_rows]).sum(axis=0, dtype=np.float64)
+        return total / max(1, len(self))
+
+    def top_interactions(self, k: int = 20) -> list:
+        """Strongest off-diagonal feature pairs by mean |interaction|."""
+        if self.interactions is None:
+            return []
+        m = self.interactions + self.interactions.T     # value is split between (i,j), (j,i)
+        iu = np.triu_indices_from(m, k=1)
+        order = np.argsort(m[iu])[::-1][:k]
+        return [(self.feature_names[iu[0][o]], self.feature_names[iu[1][o]], float(m[iu][o]))
+                for o in order]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--features", default=FEATURE_PATH)
+    ap.add_argument("--root", default=STORE_ROOT)
+    ap.add_argument("--rows", type=int, default=50_000, help="sampled rows (0 = all)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--shard-rows", type=int, default=2_000)
+    ap.add_argument("--interaction-rows", type=int, default=200)
+    ap.add_argument("--version", help="model version label recorded in meta.json")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    store = build(args.model, args.features, args.root, args.rows, args.seed, args.workers,
+                  args.shard_rows, args.interaction_rows, args.version)
+    print(f"✅ {store.dir}: {len(store):,} rows × {len(store.feature_names)} features "
+          f"({time.perf_counter() - t0:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,78 @@
-import joblib, pandas as pd, shap, matplotlib.pyplot as plt
-
-MODEL_PATH   = "models/hr_model.pkl"
-FEATURE_PATH = "data/features_2024.parquet"
-
-# ------------- load model & sample data -----------------
-model = joblib.load(MODEL_PATH)
-X      = pd.read_parquet(FEATURE_PATH).drop(columns=["is_hr"])
-
-# (optional) sample 10 k rows to speed up SHAP
-X_sample = X.sample(10_000, random_state=42)
-
-# ------------- explain -----------------
-explainer   = shap.TreeExplainer(model)
-shap_values = explainer.shap_values(X_sample)
-
-# ------------- global summary bar plot --
-shap.summary_plot(
-    shap_values,
-    X_sample,
-    plot_type="bar",
-    show=False,           # draw to backend
-    max_display=20        # top 20 features
-)
-plt.tight_layout()
-plt.savefig("shap_summary_bar.png", dpi=250)
-plt.close()
-
-# ------------- beeswarm (optional) ------
-shap.summary_plot(
-    shap_values,
-    X_sample,
-    show=False,
-    max_display=20
-)
-plt.tight_layout()
-plt.savefig("shap_summary_beeswarm.png", dpi=250)
-plt.close()
-
-print("✅ wrote shap_summary_bar.png and shap_summary_beeswarm.png")
\ No newline at end of file
+"""
+Global SHAP summary plots + importance / interaction table.
+
+Usage
+-----
+python -m utils.shap_summary [--model models/hr_model.pkl] [--rows 50000]
+                             [--plot-rows 10000] [--json shap_importance.json]
+
+Reads the model's SHAP store (``utils/shap_store.py``) and builds it first
+if it is missing, so only the first run for a model pays for SHAP.
+"""
+import argparse, json
+import numpy as np, pandas as pd, shap, matplotlib.pyplot as plt
+
+from utils.shap_store import FEATURE_PATH, MODEL_PATH, STORE_ROOT, build
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--features", default=FEATURE_PATH)
+    ap.add_argument("--root", default=STORE_ROOT)
+    ap.add_argument("--rows", type=int, default=50_000, help="SHAP sample if the store is built")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--plot-rows", type=int, default=10_000, help="points in the beeswarm")
+    ap.add_argument("--max-display", type=int, default=20)
+    ap.add_argument("--json", default="shap_importance.json")
+    args = ap.parse_args()
+
+    store = build(args.model, args.features, args.root, rows=args.rows, workers=args.workers)
+    names = store.feature_names
+
+    # ------------- importance / interactions -----------------
+    mean_abs = store.mean_abs()
+    order = np.argsort(mean_abs)[::-1]
+    with open(args.json, "w") as fh:
+        json.dump({
+            "model_sha": store.meta["model_sha"],
+            "model_version": store.meta["model_version"],
+            "rows": len(store),
+            "expected_value": store.expected_value,
+            "mean_abs_shap": {names[i]: float(mean_abs[i]) for i in order},
+            "interaction_rows": store.meta["interaction_rows"],
+            "top_interactions": [{"a": a, "b": b, "mean_abs": v}
+                                 for a, b, v in store.top_interactions()],
+        }, fh, indent=2)
+
+    # ------------- plot sample -----------------
+    k = min(args.plot_rows, len(store))
+    pick = np.sort(np.random.default_rng(42).choice(len(store), k, replace=False))
+    values = np.asarray(store.values[pick])
+    X = pd.DataFrame(np.asarray(store.X[pick]), columns=names)
+
+    # ------------- global summary bar plot --
+    # bars from the full store, not just the plotted sample
+    plt.figure()
+    top = order[:args.max_display][::-1]
+    plt.barh([names[i] for i in top], mean_abs[top])
+    plt.xlabel("mean(|SHAP value|)")
+    plt.tight_layout()
+    plt.savefig("shap_summary_bar.png", dpi=250)
+    plt.close()
+
+    # ------------- beeswarm ------
+    shap.summary_plot(
+        values,
+        X,
+        show=False,
+        max_display=args.max_display
+    )
+    plt.tight_layout()
+    plt.savefig("shap_summary_beeswarm.png", dpi=250)
+    plt.close()
+
+    print(f"✅ wrote shap_summary_bar.png, shap_summary_beeswarm.png and {args.json} "
+          f"({len(store):,} SHAP rows from {store.dir})")
+
+if __name__ == "__main__":
+    main()